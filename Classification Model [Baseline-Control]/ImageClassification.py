@@ -5,13 +5,36 @@ from tensorflow.keras import layers
 import cv2 as cv
 import matplotlib.pyplot as plt
 import seaborn as sns
-import numpy as np
+import sys
+
+# Shared single-pass evaluation (MLflow [Baseline-Control]/evaluation.py)
+sys.path.append('../MLflow [Baseline-Control]')
+from evaluation import evaluate_classifier, plot_confusion_matrix, plot_sample_predictions
+from training_profile import apply_training_profile
 
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 import torch.optim as optim
 
+# "default" keeps TensorFlow's defaults; "cpu" tunes threads, bfloat16 and batch size
+TRAINING_PROFILE = "default"
+
+def fine_tuning_model():
+    """The model as configured for fine-tuning, the phase that needs the most memory per batch"""
+    base = keras.applications.MobileNetV2(input_shape=(224, 224, 3), include_top=False, weights=None)
+    for layer in base.layers[:-50]:
+        layer.trainable = False
+    return keras.Sequential([
+        base,
+        layers.GlobalAveragePooling2D(),
+        layers.Dropout(0.2),
+        layers.Dense(10, activation='softmax', dtype='float32')
+    ])
+
+profile_settings = apply_training_profile(TRAINING_PROFILE, model_fn=fine_tuning_model)
+batch_size = profile_settings["batch_size"]
+
 (train_data, val_data, test_data), data_info = tfds.load("cifar10", 
                                             split=['train[10000:]', 'train[0:10000]', 'test'],
                                             as_supervised=True, with_info=True, shuffle_files=True)
@@ -41,14 +64,14 @@ def preprocess(image, label):
     image = tf.image.resize(image, [224, 224])
     image = tf.cast(image, tf.float32) / 255.0
     return image, label
-train_data = train_data.map(augment, num_parallel_calls=tf.data.AUTOTUNE).shuffle(1000).batch(32).prefetch(tf.data.AUTOTUNE)
-val_data = val_data.map(preprocess, num_parallel_calls=tf.data.AUTOTUNE).batch(32).prefetch(tf.data.AUTOTUNE)
-test_data = test_data.map(preprocess, num_parallel_calls=tf.data.AUTOTUNE).batch(32).prefetch(tf.data.AUTOTUNE)
+train_data = train_data.map(augment, num_parallel_calls=tf.data.AUTOTUNE).shuffle(1000).batch(batch_size).prefetch(tf.data.AUTOTUNE)
+val_data = val_data.map(preprocess, num_parallel_calls=tf.data.AUTOTUNE).batch(batch_size).prefetch(tf.data.AUTOTUNE)
+test_data = test_data.map(preprocess, num_parallel_calls=tf.data.AUTOTUNE).batch(batch_size).prefetch(tf.data.AUTOTUNE)
 
 from tensorflow.keras.applications import MobileNetV2
 from tensorflow.keras.applications.mobilenet_v2 import preprocess_input
 from tensorflow.keras.preprocessing.image import img_to_array, load_img
-from sklearn.metrics import classification_report, confusion_matrix, accuracy_score, f1_score, precision_score, recall_score
+from sklearn.metrics import classification_report, accuracy_score
 
 # Use a pretrained base model
 base_model = keras.applications.MobileNetV2(
@@ -62,7 +85,7 @@ model = keras.Sequential([
     base_model,
     layers.GlobalAveragePooling2D(),
     layers.Dropout(0.2),
-    layers.Dense(10, activation='softmax')
+    layers.Dense(10, activation='softmax', dtype='float32')
 ])
 
 # Complile the model
@@ -108,29 +131,11 @@ plt.show()
 # Load the model
 model = keras.models.load_model('cifar10_model.keras')
 
-# Evaluate the model
-test_loss, test_acc = model.evaluate(test_data)
-print(f"Test accuracy: {test_acc}")
-print(f"Test loss: {test_loss}")
-
-def plot_predictions(images, true_labels, pred_labels, class_names, n=8):
-    plt.figure(figsize=(12, 6))
-    for i in range(n):
-        plt.subplot(2, 4, i + 1)
-        img = images[i].numpy() * 255.0
-        img = np.clip(img, 0, 255).astype("uint8")
-        plt.imshow(img)
-        true_cls = class_names[true_labels[i]]
-        pred_cls = class_names[pred_labels[i]]
-        plt.title(f"True: {true_cls}\nPred: {pred_cls}", fontsize=8)
-        plt.axis("off")
-    plt.tight_layout()
-    plt.show()
-# Get one batch from test set
-sample_images, sample_labels = next(iter(test_data))
-sample_preds = model.predict(sample_images, verbose=0)
-sample_pred_labels = np.argmax(sample_preds, axis=1)
-plot_predictions(sample_images, sample_labels, sample_pred_labels, classes)
+# Evaluate the model (single pass; also captures one batch of sample predictions)
+results = evaluate_classifier(model, test_data, num_classes=len(classes))
+print(f"Test accuracy: {results['accuracy']}")
+print(f"Test loss: {results['loss']}")
+plot_sample_predictions(results, classes)
 
 # Unfreezing the last 50 layers of the models
 base_model.trainable = True
@@ -163,28 +168,17 @@ model.save('cifar10_model_final_improved.keras')
 # Load saved model
 model = keras.models.load_model('cifar10_model_final_improved.keras')
 
-# Evaluate the model
-test_loss, test_acc = model.evaluate(test_data)
-print(f"Test accuracy: {test_acc}")
-print(f"Test loss: {test_loss}")
+# Evaluate the model: loss, accuracy and predictions from one pass over the test set
+results = evaluate_classifier(model, test_data, num_classes=len(classes))
+print(f"Test accuracy: {results['accuracy']}")
+print(f"Test loss: {results['loss']}")
 
 # Accuracy and Predictions
-y_true = []
-y_pred = []
-for images, labels in test_data:
-    preds = model.predict(images)
-    y_true.extend(labels.numpy())
-    y_pred.extend(np.argmax(preds, axis=1))
-cm = confusion_matrix(y_true, y_pred)
+y_true, y_pred = results["y_true"], results["y_pred"]
 print(f"Accuracy: {accuracy_score(y_true, y_pred)}")
-print(f"Precision: {precision_score(y_true, y_pred, average='macro')}")
-print(f"Recall: {recall_score(y_true, y_pred, average='macro')}")
+print(f"Precision: {results['precision_macro']}")
+print(f"Recall: {results['recall_macro']}")
 print(f"Full classification report: {classification_report(y_true, y_pred)}")
 
 # Confusion Matrix
-plt.figure(figsize=(8, 6))
-sns.heatmap(cm, annot=True, fmt='d', cmap='Blues')
-plt.xlabel('Predicted')
-plt.ylabel('True')
-plt.title('Confusion Matrix')
-plt.show()
\ No newline at end of file
+plot_confusion_matrix(results["confusion_matrix"], classes)
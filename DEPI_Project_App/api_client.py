@@ -10,8 +10,16 @@ try:
 except ImportError:
     CLASS_NAMES = ['airplane', 'automobile', 'bird', 'cat', 'deer', 'dog', 'frog', 'horse', 'ship', 'truck']
 
+try:
+    from utils.preprocessing import CIFAR10_CLASSIFIER_SPEC
+except ImportError:
+    CIFAR10_CLASSIFIER_SPEC = None
+
 CNN_ENDPOINT = ""
 CNN_KEY = ""
+# Resize on the client with the model's preprocessing spec and send a uint8 tensor.
+# Only enable once the endpoint runs a scoring script that accepts "tensor" payloads.
+CNN_SEND_PREPROCESSED = False
 
 OD_ENDPOINT = ""
 OD_KEY = ""
@@ -34,9 +42,12 @@ def classify_image(image: Image.Image, use_api=False):
         "Content-Type": "application/json"
     }
 
-    payload = {
-        "image": _pil_to_base64(image)
-    }
+    if CNN_SEND_PREPROCESSED and CIFAR10_CLASSIFIER_SPEC is not None:
+        payload = CIFAR10_CLASSIFIER_SPEC.encode_tensor(image)
+    else:
+        payload = {
+            "image": _pil_to_base64(image)
+        }
 
     try:
         response = requests.post(CNN_ENDPOINT, headers=headers, data=json.dumps(payload))
@@ -2,9 +2,16 @@ import requests
 import base64
 from io import BytesIO
 
+try:
+    from utils.preprocessing import CAR_CLASSIFIER_SPEC
+except ImportError:
+    CAR_CLASSIFIER_SPEC = None
 
 API_KEY = ""
 ENDPOINT = ""
+# Resize on the client with the model's preprocessing spec and send a uint8 tensor.
+# Only enable once the endpoint runs a scoring script that accepts "tensor" payloads.
+SEND_PREPROCESSED = False
 
 HEADERS = {
     "Content-Type": "application/json",
@@ -22,12 +29,15 @@ def call_car_model(pil_image):
         return {"error": "Missing API_KEY or ENDPOINT in code."}
 
 
-    buffer = BytesIO()
-    pil_image.save(buffer, format="JPEG")
-    img_bytes = buffer.getvalue()
-    img_b64 = base64.b64encode(img_bytes).decode()
+    if SEND_PREPROCESSED and CAR_CLASSIFIER_SPEC is not None:
+        payload = CAR_CLASSIFIER_SPEC.encode_tensor(pil_image)
+    else:
+        buffer = BytesIO()
+        pil_image.save(buffer, format="JPEG")
+        img_bytes = buffer.getvalue()
+        img_b64 = base64.b64encode(img_bytes).decode()
 
-    payload = {"image": img_b64}
+        payload = {"image": img_b64}
 
     try:
         response = requests.post(
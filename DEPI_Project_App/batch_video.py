@@ -0,0 +1,431 @@
+"""
+Offline batch video processing for DEPI system
+
+Runs the realtime page's detection, tracking, privacy blur and annotation
+(utils/annotation.py) over a whole video file without Streamlit, and writes
+an annotated MP4 plus a per-frame detections file (.jsonl, or .parquet when
+pandas/pyarrow are installed).
+
+Decoding, inference and annotation/encoding run on separate threads joined
+by bounded queues: the decoder fills batches of `batch_size` frames, the
+main thread runs the models once per batch, and the writer thread tracks,
+annotates and encodes the frames in order.
+
+Output is written in segments of `segment_frames` frames under
+<output>.parts/, with progress.json recording the last finished segment, so
+an interrupted job continues with --resume instead of starting over. The
+segments are joined into the final MP4 when the video is done.
+
+Usage:
+    python batch_video.py input.mp4 --output annotated.mp4 --detections detections.jsonl
+    python batch_video.py input.mp4 --output annotated.mp4 --privacy "Blur Faces Only" --resume
+"""
+
+import argparse
+import json
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+
+import cv2
+
+from utils.annotation import PRIVACY_MODES, annotate_frame, detect_objects, privacy_boxes, submit_face_detection
+from utils.realtime import VideoSource
+from utils.model_registry import FACE_MODEL_PATH, OBJECT_MODEL_PATH
+from utils.tracking import BoxTracker
+
+TRACK_LOW_CONFIDENCE = 0.1
+PROGRESS_FILE = "progress.json"
+FRAMES_FILE = "detections.jsonl"
+
+# End-of-stream marker on the stage queues
+_DONE = object()
+
+
+def open_video_at(source, start_frame):
+    """Open a VideoSource positioned at `start_frame`"""
+    cap = source.open()
+    if not cap.isOpened() or not start_frame:
+        return cap
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    if int(cap.get(cv2.CAP_PROP_POS_FRAMES)) == start_frame:
+        return cap
+
+    # Some containers can't seek by frame exactly; walk there instead
+    cap.release()
+    cap = source.open()
+    for _ in range(start_frame):
+        if not cap.grab():
+            break
+    return cap
+
+
+def concat_segments(segment_paths, output_path, fps):
+    """Join MP4 segments; stream copy with ffmpeg if it is installed, otherwise re-encode with OpenCV"""
+    if shutil.which("ffmpeg"):
+        list_path = output_path + ".segments.txt"
+        with open(list_path, "w") as f:
+            for path in segment_paths:
+                f.write(f"file '{os.path.abspath(path)}'\n")
+        result = subprocess.run(["ffmpeg", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0",
+                                 "-i", list_path, "-c", "copy", output_path])
+        os.remove(list_path)
+        if result.returncode == 0:
+            return
+
+    writer = None
+    for path in segment_paths:
+        cap = cv2.VideoCapture(path)
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if writer is None:
+                h, w = frame.shape[:2]
+                writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (w, h))
+            writer.write(frame)
+        cap.release()
+    if writer is not None:
+        writer.release()
+
+
+def export_detections(frames_path, detections_path):
+    """
+    Write the per-frame rows to `detections_path`. JSONL keeps one row per
+    frame; Parquet has one row per detected object (frame, time, track id,
+    class, confidence, box) since nested lists don't suit a flat table.
+    """
+    if not detections_path.endswith(".parquet"):
+        shutil.copyfile(frames_path, detections_path)
+        return detections_path
+
+    try:
+        import pandas as pd
+    except ImportError:
+        fallback = os.path.splitext(detections_path)[0] + ".jsonl"
+        print(f"pandas is not installed, writing {fallback} instead")
+        shutil.copyfile(frames_path, fallback)
+        return fallback
+
+    rows = []
+    with open(frames_path) as f:
+        for line in f:
+            frame = json.loads(line)
+            for obj in frame["objects"]:
+                x1, y1, x2, y2 = obj["box"]
+                rows.append({"frame": frame["frame"], "time_sec": frame["time_sec"], "track_id": obj["track_id"],
+                             "label": obj["label"], "confidence": obj["confidence"],
+                             "x1": x1, "y1": y1, "x2": x2, "y2": y2})
+    columns = ["frame", "time_sec", "track_id", "label", "confidence", "x1", "y1", "x2", "y2"]
+    pd.DataFrame(rows, columns=columns).to_parquet(detections_path, index=False)
+    return detections_path
+
+
+class BatchVideoJob:
+    """
+    One video file through detection -> tracking -> privacy blur -> annotation.
+
+    `model` is the object detector and `face_model` the face detector used by
+    the "Blur Faces Only" privacy mode (both ultralytics YOLO models, as on
+    the realtime page). Every frame runs the detector, in batches of
+    `batch_size`, with the face model running on the same batch concurrently.
+    "Blur Faces Only" without a face model is refused, since it would write
+    unblurred faces, unless `allow_missing_face_model` is set.
+    """
+
+    def __init__(self, input_path, output_path, detections_path, model, face_model=None, conf_threshold=0.5,
+                 max_detections=20, privacy_mode="None", blur_intensity=25, filter_set=None, show_boxes=True,
+                 batch_size=8, segment_frames=900, max_width=None, allow_missing_face_model=False):
+        if privacy_mode == "Blur Faces Only" and face_model is None and not allow_missing_face_model:
+            raise ValueError("'Blur Faces Only' needs a face model; pass allow_missing_face_model=True "
+                             "to write the video with faces unblurred")
+        self.input_path = input_path
+        self.output_path = output_path
+        self.detections_path = detections_path
+        self.model = model
+        self.face_model = face_model if privacy_mode == "Blur Faces Only" else None
+        self.conf_threshold = conf_threshold
+        self.max_detections = max_detections
+        self.privacy_mode = privacy_mode
+        self.blur_intensity = blur_intensity
+        self.filter_set = set(k.lower() for k in filter_set or [])
+        self.show_boxes = show_boxes
+        self.batch_size = batch_size
+        self.segment_frames = segment_frames
+        self.source = VideoSource(input_path, max_width=max_width)
+
+        self.parts_dir = output_path + ".parts"
+        self.progress_path = os.path.join(self.parts_dir, PROGRESS_FILE)
+        self.frames_path = os.path.join(self.parts_dir, FRAMES_FILE)
+        self.fps = None
+        self.frames_done = 0
+        self._errors = []
+        self._stop = threading.Event()
+
+    def _put(self, q, item):
+        """Blocking put that gives up once the job is stopping"""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _load_progress(self):
+        if not os.path.exists(self.progress_path):
+            return None
+        with open(self.progress_path) as f:
+            progress = json.load(f)
+        if progress["input"] != os.path.abspath(self.input_path):
+            raise RuntimeError(f"{self.parts_dir} belongs to a job for {progress['input']}")
+        return progress
+
+    def _save_progress(self, progress):
+        tmp_path = self.progress_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(progress, f, indent=2)
+        os.replace(tmp_path, self.progress_path)
+
+    def _truncate_frames(self, next_frame):
+        """Drop rows written after the last finished segment"""
+        if not os.path.exists(self.frames_path):
+            return
+        tmp_path = self.frames_path + ".tmp"
+        with open(self.frames_path) as src, open(tmp_path, "w") as dst:
+            for line in src:
+                try:
+                    if json.loads(line)["frame"] < next_frame:
+                        dst.write(line)
+                except ValueError:
+                    # Half-written last line from the interrupted run
+                    break
+        os.replace(tmp_path, self.frames_path)
+
+    def _prepare(self, start_frame, resume):
+        """Progress for a new or resumed job"""
+        progress = self._load_progress() if resume else None
+        if progress is not None:
+            self._truncate_frames(progress["next_frame"])
+            # A segment that was being written when the job stopped is redone
+            for name in os.listdir(self.parts_dir):
+                if name.endswith(".mp4") and name not in progress["segments"]:
+                    os.remove(os.path.join(self.parts_dir, name))
+            print(f"Resuming at frame {progress['next_frame']} ({len(progress['segments'])} segments done)")
+            return progress
+
+        if os.path.isdir(self.parts_dir):
+            shutil.rmtree(self.parts_dir)
+        os.makedirs(self.parts_dir)
+        progress = {"input": os.path.abspath(self.input_path), "start_frame": start_frame,
+                    "next_frame": start_frame, "next_track_id": 1, "segments": []}
+        self._save_progress(progress)
+        return progress
+
+    def _decode(self, cap, start_frame, batches):
+        try:
+            batch = []
+            frame_index = start_frame
+            while not self._stop.is_set():
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                batch.append((frame_index, self.source.prepare(frame)))
+                frame_index += 1
+                if len(batch) == self.batch_size:
+                    self._put(batches, batch)
+                    batch = []
+            if batch:
+                self._put(batches, batch)
+        except Exception as e:
+            self._errors.append(e)
+            self._stop.set()
+        finally:
+            batches.put(_DONE)
+
+    def _infer(self, batch):
+        rgb_frames = [cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) for _, frame in batch]
+        faces = submit_face_detection(self.face_model, rgb_frames) if self.face_model is not None else None
+        detections = detect_objects(self.model, rgb_frames, self.conf_threshold, self.max_detections,
+                                    TRACK_LOW_CONFIDENCE)
+        faces = faces.result() if faces else [[] for _ in batch]
+        return [(index, frame, dets, low, face_boxes)
+                for (index, frame), (dets, low), face_boxes in zip(batch, detections, faces)]
+
+    def _write(self, results, progress):
+        tracker = BoxTracker(start_id=progress["next_track_id"])
+        writer = None
+        segment_name = None
+        last_index = None
+        frames_file = open(self.frames_path, "a")
+
+        def close_segment(next_frame):
+            writer.release()
+            frames_file.flush()
+            os.fsync(frames_file.fileno())
+            progress["segments"].append(segment_name)
+            progress["next_frame"] = next_frame
+            progress["next_track_id"] = tracker.next_id
+            self._save_progress(progress)
+
+        try:
+            while True:
+                batch = results.get()
+                if batch is _DONE:
+                    break
+                for index, frame, detections, low_detections, face_boxes in batch:
+                    if writer is None:
+                        h, w = frame.shape[:2]
+                        segment_name = f"part_{index:08d}.mp4"
+                        writer = cv2.VideoWriter(os.path.join(self.parts_dir, segment_name),
+                                                 cv2.VideoWriter_fourcc(*"mp4v"), self.fps, (w, h))
+
+                    tracker.predict()
+                    tracker.update(detections, low_detections)
+                    tracked_boxes = tracker.outputs(frame.shape)[:self.max_detections]
+                    blur_boxes = privacy_boxes(self.privacy_mode, detections + low_detections, face_boxes)
+                    visible = annotate_frame(frame, tracked_boxes, blur_boxes, self.privacy_mode,
+                                             self.blur_intensity, self.filter_set, self.show_boxes)
+                    writer.write(frame)
+
+                    row = {
+                        "frame": index,
+                        "time_sec": round(index / self.fps, 3),
+                        "objects": [{"track_id": t.track_id, "label": t.label,
+                                     "confidence": round(t.confidence, 4), "box": [int(v) for v in t.box]}
+                                    for t in visible],
+                        "faces_blurred": len(face_boxes)
+                    }
+                    frames_file.write(json.dumps(row) + "\n")
+                    self.frames_done += 1
+                    last_index = index
+
+                    if (index + 1 - progress["start_frame"]) % self.segment_frames == 0:
+                        close_segment(index + 1)
+                        writer = None
+            if writer is not None and not self._stop.is_set():
+                close_segment(last_index + 1)
+        except Exception as e:
+            self._errors.append(e)
+            self._stop.set()
+            # Keep draining so the inference loop never blocks on a full queue
+            while results.get() is not _DONE:
+                pass
+        finally:
+            if writer is not None:
+                writer.release()
+            frames_file.close()
+
+    def run(self, start_frame=0, resume=False):
+        """Process the video; returns the paths of the annotated MP4 and the detections file"""
+        progress = self._prepare(start_frame, resume)
+        cap = open_video_at(self.source, progress["next_frame"])
+        if not cap.isOpened():
+            raise RuntimeError(f"Cannot open video {self.input_path}")
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+
+        batches = queue.Queue(maxsize=2)
+        results = queue.Queue(maxsize=2)
+        decoder = threading.Thread(target=self._decode, args=(cap, progress["next_frame"], batches),
+                                   name="batch-decode", daemon=True)
+        writer = threading.Thread(target=self._write, args=(results, progress), name="batch-encode", daemon=True)
+        decoder.start()
+        writer.start()
+
+        started = time.perf_counter()
+        try:
+            while True:
+                batch = batches.get()
+                if batch is _DONE:
+                    break
+                if self._stop.is_set():
+                    # Let the decoder reach its end marker
+                    continue
+                results.put(self._infer(batch))
+                if total:
+                    print(f"\rFrame {batch[-1][0] + 1}/{total}", end="", flush=True)
+        except BaseException as e:
+            # Includes Ctrl+C: finished segments stay on disk for --resume
+            self._errors.append(e)
+            self._stop.set()
+        finally:
+            results.put(_DONE)
+            while decoder.is_alive():
+                # Unblock a decoder still waiting to queue its end marker
+                try:
+                    batches.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            writer.join()
+            cap.release()
+        elapsed = time.perf_counter() - started
+        print()
+
+        if self._errors:
+            raise self._errors[0]
+        if self.frames_done:
+            print(f"Processed {self.frames_done} frames in {elapsed:.1f}s "
+                  f"({self.frames_done / max(elapsed, 1e-6):.1f} frames/s)")
+
+        segment_paths = [os.path.join(self.parts_dir, name) for name in progress["segments"]]
+        concat_segments(segment_paths, self.output_path, self.fps)
+        detections_path = export_detections(self.frames_path, self.detections_path)
+        shutil.rmtree(self.parts_dir)
+        return self.output_path, detections_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Annotate a video file offline with the realtime detection pipeline")
+    parser.add_argument("input", help="Video file to process")
+    parser.add_argument("--output", default=None, help="Annotated MP4 (default: <input>_annotated.mp4)")
+    parser.add_argument("--detections", default=None,
+                        help="Per-frame detections, .jsonl or .parquet (default: <output>.jsonl)")
+    parser.add_argument("--model", default=OBJECT_MODEL_PATH, help="Object detection weights")
+    parser.add_argument("--face-model", default=FACE_MODEL_PATH, help="Face detection weights")
+    parser.add_argument("--allow-missing-face-model", action="store_true",
+                        help="With --privacy 'Blur Faces Only', continue unblurred if the face model can't be loaded")
+    parser.add_argument("--conf", type=float, default=0.5, help="Confidence threshold")
+    parser.add_argument("--max-detections", type=int, default=20)
+    parser.add_argument("--classes", nargs="*", default=None, help="Only annotate/log these classes")
+    parser.add_argument("--privacy", choices=PRIVACY_MODES, default="None")
+    parser.add_argument("--blur-intensity", type=int, default=25)
+    parser.add_argument("--hide-boxes", action="store_true", help="Blur only, don't draw boxes")
+    parser.add_argument("--batch-size", type=int, default=8, help="Frames per inference call")
+    parser.add_argument("--segment-frames", type=int, default=900, help="Frames per resumable output segment")
+    parser.add_argument("--max-width", type=int, default=None, help="Downscale wider frames to this width")
+    parser.add_argument("--start-frame", type=int, default=0, help="Start processing at this frame")
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted job for the same output")
+    args = parser.parse_args()
+
+    from ultralytics import YOLO
+
+    output = args.output or os.path.splitext(args.input)[0] + "_annotated.mp4"
+    detections = args.detections or os.path.splitext(output)[0] + ".jsonl"
+
+    face_model = None
+    if args.privacy == "Blur Faces Only":
+        try:
+            if not os.path.exists(args.face_model):
+                raise FileNotFoundError(f"Face model not found at: {args.face_model}")
+            face_model = YOLO(args.face_model)
+        except Exception as e:
+            if not args.allow_missing_face_model:
+                parser.error(f"{e}; faces can't be blurred (use --allow-missing-face-model to continue anyway)")
+            print(f"{e}; faces will not be blurred")
+
+    job = BatchVideoJob(args.input, output, detections, YOLO(args.model), face_model,
+                        conf_threshold=args.conf, max_detections=args.max_detections, privacy_mode=args.privacy,
+                        blur_intensity=args.blur_intensity, filter_set=args.classes, show_boxes=not args.hide_boxes,
+                        batch_size=args.batch_size, segment_frames=args.segment_frames, max_width=args.max_width,
+                        allow_missing_face_model=args.allow_missing_face_model)
+    video_path, detections_path = job.run(start_frame=args.start_frame, resume=args.resume)
+    print(f"Annotated video: {video_path}")
+    print(f"Detections: {detections_path}")
+
+
+if __name__ == "__main__":
+    main()
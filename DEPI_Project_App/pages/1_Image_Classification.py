@@ -4,7 +4,7 @@ import json
 import streamlit as st
 import pandas as pd
 import numpy as np
-from PIL import Image, ImageFilter, ImageDraw
+from PIL import Image
 import plotly.express as px
 import os
 import time
@@ -17,12 +17,17 @@ from reportlab.pdfgen import canvas
 from datetime import datetime
 import cv2
 import zipfile
-from ultralytics import YOLO
 
-try:
-    face_model = YOLO("DEPI_Project_App/models/face/yolov8n-face-lindevs.pt")
-except:
-    face_model = None
+from utils.blur import blur_pil_regions
+from utils.history_store import history_store
+from utils.history_view import MISSING_ITEM_MESSAGE, history_page, history_session
+from utils.model_registry import get_model
+
+# This page's items in the shared history store; session state only keeps their ids
+HISTORY_KIND = "classification"
+
+# Loaded once per process and shared with the other pages
+face_model = get_model("face")
 
 try:
     from navbar.navbar import render_navbar
@@ -250,26 +255,10 @@ def detect_faces_yolo(image):
 
 
 def apply_smart_face_blur(image, intensity):
-    img = image.copy()
     face_boxes = detect_faces_yolo(image)
     if not face_boxes:
-        return img, False
-    for (x1, y1, x2, y2) in face_boxes:
-        x1 = max(0, x1);
-        y1 = max(0, y1);
-        x2 = min(img.width, x2);
-        y2 = min(img.height, y2)
-        w = x2 - x1;
-        h = y2 - y1
-        if w <= 0 or h <= 0: continue
-        face_region = img.crop((x1, y1, x2, y2))
-        blurred = face_region.filter(ImageFilter.GaussianBlur(radius=intensity / 3))
-        mask = Image.new("L", (w, h), 0)
-        draw = ImageDraw.Draw(mask)
-        draw.rectangle((0, 0, w, h), fill=255)
-        mask = mask.filter(ImageFilter.GaussianBlur(radius=15))
-        img.paste(blurred, (x1, y1), mask)
-    return img, True
+        return image.copy(), False
+    return blur_pil_regions(image, face_boxes, radius=intensity / 3, feather=15), True
 
 
 def generate_full_classification_report(history_item=None):
@@ -577,18 +566,25 @@ def render_history_section():
     st.markdown("---")
     st.markdown(f'<div class="section-header">{ICON_HISTORY} <span>Analysis History</span></div>',
                 unsafe_allow_html=True)
-    if not st.session_state.history:
+    history_ids = history_store.ids(st.session_state.history_ids, HISTORY_KIND)
+    if not history_ids:
         st.markdown(
             """<div class="no-data-box"><p>No analysis records found in this session.</p><small>Process an image to save results here.</small></div>""",
             unsafe_allow_html=True)
         return
-    for i, item in enumerate(reversed(st.session_state.history)):
-        actual_index = len(st.session_state.history) - 1 - i
+    # Only the visible page is read from the store and rendered
+    start, end = history_page(len(history_ids), "clf_history")
+    for i, item_id in enumerate(history_ids[::-1][start:end]):
+        actual_index = len(history_ids) - 1 - (start + i)
+        item = history_store.get(item_id, load_images=False)
+        if item is None:
+            continue
         with st.container():
             col_layout = st.columns([1.2, 4, 1.5])
             with col_layout[0]:
-                display_img = item.get("processed") if item.get("processed") else item["original"]
-                st.image(display_img, use_container_width=True)
+                thumbnail = history_store.thumbnail(item_id)
+                if thumbnail:
+                    st.image(thumbnail, use_container_width=True)
             with col_layout[1]:
                 timestamp = item['timestamp']
                 res = item['class_result']
@@ -599,7 +595,11 @@ def render_history_section():
             with col_layout[2]:
                 st.markdown("<br>", unsafe_allow_html=True)
                 if st.button("View Log", key=f"hist_btn_clf_{actual_index}", use_container_width=True):
-                    view_history_popup(item)
+                    full_item = history_store.get(item_id)
+                    if full_item is None:
+                        st.warning(MISSING_ITEM_MESSAGE)
+                    else:
+                        view_history_popup(full_item)
             st.markdown("<hr style='margin: 5px 0; opacity: 0.1;'>", unsafe_allow_html=True)
 
 
@@ -617,7 +617,7 @@ def main():
     if 'original_image_bytes' not in st.session_state: st.session_state.original_image_bytes = None
     if 'processed_image_bytes' not in st.session_state: st.session_state.processed_image_bytes = None
     if 'camera_enabled' not in st.session_state: st.session_state.camera_enabled = False
-    if 'history' not in st.session_state: st.session_state.history = []
+    if 'history_ids' not in st.session_state: st.session_state.history_ids = []
     if 'blur_mode' not in st.session_state: st.session_state.blur_mode = "None"
     if 'blur_intensity' not in st.session_state: st.session_state.blur_intensity = 30
 
@@ -855,8 +855,9 @@ def main():
                             "blur_mode": st.session_state.blur_mode,
                             "blur_intensity": st.session_state.blur_intensity
                         }
-                        st.session_state.history.append(history_item)
-                        batch_history_temp.append(history_item)
+                        item_id = history_store.add(HISTORY_KIND, history_item, session=history_session())
+                        st.session_state.history_ids.append(item_id)
+                        batch_history_temp.append(item_id)
 
                     except Exception as e:
                         st.error(f"Error processing {file.name}: {e}")
@@ -1009,7 +1010,7 @@ def main():
                 "blur_mode": st.session_state.blur_mode,
                 "blur_intensity": st.session_state.blur_intensity
             }
-            st.session_state.history.append(history_item)
+            st.session_state.history_ids.append(history_store.add(HISTORY_KIND, history_item, session=history_session()))
         except Exception as e:
             st.session_state.error = str(e)
         st.session_state.loading = False
@@ -1020,7 +1021,7 @@ def main():
         zip_buffer = io.BytesIO()
         timestamp_batch = datetime.now().strftime("%Y%m%d_%H%M%S")
         with zipfile.ZipFile(zip_buffer, "a", zipfile.ZIP_DEFLATED, False) as zip_file:
-            for idx, item in enumerate(st.session_state.batch_results_clf):
+            for idx, item in enumerate(history_store.get_many(st.session_state.batch_results_clf)):
                 res_class = item['class_result']['class']
                 img_data = item.get("processed") if item.get("processed") else item["original"]
                 file_name = f"{idx + 1}_{res_class}_{item['timestamp'].replace(':', '-')}.png"
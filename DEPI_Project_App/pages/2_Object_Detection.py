@@ -4,7 +4,7 @@ import json
 import streamlit as st
 import pandas as pd
 import numpy as np
-from PIL import Image, ImageDraw, ImageFilter
+from PIL import Image, ImageDraw
 import plotly.express as px
 import sys
 import os
@@ -19,12 +19,19 @@ from reportlab.pdfgen import canvas
 from datetime import datetime
 import cv2
 import zipfile
-from ultralytics import YOLO
 
-try:
-    face_model = YOLO("DEPI_Project_App/models/face/yolov8n-face-lindevs.pt")
-except:
-    face_model = None
+from utils.annotation import submit_face_detection
+from utils.blur import blur_pil_regions
+from utils.history_store import history_store
+from utils.history_view import MISSING_ITEM_MESSAGE, history_page, history_session
+from utils.model_registry import get_model
+
+FACE_CONFIDENCE = 0.65
+# This page's items in the shared history store; session state only keeps their ids
+HISTORY_KIND = "detection"
+
+# Loaded once per process and shared with the other pages
+face_model = get_model("face")
 
 try:
     from navbar.navbar import render_navbar
@@ -433,23 +440,23 @@ def camera_input_callback():
             st.session_state.camera_enabled = False
 
 
+def start_face_detection(image, blur_mode):
+    """
+    Start the face model on the image in the background when faces will be
+    blurred, so it runs while the detection API call is in flight
+    """
+    if blur_mode != "Blur Faces Only" or face_model is None:
+        return None
+    return submit_face_detection(face_model, [image], conf=FACE_CONFIDENCE)
+
+
 def detect_faces_yolo(image):
     if face_model is None:
         return []
-    results = face_model.predict(image, conf=0.65, verbose=False)
-    face_boxes = []
-
-    for r in results:
-        for box in r.boxes:
-            x1, y1, x2, y2 = box.xyxy[0].cpu().numpy().astype(int)
-            face_boxes.append([x1, y1, x2, y2])
+    return submit_face_detection(face_model, [image], conf=FACE_CONFIDENCE).result()[0]
 
-    return face_boxes
-
-
-def apply_smart_face_blur(image, person_detections, intensity):
-    img = image.copy()
 
+def apply_smart_face_blur(image, person_detections, intensity, face_boxes=None):
     person_boxes = []
     if person_detections:
         for d in person_detections:
@@ -457,14 +464,14 @@ def apply_smart_face_blur(image, person_detections, intensity):
                 person_boxes.append(d['bbox'])
 
     if not person_boxes:
-        return img, False
+        return image.copy(), False
 
-    face_boxes = detect_faces_yolo(image)
+    if face_boxes is None:
+        face_boxes = detect_faces_yolo(image)
     if not face_boxes:
-        return img, False
-
-    detection_occurred = False
+        return image.copy(), False
 
+    human_faces = []
     for (x1, y1, x2, y2) in face_boxes:
         face_center_x = (x1 + x2) / 2
         face_center_y = (y1 + y2) / 2
@@ -477,64 +484,19 @@ def apply_smart_face_blur(image, person_detections, intensity):
                 is_human_face = True
                 break
 
-        if not is_human_face:
-            continue
-
-        detection_occurred = True
-
-        x1 = max(0, x1)
-        y1 = max(0, y1)
-        x2 = min(img.width, x2)
-        y2 = min(img.height, y2)
-
-        w = x2 - x1
-        h = y2 - y1
-
-        if w <= 0 or h <= 0: continue
+        if is_human_face:
+            human_faces.append((x1, y1, x2, y2))
 
-        face_region = img.crop((x1, y1, x2, y2))
-        blurred = face_region.filter(ImageFilter.GaussianBlur(radius=intensity / 3))
-
-        mask = Image.new("L", (w, h), 0)
-        draw = ImageDraw.Draw(mask)
-        draw.rectangle((0, 0, w, h), fill=255)
-        mask = mask.filter(ImageFilter.GaussianBlur(radius=15))
-
-        img.paste(blurred, (x1, y1), mask)
-
-    return img, detection_occurred
+    if not human_faces:
+        return image.copy(), False
+    return blur_pil_regions(image, human_faces, radius=intensity / 3, feather=15), True
 
 
 def apply_general_object_blur(image, detections, intensity):
-    img = image.copy()
     if not detections:
-        return img, False
-
-    for det in detections:
-        bbox = det['bbox']
-        x1, y1, x2, y2 = int(bbox[0]), int(bbox[1]), int(bbox[2]), int(bbox[3])
-
-        x1 = max(0, x1)
-        y1 = max(0, y1)
-        x2 = min(img.width, x2)
-        y2 = min(img.height, y2)
-
-        w = x2 - x1
-        h = y2 - y1
-
-        if w <= 0 or h <= 0: continue
-
-        obj_region = img.crop((x1, y1, x2, y2))
-        blurred = obj_region.filter(ImageFilter.GaussianBlur(radius=intensity / 2))
-
-        mask = Image.new("L", (w, h), 0)
-        draw = ImageDraw.Draw(mask)
-        draw.rectangle((0, 0, w, h), fill=255)
-        mask = mask.filter(ImageFilter.GaussianBlur(radius=5))
-
-        img.paste(blurred, (x1, y1), mask)
-
-    return img, True
+        return image.copy(), False
+    boxes = [det['bbox'] for det in detections]
+    return blur_pil_regions(image, boxes, radius=intensity / 2, feather=5), True
 
 
 def create_analytics_df(detections, img_height):
@@ -1176,7 +1138,8 @@ def render_history_section():
     st.markdown(f'<div class="section-header">{ICON_HISTORY} <span>Analysis History</span></div>',
                 unsafe_allow_html=True)
 
-    if not st.session_state.history:
+    history_ids = history_store.ids(st.session_state.history_ids, HISTORY_KIND)
+    if not history_ids:
         st.markdown("""
         <div class="no-data-box">
             <p>No analysis records found in this session.</p>
@@ -1185,15 +1148,21 @@ def render_history_section():
         """, unsafe_allow_html=True)
         return
 
-    for i, item in enumerate(reversed(st.session_state.history)):
-        actual_index = len(st.session_state.history) - 1 - i
+    # Only the visible page is read from the store and rendered
+    start, end = history_page(len(history_ids), "det_history")
+    for i, item_id in enumerate(history_ids[::-1][start:end]):
+        actual_index = len(history_ids) - 1 - (start + i)
+        item = history_store.get(item_id, load_images=False)
+        if item is None:
+            continue
 
         with st.container():
             col_layout = st.columns([1.2, 4, 1.5])
 
             with col_layout[0]:
-                if item.get("processed"):
-                    st.image(item["processed"], use_container_width=True)
+                thumbnail = history_store.thumbnail(item_id)
+                if thumbnail:
+                    st.image(thumbnail, use_container_width=True)
 
             with col_layout[1]:
                 timestamp = item['timestamp']
@@ -1214,7 +1183,11 @@ def render_history_section():
             with col_layout[2]:
                 st.markdown("<br>", unsafe_allow_html=True)
                 if st.button("View Log", key=f"hist_btn_{actual_index}", use_container_width=True):
-                    view_history_popup(item)
+                    full_item = history_store.get(item_id)
+                    if full_item is None:
+                        st.warning(MISSING_ITEM_MESSAGE)
+                    else:
+                        view_history_popup(full_item)
 
             st.markdown("<hr style='margin: 5px 0; opacity: 0.1;'>", unsafe_allow_html=True)
 
@@ -1237,7 +1210,7 @@ def main():
     if 'blur_mode' not in st.session_state: st.session_state.blur_mode = "None"
     if 'blur_intensity' not in st.session_state: st.session_state.blur_intensity = 30
 
-    if 'history' not in st.session_state: st.session_state.history = []
+    if 'history_ids' not in st.session_state: st.session_state.history_ids = []
     if 'view_history_index' not in st.session_state: st.session_state.view_history_index = None
 
     if 'camera_enabled' not in st.session_state: st.session_state.camera_enabled = False
@@ -1507,10 +1480,12 @@ def main():
                         img_for_processing = Image.open(io.BytesIO(file_bytes))
                         img_height = img_for_processing.height
 
+                        faces = start_face_detection(img_for_processing, st.session_state.blur_mode)
                         start_time = time.time()
                         detections = detect_objects(img_for_processing, threshold=confidence_threshold)
                         end_time = time.time()
                         inf_time = end_time - start_time
+                        face_boxes = faces.result()[0] if faces else None
 
                         if st.session_state.selected_classes_filter:
                             filter_set = set(k.lower() for k in st.session_state.selected_classes_filter)
@@ -1523,7 +1498,7 @@ def main():
                             result_img = img_for_processing.copy()
                             if st.session_state.blur_mode == "Blur Faces Only":
                                 result_img, _ = apply_smart_face_blur(result_img, filtered,
-                                                                      st.session_state.blur_intensity)
+                                                                      st.session_state.blur_intensity, face_boxes)
                             elif st.session_state.blur_mode == "Blur Detected Objects":
                                 result_img, _ = apply_general_object_blur(result_img, filtered,
                                                                           st.session_state.blur_intensity)
@@ -1546,8 +1521,9 @@ def main():
                             "blur_mode": st.session_state.blur_mode,
                             "blur_intensity": st.session_state.blur_intensity
                         }
-                        st.session_state.history.append(history_item)
-                        batch_history_temp.append(history_item)
+                        item_id = history_store.add(HISTORY_KIND, history_item, session=history_session())
+                        st.session_state.history_ids.append(item_id)
+                        batch_history_temp.append(item_id)
 
                     except Exception as e:
                         st.error(f"Error processing {file.name}: {e}")
@@ -1616,7 +1592,7 @@ def main():
             zip_buffer = io.BytesIO()
             timestamp_batch = datetime.now().strftime("%Y%m%d_%H%M%S")
             with zipfile.ZipFile(zip_buffer, "a", zipfile.ZIP_DEFLATED, False) as zip_file:
-                for idx, item in enumerate(st.session_state.batch_results):
+                for idx, item in enumerate(history_store.get_many(st.session_state.batch_results)):
                     if item.get("processed"):
                         file_name = f"result_{idx + 1}_{item['timestamp'].replace(':', '-')}.png"
                         zip_file.writestr(file_name, item['processed'])
@@ -1711,11 +1687,13 @@ def main():
 
             img_for_processing = Image.open(io.BytesIO(st.session_state.original_image_bytes))
             img_height = img_for_processing.height
+            faces = start_face_detection(img_for_processing, st.session_state.blur_mode)
             start_time = time.time()
 
             detections = detect_objects(img_for_processing, threshold=confidence_threshold)
             end_time = time.time()
             st.session_state.inference_time = end_time - start_time
+            face_boxes = faces.result()[0] if faces else None
 
             if st.session_state.selected_classes_filter:
                 filter_set = set(k.lower() for k in st.session_state.selected_classes_filter)
@@ -1730,7 +1708,8 @@ def main():
                 result_img = img_for_processing.copy()
 
                 if st.session_state.blur_mode == "Blur Faces Only":
-                    result_img, _ = apply_smart_face_blur(result_img, filtered, st.session_state.blur_intensity)
+                    result_img, _ = apply_smart_face_blur(result_img, filtered, st.session_state.blur_intensity,
+                                                          face_boxes)
 
                 elif st.session_state.blur_mode == "Blur Detected Objects":
                     result_img, _ = apply_general_object_blur(result_img, filtered, st.session_state.blur_intensity)
@@ -1754,7 +1733,7 @@ def main():
                 "blur_mode": st.session_state.blur_mode,
                 "blur_intensity": st.session_state.blur_intensity
             }
-            st.session_state.history.append(history_item)
+            st.session_state.history_ids.append(history_store.add(HISTORY_KIND, history_item, session=history_session()))
 
         except Exception as e:
             st.session_state.error = str(e)
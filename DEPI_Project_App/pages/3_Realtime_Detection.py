@@ -8,7 +8,6 @@ import base64
 import io
 from PIL import Image, ImageFilter, ImageDraw
 from datetime import datetime
-from ultralytics import YOLO
 import plotly.express as px
 
 from reportlab.lib.pagesizes import A4
@@ -17,6 +16,19 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib import colors
 from reportlab.lib.units import inch
 
+from utils.realtime import (RealtimePipeline, AdaptiveDetectionInterval, VideoSource, MEDIA_DIR,
+                            list_media_files, resolve_media_file, validate_stream_url)
+from utils.tracking import BoxTracker, TrackLog, footage_time
+from utils.annotation import PRIVACY_MODES, annotate_frame, detect_objects, privacy_boxes, submit_face_detection
+from utils.model_registry import get_model, memory_usage
+from utils.history_store import file_thumbnail
+from utils.history_view import history_page
+
+# Detections between this and the confidence threshold only keep existing tracks alive (ByteTrack-style)
+TRACK_LOW_CONFIDENCE = 0.1
+# Live sessions (webcam/stream) stop after this long; recordings run to the end
+LIVE_SESSION_LIMIT_SEC = 60
+
 # --- ICONS & ASSETS ---
 ICON_CAMERA_SVG = """
 <svg xmlns="http://www.w3.org/2000/svg" width="256" height="256" viewBox="0 0 16 16" fill="none" stroke="#00CCFF" stroke-width="1.5">
@@ -194,54 +206,9 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 
-@st.cache_resource
 def load_models():
-    models = {}
-    try:
-        models['yolo'] = YOLO("yolov8n.pt")
-
-        face_path = os.path.join(ROOT_DIR, "models", "face", "yolov8n-face-lindevs.pt")
-
-        if os.path.exists(face_path):
-            models['face'] = YOLO(face_path)
-        else:
-            models['face'] = None
-            print(f"Face model not found at: {face_path}")
-
-    except Exception as e:
-        models['yolo'] = YOLO("yolov8n.pt")
-        models['face'] = None
-        print(f"Error loading models: {e}")
-    return models
-
-
-def detect_faces_yolo(image, face_model):
-    if face_model is None:
-        return []
-    results = face_model.predict(image, conf=0.5, verbose=False)
-    face_boxes = []
-    for r in results:
-        for box in r.boxes:
-            x1, y1, x2, y2 = box.xyxy[0].cpu().numpy().astype(int)
-            face_boxes.append([x1, y1, x2, y2])
-    return face_boxes
-
-
-def apply_blur_cv2_smart(frame, box, intensity):
-    x1, y1, x2, y2 = box
-    h, w = frame.shape[:2]
-    x1, y1 = max(0, x1), max(0, y1)
-    x2, y2 = min(w, x2), min(h, y2)
-    if x2 <= x1 or y2 <= y1: return frame
-
-    roi = frame[y1:y2, x1:x2]
-    k_size = (intensity * 2) + 1
-    try:
-        blurred_roi = cv2.GaussianBlur(roi, (k_size, k_size), 0)
-        frame[y1:y2, x1:x2] = blurred_roi
-    except:
-        pass
-    return frame
+    # Shared, process-wide instances (see utils/model_registry.py); None if a model is unavailable
+    return {'yolo': get_model("object"), 'face': get_model("face")}
 
 
 def save_snapshot(frame, run_id):
@@ -400,13 +367,14 @@ def main():
 
     if 'history' not in st.session_state: st.session_state.history = []
     if 'run_rt' not in st.session_state: st.session_state.run_rt = False
-    if 'rt_logs' not in st.session_state: st.session_state.rt_logs = []
+    if 'rt_track_log' not in st.session_state: st.session_state.rt_track_log = TrackLog()
     if 'rt_snapshots' not in st.session_state: st.session_state.rt_snapshots = []
     if 'last_snap_time' not in st.session_state: st.session_state.last_snap_time = 0
     if 'show_stop_dialog' not in st.session_state: st.session_state.show_stop_dialog = False
     if 'start_time_ref' not in st.session_state: st.session_state.start_time_ref = 0
     if 'accumulated_time' not in st.session_state: st.session_state.accumulated_time = 0
     if 'temp_session_data' not in st.session_state: st.session_state.temp_session_data = None
+    if 'rt_source_position' not in st.session_state: st.session_state.rt_source_position = 0.0
 
     st.markdown(f"""
             <div class="main-header-container">
@@ -481,9 +449,29 @@ def main():
         st.markdown(f'<div class="section-header">{ICON_SETTINGS} <span>Configuration</span></div>',
                     unsafe_allow_html=True)
 
+        source_type = st.selectbox("Input Source:", options=["Webcam", "Video File", "Stream URL"], index=0,
+                                   disabled=st.session_state.run_rt)
+        source_uri = 0
+        if source_type == "Video File":
+            source_uri = st.selectbox("Video file", options=list_media_files(), index=None,
+                                      placeholder="Choose a video", help=f"Videos in {MEDIA_DIR}",
+                                      disabled=st.session_state.run_rt) or ""
+        elif source_type == "Stream URL":
+            source_uri = st.text_input("Stream URL", placeholder="rtsp://192.168.1.20:8554/lot",
+                                       disabled=st.session_state.run_rt)
+        sample_fps = st.number_input("Sample Rate (frames/s, 0 = every frame)", 0.0, 30.0, 0.0, 0.5,
+                                     help="Process only this many frames per second of video",
+                                     disabled=st.session_state.run_rt)
+
         conf_threshold = st.slider("Confidence Threshold", 0.1, 0.9, 0.5, 0.05)
         max_detections = st.slider("Maximum Detections", 1, 50, 20, 1)
 
+        detection_mode = st.selectbox("Detection Mode:", options=["Every Frame", "Adaptive + Tracking"], index=0,
+                                      help="Adaptive runs the detector every few frames and tracks boxes in between")
+        target_fps = 25
+        if detection_mode == "Adaptive + Tracking":
+            target_fps = st.slider("Target FPS", 10, 30, 25, 1)
+
         st.markdown("<br>", unsafe_allow_html=True)
         st.markdown(f'<div class="section-header">{ICON_FILTER} <span>Target Filter</span></div>',
                     unsafe_allow_html=True)
@@ -497,7 +485,7 @@ def main():
                     unsafe_allow_html=True)
 
         privacy_mode = st.selectbox("Select Privacy/Blurring Mode:",
-                                    options=["None", "Blur Faces Only", "Blur Whole Person"], index=0)
+                                    options=PRIVACY_MODES, index=0)
 
         blur_intensity = 0
         if privacy_mode != "None":
@@ -522,7 +510,7 @@ def main():
     with col_data:
         st.markdown('<div class="section-header"><i class="bi bi-graph-up-arrow"></i> Live Metrics</div>',
                     unsafe_allow_html=True)
-        kpi_container = st.container(height=200, border=True)
+        kpi_container = st.container(height=260, border=True)
         with kpi_container: kpi_placeholder = st.empty()
 
         st.markdown('<br><div class="section-header"><i class="bi bi-list-check"></i> Events Log</div>',
@@ -533,7 +521,8 @@ def main():
     if start_btn:
         st.session_state.run_rt = True
         st.session_state.show_stop_dialog = False
-        st.session_state.rt_logs = []
+        st.session_state.rt_track_log = TrackLog()
+        st.session_state.rt_source_position = 0.0
         st.session_state.rt_snapshots = []
         st.session_state.temp_session_data = None
         st.session_state.accumulated_time = 0
@@ -543,161 +532,225 @@ def main():
     if st.session_state.run_rt:
         models = load_models()
         model = models['yolo']
-        cap = cv2.VideoCapture(0)
-
-
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-
-        if not cap.isOpened():
-            st.error("Optical Sensor Unavailable!")
+        filter_set = set(k.lower() for k in selected_filters)
+
+        # Only allow-listed media files and stream hosts reach OpenCV/FFmpeg
+        source_error = None
+        try:
+            if source_type == "Video File" and source_uri:
+                source_uri = resolve_media_file(source_uri)
+            elif source_type == "Stream URL" and source_uri:
+                source_uri = validate_stream_url(source_uri)
+        except ValueError as e:
+            source_error = str(e)
+
+        # Resuming a paused recording continues where it stopped
+        source = VideoSource(source_uri, sample_fps=sample_fps, frame_size=(640, 480),
+                             start_position=st.session_state.rt_source_position)
+
+        blur_faces = privacy_mode == "Blur Faces Only"
+        object_tracker = BoxTracker()
+        face_tracker = BoxTracker()
+        detection_interval = AdaptiveDetectionInterval(target_fps=target_fps)
+
+        def detect(rgb_frame):
+            # The face model runs alongside the object model rather than after it
+            faces = submit_face_detection(models['face'], [rgb_frame]) if blur_faces else None
+            detections, low_detections = detect_objects(model, [rgb_frame], conf_threshold, max_detections,
+                                                        TRACK_LOW_CONFIDENCE)[0]
+            face_boxes = faces.result()[0] if faces else []
+            return detections, low_detections, face_boxes
+
+        def process_frame(frame):
+            # Runs on the inference worker thread: model calls only, no Streamlit.
+            # Move every track to this frame, then correct them when the detector runs
+            object_tracker.predict()
+            face_tracker.predict()
+            blur_boxes = []
+            if detection_mode == "Every Frame" or detection_interval.should_detect():
+                start = time.perf_counter()
+                detections, low_detections, face_boxes = detect(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+                object_tracker.update(detections, low_detections)
+                face_tracker.update([(fb, "face", 1.0) for fb in face_boxes])
+                detection_interval.record_detection(time.perf_counter() - start,
+                                                    pipeline.stats["capture"].snapshot()["fps"])
+                # Blur what the detectors found on this frame; track predictions only cover skipped frames
+                blur_boxes = privacy_boxes(privacy_mode, detections + low_detections, face_boxes)
+
+            tracked_boxes = object_tracker.outputs(frame.shape)[:max_detections]
+            blur_boxes += [tracked.box for tracked in face_tracker.outputs(frame.shape)]
+            return tracked_boxes, blur_boxes
+
+        pipeline = RealtimePipeline(source, process_frame)
+
+        if model is None:
+            st.error("Object detection model could not be loaded.")
+            st.session_state.run_rt = False
+        elif blur_faces and models['face'] is None:
+            # Refuse rather than show and snapshot unblurred faces (batch_video.py does the same)
+            st.error("Face detection model could not be loaded, so faces can't be blurred. "
+                     "Choose another privacy mode or try again later.")
+            st.session_state.run_rt = False
+        elif source.kind != "camera" and not source_uri:
+            st.error("Choose a video file or enter a stream URL first.")
+            st.session_state.run_rt = False
+        elif source_error:
+            st.error(source_error)
+            st.session_state.run_rt = False
+        elif not pipeline.start():
+            st.error("Optical Sensor Unavailable!" if source.kind == "camera" else f"Could not open {source_uri}")
             st.session_state.run_rt = False
         else:
             frame_count = 0
             last_ui_update = time.time()
 
+            try:
+                while st.session_state.run_rt and pipeline.running:
+                    packet = pipeline.get_result(timeout=0.5)
+                    if packet is None: continue
+                    render_started = time.perf_counter()
+
+                    current_time = time.time()
+                    elapsed_in_this_run = current_time - st.session_state.start_time_ref
+                    total_elapsed = st.session_state.accumulated_time + elapsed_in_this_run
+
+
+                    if source.is_live and total_elapsed >= LIVE_SESSION_LIMIT_SEC:
+                        st.toast(f"Session Complete: {LIVE_SESSION_LIMIT_SEC}s Limit Reached", icon="🏁")
+                        session_summary = {"id": len(st.session_state.history) + 1,
+                                           "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                                           "duration": total_elapsed, "frames_count": frame_count,
+                                           "snapshots": list(st.session_state.rt_snapshots),
+                                           "df": pd.DataFrame(st.session_state.rt_track_log.records())}
+                        st.session_state.history.append(session_summary)
+                        st.session_state.run_rt = False
+                        st.session_state.accumulated_time = 0
+                        st.rerun()
+                        break
+
+
+                    if source.is_live:
+                        remaining = LIVE_SESSION_LIMIT_SEC - total_elapsed
+                        progress = min(total_elapsed / LIVE_SESSION_LIMIT_SEC, 1.0)
+                        status_text = f"{remaining:.1f}s REMAINING"
+                    else:
+                        position = packet.position or 0.0
+                        st.session_state.rt_source_position = position
+                        progress = min(position / pipeline.duration, 1.0) if pipeline.duration else 0.0
+                        status_text = f"{position:.1f}s / {pipeline.duration or 0:.1f}s"
+                    timer_placeholder.markdown(
+                        f"""<div style="display:flex; justify-content:space-between; color:#00CCFF; font-size:0.8rem; margin-bottom:2px; font-weight:bold;"><span><i class="bi bi-record-circle-fill" style="color:#FF4136;"></i> RECORDING</span><span>{status_text}</span></div><div class="timer-container"><div class="timer-bar" style="width: {progress * 100}%;"></div></div>""",
+                        unsafe_allow_html=True)
 
-            while st.session_state.run_rt:
-                ret, frame = cap.read()
-                if not ret: break
-
-                current_time = time.time()
-                elapsed_in_this_run = current_time - st.session_state.start_time_ref
-                total_elapsed = st.session_state.accumulated_time + elapsed_in_this_run
-
-
-                if total_elapsed >= 60:
-                    st.toast("Session Complete: 60s Limit Reached", icon="🏁")
-                    session_summary = {"id": len(st.session_state.history) + 1,
-                                       "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                                       "duration": total_elapsed, "frames_count": frame_count,
-                                       "snapshots": list(st.session_state.rt_snapshots),
-                                       "df": pd.DataFrame(list(st.session_state.rt_logs))}
-                    st.session_state.history.append(session_summary)
-                    st.session_state.run_rt = False
-                    st.session_state.accumulated_time = 0
-                    st.rerun()
-                    break
-
-
-                remaining = 60 - total_elapsed
-                progress = min(total_elapsed / 60.0, 1.0)
-                timer_placeholder.markdown(
-                    f"""<div style="display:flex; justify-content:space-between; color:#00CCFF; font-size:0.8rem; margin-bottom:2px; font-weight:bold;"><span><i class="bi bi-record-circle-fill" style="color:#FF4136;"></i> RECORDING</span><span>{remaining:.1f}s REMAINING</span></div><div class="timer-container"><div class="timer-bar" style="width: {progress * 100}%;"></div></div>""",
-                    unsafe_allow_html=True)
-
-
-                frame = cv2.resize(frame, (640, 480))
-                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-
-                results = model.predict(rgb_frame, conf=conf_threshold, verbose=False)
-
-                current_detections = []
-                final_boxes_for_drawing = []
-                filter_set = set(k.lower() for k in selected_filters)
-
-                processed_frame = frame.copy()
-
-                for result in results:
-                    boxes = result.boxes.cpu().numpy()
-                    if len(boxes) > max_detections: boxes = boxes[:max_detections]
-                    for box in boxes:
-                        label = result.names[int(box.cls[0])]
-                        conf = float(box.conf[0])
-                        r = box.xyxy[0].astype(int)
-
-                        if privacy_mode == "Blur Whole Person" and label.lower() == "person":
-                            processed_frame = apply_blur_cv2_smart(processed_frame, r, blur_intensity)
-
-                        if not filter_set or label.lower() in filter_set:
-
-                            current_detections.append({"Timestamp": datetime.now().strftime("%H:%M:%S"), "Class": label,
-                                                       "Confidence": conf, "BBox": r})
-                            final_boxes_for_drawing.append((r, label, conf))
-
-                if privacy_mode == "Blur Faces Only" and models['face']:
-                    face_boxes = detect_faces_yolo(rgb_frame, models['face'])
-                    for fb in face_boxes:
-                        processed_frame = apply_blur_cv2_smart(processed_frame, fb, blur_intensity)
-
-                if show_boxes:
-                    for (r, label, conf) in final_boxes_for_drawing:
-                        x1, y1, x2, y2 = r
-                        color = (255, 204, 0)
-                        cv2.rectangle(processed_frame, (x1, y1), (x2, y2), color, 1)
-                        text = f"{label.upper()} {conf:.0%}"
-                        (w, h), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
-                        cv2.rectangle(processed_frame, (x1, y1 - 20), (x1 + w, y1), color, -1)
-                        cv2.putText(processed_frame, text, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
-
-                final_rgb = cv2.cvtColor(processed_frame, cv2.COLOR_BGR2RGB)
-
-
-                video_container.image(final_rgb, channels="RGB", use_container_width=True)
-
-                if current_detections:
-                    log_entries = [{k: v for k, v in d.items() if k != 'BBox'} for d in current_detections]
-                    st.session_state.rt_logs.extend(log_entries)
-                    if enable_snapshot and (time.time() - st.session_state.last_snap_time > snapshot_interval):
-                        path = save_snapshot(final_rgb, "auto")
-                        st.session_state.rt_snapshots.append(
-                            {"path": path, "time": datetime.now().strftime("%H:%M:%S")})
-                        st.session_state.last_snap_time = time.time()
-
-                frame_count += 1
-
-                # Update Temp Session Data structure without creating full DF
-                st.session_state.temp_session_data = {
-                    "id": len(st.session_state.history) + 1,
-                    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    "duration": total_elapsed,
-                    "frames_count": frame_count,
-                    "snapshots": list(st.session_state.rt_snapshots),
-                    "df": None  # Defer DataFrame creation until save/stop
-                }
 
-                # --- THROTTLED UI UPDATES (Only update every 0.5 seconds) ---
-                if current_time - last_ui_update > 0.5:
-                    with kpi_placeholder.container():
-                        fps = frame_count / total_elapsed if total_elapsed > 0 else 0
-                        k1, k2 = st.columns(2)
-                        with k1:
-                            st.markdown(
-                                f"""<div class="summary-metric-card"><div class="label">FPS</div><div class="value">{fps:.1f}</div><div class="sub-text positive">Live</div></div>""",
-                                unsafe_allow_html=True)
-                            st.markdown("<br>", unsafe_allow_html=True)
-                            blur_c = "positive" if privacy_mode != "None" else "neutral"
-                            st.markdown(
-                                f"""<div class="summary-metric-card"><div class="label">Privacy</div><div class="value" style="font-size:1rem;">{privacy_mode.split(' ')[0]}</div><div class="sub-text {blur_c}">Active</div></div>""",
-                                unsafe_allow_html=True)
-                        with k2:
-                            st.markdown(
-                                f"""<div class="summary-metric-card"><div class="label">Objects</div><div class="value">{len(current_detections)}</div><div class="sub-text neutral">Current</div></div>""",
-                                unsafe_allow_html=True)
-                            st.markdown("<br>", unsafe_allow_html=True)
+                    tracked_boxes, blur_boxes = packet.result
+
+                    # The packet's frame is not used by any other stage, so draw on it directly
+                    processed_frame = packet.frame
+                    current_detections = annotate_frame(processed_frame, tracked_boxes, blur_boxes, privacy_mode,
+                                                        blur_intensity, filter_set, show_boxes)
+
+                    final_rgb = cv2.cvtColor(processed_frame, cv2.COLOR_BGR2RGB)
+
+
+                    video_container.image(final_rgb, channels="RGB", use_container_width=True)
+                    pipeline.rendered(packet, render_started)
+
+                    if current_detections:
+                        # Files are processed faster or slower than they play, so log them in footage time
+                        observed_at = footage_time(packet.position) if packet.position is not None else datetime.now()
+                        # One row per tracked object, updated in place rather than one row per box per frame
+                        st.session_state.rt_track_log.observe(current_detections, observed_at)
+                        if enable_snapshot and (time.time() - st.session_state.last_snap_time > snapshot_interval):
+                            path = save_snapshot(final_rgb, "auto")
+                            st.session_state.rt_snapshots.append(
+                                {"path": path, "time": observed_at.strftime("%H:%M:%S")})
+                            st.session_state.last_snap_time = time.time()
+
+                    frame_count += 1
+
+                    # Update Temp Session Data structure without creating full DF
+                    st.session_state.temp_session_data = {
+                        "id": len(st.session_state.history) + 1,
+                        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                        "duration": total_elapsed,
+                        "frames_count": frame_count,
+                        "snapshots": list(st.session_state.rt_snapshots),
+                        "df": None  # Defer DataFrame creation until save/stop
+                    }
+
+                    # --- THROTTLED UI UPDATES (Only update every 0.5 seconds) ---
+                    if current_time - last_ui_update > 0.5:
+                        stage_stats = pipeline.snapshot()
+                        with kpi_placeholder.container():
+                            fps = stage_stats["render"]["fps"]
+                            k1, k2 = st.columns(2)
+                            with k1:
+                                st.markdown(
+                                    f"""<div class="summary-metric-card"><div class="label">FPS</div><div class="value">{fps:.1f}</div><div class="sub-text positive">{stage_stats['end_to_end_ms']:.0f} ms latency</div></div>""",
+                                    unsafe_allow_html=True)
+                                st.markdown("<br>", unsafe_allow_html=True)
+                                blur_c = "positive" if privacy_mode != "None" else "neutral"
+                                st.markdown(
+                                    f"""<div class="summary-metric-card"><div class="label">Privacy</div><div class="value" style="font-size:1rem;">{privacy_mode.split(' ')[0]}</div><div class="sub-text {blur_c}">Active</div></div>""",
+                                    unsafe_allow_html=True)
+                            with k2:
+                                st.markdown(
+                                    f"""<div class="summary-metric-card"><div class="label">Objects</div><div class="value">{len(current_detections)}</div><div class="sub-text neutral">Current</div></div>""",
+                                    unsafe_allow_html=True)
+                                st.markdown("<br>", unsafe_allow_html=True)
+                                st.markdown(
+                                    f"""<div class="summary-metric-card"><div class="label">Unique Objects</div><div class="value" style="font-size:1.5rem;">{len(st.session_state.rt_track_log)}</div><div class="sub-text neutral">Session</div></div>""",
+                                    unsafe_allow_html=True)
+                            stage_text = " &nbsp;|&nbsp; ".join(
+                                f"{name.upper()} {stage_stats[name]['fps']:.1f} FPS / {stage_stats[name]['latency_ms']:.0f} ms"
+                                for name in ("capture", "inference", "render"))
+                            if detection_mode != "Every Frame":
+                                stage_text += f" &nbsp;|&nbsp; DETECT 1/{detection_interval.interval}"
+                            memory = memory_usage()
+                            if memory["process_rss_mb"] is not None:
+                                stage_text += (f" &nbsp;|&nbsp; MEM {memory['process_rss_mb']:.0f} MB"
+                                               f" (MODELS {memory['models_mb']:.0f} MB)")
                             st.markdown(
-                                f"""<div class="summary-metric-card"><div class="label">Total Detected</div><div class="value" style="font-size:1.5rem;">{len(st.session_state.rt_logs)}</div><div class="sub-text neutral">Session</div></div>""",
+                                f"""<div class="hist-meta" style="text-align:center; margin-top:10px;">{stage_text} &nbsp;|&nbsp; DROPPED {stage_stats['dropped_frames']}</div>""",
                                 unsafe_allow_html=True)
 
-                    with log_placeholder.container():
-                        if st.session_state.rt_logs:
-                            # Only create a small slice DF for display
-                            df_display = pd.DataFrame(st.session_state.rt_logs[-10:])
-                            if not df_display.empty:
-                                df_display = df_display.iloc[::-1][["Timestamp", "Class", "Confidence"]].copy()
-                                df_display["Confidence"] = df_display["Confidence"].apply(lambda x: f"{x:.0%}")
+                        with log_placeholder.container():
+                            track_log = st.session_state.rt_track_log
+                            if len(track_log):
+                                unique_counts = track_log.unique_counts()
+                                st.caption(" · ".join(f"{label}: {count}" for label, count in
+                                                      sorted(unique_counts.items(), key=lambda item: -item[1])))
+                                # Only the 10 most recently seen objects
+                                df_display = pd.DataFrame(track_log.records()).sort_values("Last Seen").tail(10)
+                                df_display = df_display.iloc[::-1][["Track ID", "Class", "Last Seen", "Dwell (s)", "Max Confidence"]].copy()
+                                df_display["Max Confidence"] = df_display["Max Confidence"].apply(lambda x: f"{x:.0%}")
                                 st.dataframe(df_display, use_container_width=True, hide_index=True)
-                        else:
-                            st.caption("Waiting for detections...")
+                            else:
+                                st.caption("Waiting for detections...")
 
-                    last_ui_update = current_time
+                        last_ui_update = current_time
+            finally:
+                # Also runs when STOP or the time limit reruns the script mid-loop
+                pipeline.stop()
 
-            cap.release()
+            if pipeline.error:
+                st.error(f"Detection stopped: {pipeline.error}")
 
             # Finalize Session Data if stopped naturally
             if st.session_state.temp_session_data:
-                st.session_state.temp_session_data["df"] = pd.DataFrame(list(st.session_state.rt_logs))
+                st.session_state.temp_session_data["df"] = pd.DataFrame(st.session_state.rt_track_log.records())
+
+            # A recording that played to the end is saved like a session that hit the time limit
+            if not source.is_live and st.session_state.run_rt and not pipeline.error:
+                st.toast("Recording Complete", icon="🏁")
+                if st.session_state.temp_session_data:
+                    st.session_state.history.append(st.session_state.temp_session_data)
+                st.session_state.temp_session_data = None
+                st.session_state.run_rt = False
+                st.session_state.accumulated_time = 0
+                st.session_state.rt_source_position = 0.0
+                st.rerun()
 
     else:
         video_container.markdown(
@@ -714,12 +767,15 @@ def main():
     if not st.session_state.history:
         st.info("No recorded sessions yet.")
     else:
-        for session in reversed(st.session_state.history):
+        # Only the visible page is rendered, with cached thumbnails instead of full snapshots
+        start, end = history_page(len(st.session_state.history), "rt_history")
+        for session in st.session_state.history[::-1][start:end]:
             with st.container():
                 c_img, c_info, c_action = st.columns([1, 3, 1])
                 with c_img:
-                    if session['snapshots']:
-                        st.image(session['snapshots'][0]['path'], use_container_width=True)
+                    thumbnail = file_thumbnail(session['snapshots'][0]['path']) if session['snapshots'] else None
+                    if thumbnail:
+                        st.image(thumbnail, use_container_width=True)
                     else:
                         st.markdown(
                             '<div style="height:80px; background:rgba(0,204,255,0.05); border:1px dashed #00CCFF; border-radius:4px;"></div>',
@@ -14,6 +14,12 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.lib import colors
 
+from utils.history_store import history_store
+from utils.history_view import MISSING_ITEM_MESSAGE, history_page, history_session
+
+# This page's items in the shared history store; session state only keeps their ids
+HISTORY_KIND = "car"
+
 try:
     from api_client_car import call_car_model
 except ImportError:
@@ -322,7 +328,7 @@ def main():
     st.markdown('<div class="body-bg"></div>', unsafe_allow_html=True)
     render_navbar()
 
-    if 'history' not in st.session_state: st.session_state.history = []
+    if 'history_ids' not in st.session_state: st.session_state.history_ids = []
     if 'car_loading' not in st.session_state: st.session_state.car_loading = False
     if 'car_result' not in st.session_state: st.session_state.car_result = None
     if 'uploaded_car_bytes' not in st.session_state: st.session_state.uploaded_car_bytes = None
@@ -412,7 +418,7 @@ def main():
                             "predictions": result.get("predictions", {}),
                             "inference_time": end_time - start_time
                         }
-                        st.session_state.history.append(history_entry)
+                        st.session_state.history_ids.append(history_store.add(HISTORY_KIND, history_entry, session=history_session()))
 
                     st.rerun()
 
@@ -505,7 +511,8 @@ def render_history_section():
     st.markdown(f'<div class="section-header">{ICON_HISTORY} <span>Recent Inspections</span></div>',
                 unsafe_allow_html=True)
 
-    if not st.session_state.history:
+    history_ids = history_store.ids(st.session_state.history_ids, HISTORY_KIND)
+    if not history_ids:
         st.markdown("""
             <div class="no-data-box">
                 <p>No vehicle inspections recorded yet.</p>
@@ -514,8 +521,13 @@ def render_history_section():
         """, unsafe_allow_html=True)
         return
 
-    for i, item in enumerate(reversed(st.session_state.history)):
-        idx = len(st.session_state.history) - 1 - i
+    # Only the visible page is read from the store and rendered
+    start, end = history_page(len(history_ids), "car_history")
+    for i, item_id in enumerate(history_ids[::-1][start:end]):
+        idx = len(history_ids) - 1 - (start + i)
+        item = history_store.get(item_id, load_images=False)
+        if item is None:
+            continue
 
         try:
             dt = datetime.strptime(item['timestamp'], "%Y-%m-%d %H:%M:%S")
@@ -526,7 +538,9 @@ def render_history_section():
         with st.container():
             c1, c2, c3 = st.columns([1, 3, 1])
             with c1:
-                st.image(item['original'], use_container_width=True)
+                thumbnail = history_store.thumbnail(item_id)
+                if thumbnail:
+                    st.image(thumbnail, use_container_width=True)
             with c2:
                 preds = item['predictions']
                 make = preds.get('make', {}).get('class_name', '?')
@@ -543,9 +557,13 @@ def render_history_section():
                 """, unsafe_allow_html=True)
             with c3:
                 if st.button("PDF", key=f"hist_pdf_{idx}", use_container_width=True):
-                    pdf_bytes, fname = generate_car_report(item)
-                    if pdf_bytes:
-                        st.download_button("Download", pdf_bytes, fname, "application/pdf", key=f"dl_hist_{idx}")
+                    full_item = history_store.get(item_id)
+                    if full_item is None:
+                        st.warning(MISSING_ITEM_MESSAGE)
+                    else:
+                        pdf_bytes, fname = generate_car_report(full_item)
+                        if pdf_bytes:
+                            st.download_button("Download", pdf_bytes, fname, "application/pdf", key=f"dl_hist_{idx}")
 
             st.markdown("<hr style='opacity:0.1; margin:5px 0;'>", unsafe_allow_html=True)
 
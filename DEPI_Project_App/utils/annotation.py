@@ -0,0 +1,124 @@
+"""
+Detection, privacy blur and annotation helpers for DEPI system
+
+Shared by the realtime page and the offline batch video job so both produce
+the same boxes, blurring and labels. Model calls accept a list of frames and
+return one result per frame, so callers can batch inference.
+
+In privacy mode the face model runs on its own thread (submit_face_detection)
+while the caller runs the object model on the same frames; both spend their
+time in torch/OpenCV code that releases the GIL, so the two overlap instead of
+adding up.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+from utils.blur import blur_regions
+
+BOX_COLOR = (255, 204, 0)
+PRIVACY_MODES = ["None", "Blur Faces Only", "Blur Whole Person"]
+FACE_CONFIDENCE = 0.5
+
+# A single worker, so calls to a face model never overlap (YOLO predictors aren't thread-safe)
+_face_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="face-detect")
+
+
+def detect_objects(model, frames, conf_threshold, max_detections, low_confidence=None):
+    """
+    Run the object model on a list of RGB frames.
+
+    Returns one (detections, low_detections) pair per frame, each a list of
+    (box xyxy, label, confidence). Detections between `low_confidence` and
+    `conf_threshold` go to low_detections, which only keep existing tracks
+    alive (see tracking.BoxTracker.update).
+    """
+    if not frames:
+        return []
+    low_confidence = conf_threshold if low_confidence is None else min(low_confidence, conf_threshold)
+    results = model.predict(list(frames), conf=low_confidence, verbose=False)
+
+    outputs = []
+    for result in results:
+        detections, low_detections = [], []
+        for box in result.boxes.cpu().numpy():
+            det = (box.xyxy[0].astype(int), result.names[int(box.cls[0])], float(box.conf[0]))
+            if det[2] < conf_threshold:
+                low_detections.append(det)
+            elif len(detections) < max_detections:
+                detections.append(det)
+        outputs.append((detections, low_detections))
+    return outputs
+
+
+def detect_faces(face_model, frames, conf=FACE_CONFIDENCE):
+    """Face boxes [x1, y1, x2, y2] for each of a list of RGB frames"""
+    if face_model is None or not frames:
+        return [[] for _ in frames]
+    results = face_model.predict(list(frames), conf=conf, verbose=False)
+    return [[box.xyxy[0].cpu().numpy().astype(int).tolist() for box in r.boxes] for r in results]
+
+
+def submit_face_detection(face_model, frames, conf=FACE_CONFIDENCE):
+    """
+    Start detect_faces() on the face detection thread. Returns a Future whose
+    result() is the face boxes for each frame.
+    """
+    return _face_executor.submit(detect_faces, face_model, list(frames), conf)
+
+
+def privacy_boxes(privacy_mode, detections, face_boxes):
+    """
+    Raw detector boxes to blur on a frame where the detectors ran: the face
+    boxes, plus every person detection (confident or not) in "Blur Whole
+    Person" mode. Blurring these rather than only the smoothed track boxes
+    keeps the blur on a moving face or person instead of lagging behind it.
+    """
+    boxes = [list(box) for box in face_boxes]
+    if privacy_mode == "Blur Whole Person":
+        boxes += [list(box) for box, label, _ in detections if label.lower() == "person"]
+    return boxes
+
+
+def blur_radius(intensity):
+    """Gaussian sigma for a blur intensity (what OpenCV derives for a (2 * intensity + 1) kernel)"""
+    return 0.3 * intensity + 0.5
+
+
+def draw_tracked_box(frame, tracked, color=BOX_COLOR):
+    """Box plus a "#id LABEL conf" tag, drawn in place"""
+    x1, y1, x2, y2 = tracked.box
+    cv2.rectangle(frame, (x1, y1), (x2, y2), color, 1)
+    text = f"#{tracked.track_id} {tracked.label.upper()} {tracked.confidence:.0%}"
+    (w, h), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, 0.5, 1)
+    cv2.rectangle(frame, (x1, y1 - 20), (x1 + w, y1), color, -1)
+    cv2.putText(frame, text, (x1, y1 - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
+    return frame
+
+
+def annotate_frame(frame, tracked_boxes, blur_boxes, privacy_mode="None", blur_intensity=0,
+                   filter_set=None, show_boxes=True):
+    """
+    Apply the privacy mode and draw the boxes on a BGR frame, in place.
+
+    "Blur Whole Person" blurs every tracked person box whatever the class
+    filter; `blur_boxes` (faces, and raw detections from privacy_boxes) are
+    always blurred. Returns the tracked boxes that pass `filter_set`
+    (lower-case class names; empty means all classes).
+    """
+    visible = []
+    blur_boxes = list(blur_boxes)
+    for tracked in tracked_boxes:
+        if privacy_mode == "Blur Whole Person" and tracked.label.lower() == "person":
+            blur_boxes.append(tracked.box)
+        if not filter_set or tracked.label.lower() in filter_set:
+            visible.append(tracked)
+
+    if blur_boxes and blur_intensity:
+        blur_regions(frame, blur_boxes, blur_radius(blur_intensity))
+
+    if show_boxes:
+        for tracked in visible:
+            draw_tracked_box(frame, tracked)
+    return visible
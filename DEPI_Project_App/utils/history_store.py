@@ -0,0 +1,382 @@
+"""
+Disk-backed analysis history for DEPI system
+
+History items used to keep their original/processed PNG bytes in
+st.session_state, i.e. in server RAM for every open session. Here images
+are written once to a content-addressed blob directory (identical images
+are stored once) and everything else goes into a sqlite index, so session
+state only holds item ids. A thumbnail is generated when an item is added,
+for the history lists.
+
+Stored uploads can include pre-blur originals, so the store lives in the
+system temp directory by default (DEPI_HISTORY_DIR overrides it) and items
+expire `ttl` seconds after they were added (DEPI_HISTORY_TTL_HOURS). Each
+item records the session that added it: a session over `session_max_bytes`
+first evicts its own least recently used items, so one user's batch doesn't
+push out everyone else's history. Only when all blobs together exceed
+`max_bytes` are other sessions' least recently used items evicted.
+
+Items are plain dicts, as the pages built them before; get() returns the
+same dict with "original"/"processed" read back from disk.
+
+Thumbnails shown in history lists are also kept in an in-memory LRU keyed
+by content digest (thumbnail_cache), so paging back and forth or rerunning
+a page doesn't read or decode them again.
+"""
+
+import functools
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+
+import numpy as np
+from PIL import Image
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+DEFAULT_HISTORY_DIR = os.getenv("DEPI_HISTORY_DIR", os.path.join(tempfile.gettempdir(), "depi_history"))
+DEFAULT_MAX_BYTES = int(os.getenv("DEPI_HISTORY_MAX_MB", "1024")) * 1024 * 1024
+DEFAULT_SESSION_MAX_BYTES = int(os.getenv("DEPI_HISTORY_SESSION_MAX_MB", "256")) * 1024 * 1024
+DEFAULT_TTL_SEC = float(os.getenv("DEPI_HISTORY_TTL_HOURS", "24")) * 3600
+THUMBNAIL_SIZE = (320, 320)
+IMAGE_FIELDS = ("original", "processed")
+# Fields with their own index column; everything else is kept in the JSON "data" column
+INDEXED_FIELDS = ("timestamp", "inference_time", "detections")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    session TEXT,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL,
+    timestamp TEXT,
+    inference_time REAL,
+    detections TEXT,
+    data TEXT NOT NULL,
+    original TEXT,
+    processed TEXT,
+    thumbnail TEXT
+);
+CREATE INDEX IF NOT EXISTS items_kind ON items (kind, id);
+CREATE INDEX IF NOT EXISTS items_lru ON items (last_access);
+CREATE INDEX IF NOT EXISTS items_created ON items (created);
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    size INTEGER NOT NULL
+);
+"""
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if pd is not None and isinstance(value, pd.DataFrame):
+        return {"__dataframe__": value.to_dict(orient="records")}
+    raise TypeError(f"Cannot store {type(value).__name__} in history")
+
+
+def _json_object_hook(obj):
+    if pd is not None and set(obj) == {"__dataframe__"}:
+        return pd.DataFrame(obj["__dataframe__"])
+    return obj
+
+
+def _dumps(value):
+    return json.dumps(value, default=_json_default)
+
+
+def _loads(text):
+    return json.loads(text, object_hook=_json_object_hook) if text is not None else None
+
+
+def make_thumbnail(image_bytes, size=THUMBNAIL_SIZE):
+    """JPEG thumbnail bytes of an encoded image"""
+    img = Image.open(io.BytesIO(image_bytes))
+    img.thumbnail(size)
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=85)
+    return buf.getvalue()
+
+
+class ThumbnailCache:
+    """Thread-safe LRU of thumbnail bytes keyed by content digest"""
+
+    def __init__(self, max_items=512):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, make):
+        """Cached bytes for `key` (a digest), calling make() to produce them on a miss"""
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+        data = make()
+        if data is not None:
+            with self._lock:
+                self._items[key] = data
+                while len(self._items) > self.max_items:
+                    self._items.popitem(last=False)
+        return data
+
+
+thumbnail_cache = ThumbnailCache()
+
+
+@functools.lru_cache(maxsize=1024)
+def _file_digest(path, mtime_ns, size):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_thumbnail(path, size=THUMBNAIL_SIZE):
+    """
+    Thumbnail bytes of an image file (e.g. a realtime snapshot), or None if
+    it is missing. The file is hashed once per modification and the
+    thumbnail cached by that hash.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    digest = _file_digest(path, stat.st_mtime_ns, stat.st_size)
+
+    def make():
+        with open(path, "rb") as f:
+            return make_thumbnail(f.read(), size)
+    return thumbnail_cache.get(("file", digest, size), make)
+
+
+class HistoryStore:
+    """
+    History items in `root`: blobs/<first two hex chars>/<sha256> for images
+    and thumbnails, index.sqlite for everything else. Safe to share between
+    sessions; each call opens its own sqlite connection.
+    """
+
+    def __init__(self, root=DEFAULT_HISTORY_DIR, max_bytes=DEFAULT_MAX_BYTES, thumbnail_size=THUMBNAIL_SIZE,
+                 session_max_bytes=DEFAULT_SESSION_MAX_BYTES, ttl=DEFAULT_TTL_SEC):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.session_max_bytes = session_max_bytes
+        self.ttl = ttl
+        self.thumbnail_size = thumbnail_size
+        self.blob_dir = os.path.join(root, "blobs")
+        self.db_path = os.path.join(root, "index.sqlite")
+        # Serialises add/evict so eviction never removes a blob an add is about to reference
+        self._write_lock = threading.Lock()
+        os.makedirs(self.blob_dir, mode=0o700, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(items)")}
+            if "session" not in columns:
+                conn.execute("ALTER TABLE items ADD COLUMN session TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS items_session ON items (session, last_access)")
+        # Drop whatever expired while the app was down
+        self.evict()
+
+    def _cutoff(self):
+        """Items created before this time have expired"""
+        return time.time() - self.ttl if self.ttl else 0.0
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def _put_blob(self, conn, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        conn.execute("INSERT OR IGNORE INTO blobs (digest, size) VALUES (?, ?)", (digest, len(data)))
+        return digest
+
+    def _read_blob(self, digest):
+        if digest is None:
+            return None
+        try:
+            with open(self.blob_path(digest), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def add(self, kind, item, session=None):
+        """
+        Store a history item for a page (`kind`, e.g. "classification") and
+        return its id. Image fields hold encoded image bytes (or None).
+        `session` identifies the browser session adding it (see evict).
+        """
+        item = dict(item)
+        images = {field: item.pop(field, None) for field in IMAGE_FIELDS}
+        indexed = {field: item.pop(field, None) for field in INDEXED_FIELDS}
+        preview = images["processed"] or images["original"]
+        thumbnail = make_thumbnail(preview, self.thumbnail_size) if preview else None
+
+        now = time.time()
+        with self._write_lock, closing(self._connect()) as conn, conn:
+            digests = {field: self._put_blob(conn, data) if data else None for field, data in images.items()}
+            thumb_digest = self._put_blob(conn, thumbnail) if thumbnail else None
+            cursor = conn.execute(
+                "INSERT INTO items (kind, session, created, last_access, timestamp, inference_time, detections, "
+                "data, original, processed, thumbnail) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (kind, session, now, now, indexed["timestamp"], indexed["inference_time"],
+                 _dumps(indexed["detections"]) if indexed["detections"] is not None else None, _dumps(item),
+                 digests["original"], digests["processed"], thumb_digest))
+            item_id = cursor.lastrowid
+        self.evict(session)
+        return item_id
+
+    def get(self, item_id, load_images=True):
+        """
+        The item dict (with "id" and "kind"), or None if it was evicted or
+        has expired. With load_images=False the image fields are left out,
+        which is all a history list needs next to thumbnail().
+        """
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                "SELECT kind, timestamp, inference_time, detections, data, original, processed "
+                "FROM items WHERE id = ? AND created >= ?", (item_id, self._cutoff())).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE items SET last_access = ? WHERE id = ?", (time.time(), item_id))
+
+        kind, timestamp, inference_time, detections, data, original, processed = row
+        item = _loads(data)
+        item.update({"id": item_id, "kind": kind, "timestamp": timestamp, "inference_time": inference_time})
+        if detections is not None:
+            item["detections"] = _loads(detections)
+        if load_images:
+            item["original"] = self._read_blob(original)
+            item["processed"] = self._read_blob(processed)
+        return item
+
+    def get_many(self, item_ids, load_images=True):
+        """Items for `item_ids` in the same order, skipping evicted ones"""
+        items = (self.get(item_id, load_images) for item_id in item_ids)
+        return [item for item in items if item is not None]
+
+    def thumbnail(self, item_id):
+        """JPEG thumbnail bytes, or None"""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT thumbnail FROM items WHERE id = ?", (item_id,)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return thumbnail_cache.get(row[0], lambda: self._read_blob(row[0]))
+
+    def ids(self, item_ids, kind):
+        """The ids in `item_ids` that belong to page `kind` and are still stored, oldest first"""
+        item_ids = list(item_ids)
+        if not item_ids:
+            return []
+        found = set()
+        with closing(self._connect()) as conn:
+            # Stay under sqlite's bound-parameter limit
+            for start in range(0, len(item_ids), 500):
+                chunk = item_ids[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(f"SELECT id FROM items WHERE kind = ? AND created >= ? AND id IN ({placeholders})",
+                                    (kind, self._cutoff(), *chunk))
+                found.update(row[0] for row in rows)
+        return [item_id for item_id in item_ids if item_id in found]
+
+    def delete(self, item_id):
+        with self._write_lock, closing(self._connect()) as conn, conn:
+            self._delete(conn, item_id)
+
+    def _delete(self, conn, item_id):
+        row = conn.execute("SELECT original, processed, thumbnail FROM items WHERE id = ?", (item_id,)).fetchone()
+        if row is None:
+            return
+        conn.execute("DELETE FROM items WHERE id = ?", (item_id,))
+        for digest in set(filter(None, row)):
+            in_use = conn.execute(
+                "SELECT 1 FROM items WHERE original = ? OR processed = ? OR thumbnail = ? LIMIT 1",
+                (digest, digest, digest)).fetchone()
+            if not in_use:
+                conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+                try:
+                    os.remove(self.blob_path(digest))
+                except FileNotFoundError:
+                    pass
+
+    def total_bytes(self):
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    def _session_bytes(self, conn, session):
+        return conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM blobs WHERE digest IN ("
+            "SELECT original FROM items WHERE session = ? UNION SELECT processed FROM items WHERE session = ? "
+            "UNION SELECT thumbnail FROM items WHERE session = ?)", (session, session, session)).fetchone()[0]
+
+    def delete_session(self, session):
+        """Delete every item a session added"""
+        with self._write_lock, closing(self._connect()) as conn, conn:
+            for (item_id,) in conn.execute("SELECT id FROM items WHERE session = ?", (session,)).fetchall():
+                self._delete(conn, item_id)
+
+    def evict(self, session=None):
+        """
+        Delete expired items; then, if `session` holds more than
+        session_max_bytes, its own least recently used items; then anyone's
+        least recently used items until the blobs fit in max_bytes. Returns
+        the evicted ids.
+        """
+        evicted = []
+        with self._write_lock, closing(self._connect()) as conn, conn:
+            expired = conn.execute("SELECT id FROM items WHERE created < ?", (self._cutoff(),)).fetchall()
+            for (item_id,) in expired:
+                self._delete(conn, item_id)
+                evicted.append(item_id)
+
+            if session is not None and self.session_max_bytes:
+                used = self._session_bytes(conn, session)
+                rows = conn.execute("SELECT id FROM items WHERE session = ? ORDER BY last_access, id",
+                                    (session,)).fetchall()
+                # Never the item just added (the newest)
+                for (item_id,) in rows[:-1]:
+                    if used <= self.session_max_bytes:
+                        break
+                    self._delete(conn, item_id)
+                    evicted.append(item_id)
+                    used = self._session_bytes(conn, session)
+
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+            if total <= self.max_bytes:
+                return evicted
+            for (item_id,) in conn.execute("SELECT id FROM items ORDER BY last_access, id").fetchall():
+                if total <= self.max_bytes:
+                    break
+                self._delete(conn, item_id)
+                evicted.append(item_id)
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        return evicted
+
+
+history_store = HistoryStore()
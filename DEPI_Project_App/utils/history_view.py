@@ -0,0 +1,49 @@
+"""
+History list paging for DEPI system
+
+History sections render one page of items per rerun instead of the whole
+session, so long sessions don't re-render (and re-read) every record
+whenever a widget changes.
+"""
+
+import math
+import uuid
+
+import streamlit as st
+
+HISTORY_PAGE_SIZE = 10
+MISSING_ITEM_MESSAGE = "This record is no longer available (it expired or was evicted from history)."
+
+
+def history_session():
+    """Id of this browser session, passed to history_store.add() for per-session eviction"""
+    if "history_session" not in st.session_state:
+        st.session_state.history_session = uuid.uuid4().hex
+    return st.session_state.history_session
+
+
+def history_page(total, key, page_size=HISTORY_PAGE_SIZE):
+    """
+    Newer/Older controls for a newest-first list of `total` items. Returns
+    the (start, end) positions of the visible page in newest-first order.
+    The current page is kept in st.session_state[f"{key}_page"].
+    """
+    pages = max(1, math.ceil(total / page_size))
+    state_key = f"{key}_page"
+    page = min(st.session_state.get(state_key, 0), pages - 1)
+
+    if pages > 1:
+        col_newer, col_info, col_older = st.columns([1, 2, 1])
+        with col_newer:
+            if st.button("Newer", key=f"{key}_newer", disabled=page == 0, use_container_width=True):
+                page -= 1
+        with col_older:
+            if st.button("Older", key=f"{key}_older", disabled=page >= pages - 1, use_container_width=True):
+                page += 1
+        with col_info:
+            st.markdown(f'<div class="hist-meta" style="text-align:center; padding-top:8px;">'
+                        f'Page {page + 1} of {pages} &nbsp;|&nbsp; {total} records</div>', unsafe_allow_html=True)
+
+    st.session_state[state_key] = page
+    start = page * page_size
+    return start, min(start + page_size, total)
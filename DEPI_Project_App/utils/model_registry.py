@@ -0,0 +1,208 @@
+"""
+Shared model registry for DEPI system
+
+Streamlit re-executes page scripts on every rerun, but imported modules run
+once per process. Models held here are therefore loaded once, on first use,
+and the same instance is shared by every page, session and rerun instead of
+each page constructing its own copy.
+
+Loading is thread-safe: concurrent sessions asking for the same model wait
+for one load, while different models can load in parallel. A model that
+fails to load (e.g. missing weights, a failed download) makes get_model()
+return None, like the pages' previous try/except loading; the load is
+retried on a later get() after a backoff that doubles with each failure.
+
+Inference is thread-safe too. get() hands out a SharedModel wrapper whose
+predict() and __call__ hold a per-model lock, because ultralytics predictors
+keep per-call state and must not run concurrently, while sessions, the
+realtime pipeline thread and the face detection thread all share the model.
+"""
+
+import os
+import threading
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OBJECT_MODEL_PATH = "yolov8n.pt"
+FACE_MODEL_PATH = os.path.join(APP_DIR, "models", "face", "yolov8n-face-lindevs.pt")
+
+
+RETRY_BACKOFF_SEC = 30.0
+MAX_RETRY_BACKOFF_SEC = 600.0
+
+
+def _load_yolo(path, required_file=False):
+    def load():
+        if required_file and not os.path.exists(path):
+            raise FileNotFoundError(f"Model weights not found at: {path}")
+        from ultralytics import YOLO
+        return YOLO(path)
+    return load
+
+
+def model_size_bytes(model):
+    """Bytes held by a model's weights (torch parameters/buffers or Keras params), or None if unknown"""
+    module = getattr(model, "model", model)
+    if hasattr(module, "parameters") and hasattr(module, "buffers"):
+        tensors = list(module.parameters()) + list(module.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+    if hasattr(model, "count_params"):
+        return model.count_params() * 4
+    return None
+
+
+def process_rss_bytes():
+    """Resident memory of this process, or None if it can't be read"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class SharedModel:
+    """
+    A loaded model shared between threads. predict() and calls run under the
+    model's inference lock; other attributes (names, model, ...) pass through.
+    """
+
+    def __init__(self, model, lock):
+        self._model = model
+        self._lock = lock
+
+    def predict(self, *args, **kwargs):
+        with self._lock:
+            return self._model.predict(*args, **kwargs)
+
+    def __call__(self, *args, **kwargs):
+        with self._lock:
+            return self._model(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+
+class ModelRegistry:
+    """
+    Named model loaders, each called once per process (again only after a
+    failed load's backoff has passed).
+
+    register(name, loader) adds a loader (a no-argument callable returning the
+    model); get(name) loads on first use and returns the shared instance.
+    """
+
+    def __init__(self, retry_backoff=RETRY_BACKOFF_SEC, max_retry_backoff=MAX_RETRY_BACKOFF_SEC):
+        self.retry_backoff = retry_backoff
+        self.max_retry_backoff = max_retry_backoff
+        self._lock = threading.Lock()
+        self._loaders = {}
+        self._load_locks = {}
+        self._predict_locks = {}
+        self._models = {}
+        self._info = {}
+
+    def register(self, name, loader):
+        with self._lock:
+            self._loaders[name] = loader
+            self._load_locks.setdefault(name, threading.Lock())
+            self._predict_locks.setdefault(name, threading.Lock())
+
+    def _settled(self, name):
+        """True if `name` is loaded, or failed and is still within its retry backoff"""
+        info = self._info.get(name)
+        if info is None:
+            return False
+        return info["loaded"] or time.monotonic() < info["retry_at"]
+
+    def get(self, name):
+        """The loaded model (a SharedModel), or None if it could not be loaded"""
+        if self._settled(name):
+            return self._models.get(name)
+        with self._lock:
+            if name not in self._loaders:
+                raise KeyError(f"No model registered as '{name}'")
+            load_lock = self._load_locks[name]
+
+        with load_lock:
+            # Another thread may have finished loading while this one waited
+            if self._settled(name):
+                return self._models.get(name)
+            failures = self._info.get(name, {}).get("failures", 0)
+
+            start = time.perf_counter()
+            rss_before = process_rss_bytes()
+            try:
+                model = self._loaders[name]()
+                error = None
+            except Exception as e:
+                model, error = None, str(e)
+                print(f"Error loading {name} model: {e}")
+            rss_after = process_rss_bytes()
+
+            size = model_size_bytes(model) if model is not None else None
+            if size is None and model is not None and rss_before is not None and rss_after is not None:
+                size = max(rss_after - rss_before, 0)
+            failures = 0 if model is not None else failures + 1
+            backoff = min(self.retry_backoff * 2 ** (failures - 1), self.max_retry_backoff) if failures else 0.0
+            info = {
+                "loaded": model is not None,
+                "load_time_sec": time.perf_counter() - start,
+                "size_mb": size / 1024 / 1024 if size is not None else None,
+                "error": error,
+                "failures": failures,
+                "retry_at": time.monotonic() + backoff
+            }
+            shared = SharedModel(model, self._predict_locks[name]) if model is not None else None
+            with self._lock:
+                if shared is not None:
+                    self._models[name] = shared
+                self._info[name] = info
+            if model is not None:
+                size_text = f", {info['size_mb']:.1f} MB" if size is not None else ""
+                print(f"Loaded {name} model in {info['load_time_sec']:.1f}s{size_text}")
+            else:
+                print(f"Retrying {name} model in {backoff:.0f}s")
+            return shared
+
+    def unload(self, name):
+        """Forget a model (or a failed load) so the next get() loads it again"""
+        with self._lock:
+            self._models.pop(name, None)
+            self._info.pop(name, None)
+
+    def memory_usage(self):
+        """
+        {"process_rss_mb", "models_mb", "models": {name: {loaded, load_time_sec,
+        size_mb, error}}} for every registered model (not-yet-loaded models
+        have loaded=False and no size)
+        """
+        with self._lock:
+            models = {}
+            for name in self._loaders:
+                info = self._info.get(name, {"loaded": False, "load_time_sec": None, "size_mb": None, "error": None})
+                models[name] = {key: info[key] for key in ("loaded", "load_time_sec", "size_mb", "error")}
+        rss = process_rss_bytes()
+        return {
+            "process_rss_mb": rss / 1024 / 1024 if rss is not None else None,
+            "models_mb": sum(info["size_mb"] or 0.0 for info in models.values()),
+            "models": models
+        }
+
+
+registry = ModelRegistry()
+registry.register("object", _load_yolo(OBJECT_MODEL_PATH))
+registry.register("face", _load_yolo(FACE_MODEL_PATH, required_file=True))
+
+
+def get_model(name):
+    """Shared instance of a registered model ("object", "face"), or None if unavailable"""
+    return registry.get(name)
+
+
+def memory_usage():
+    return registry.memory_usage()
@@ -1,10 +1,194 @@
 """
 Image preprocessing utilities for DEPI system
+
+A PreprocessingSpec describes exactly how a model expects its input (size,
+resample filter, scale, mean/std, channel order, layout). Specs are saved as
+preprocessing.json next to each model artifact and applied by the same code
+on the client and on the scoring servers.
+
+This file is the only copy in the repo. Scoring scripts are deployed one
+folder at a time, so Deployment Codes/package_preprocessing.py copies it into
+each classifier folder before deployment.
 """
 
+import base64
+import io
+import json
+import os
+from functools import lru_cache
+
 import numpy as np
 from PIL import Image
 
+SPEC_FILENAME = "preprocessing.json"
+
+RESAMPLE_FILTERS = {
+    "nearest": Image.Resampling.NEAREST,
+    "bilinear": Image.Resampling.BILINEAR,
+    "bicubic": Image.Resampling.BICUBIC,
+    "lanczos": Image.Resampling.LANCZOS,
+}
+
+
+class PreprocessingSpec:
+    """
+    Model input specification shared by clients and scoring servers
+    """
+
+    def __init__(self, size=(224, 224), resample="bilinear", scale=1.0 / 255.0,
+                 mean=(0.0, 0.0, 0.0), std=(1.0, 1.0, 1.0), channel_order="RGB", layout="NHWC"):
+        if resample not in RESAMPLE_FILTERS:
+            raise ValueError(f"Unsupported resample filter: {resample}")
+        if channel_order not in ("RGB", "BGR"):
+            raise ValueError(f"Unsupported channel order: {channel_order}")
+        if layout not in ("NHWC", "NCHW"):
+            raise ValueError(f"Unsupported layout: {layout}")
+
+        self.size = tuple(int(v) for v in size)
+        self.resample = resample
+        self.scale = float(scale)
+        self.mean = tuple(float(v) for v in mean)
+        self.std = tuple(float(v) for v in std)
+        self.channel_order = channel_order
+        self.layout = layout
+
+        # Fold scale/mean/std into one multiply-add so batches normalize in a single pass
+        std_arr = np.asarray(self.std, dtype=np.float32)
+        self._mul = (self.scale / std_arr).astype(np.float32)
+        self._add = (-np.asarray(self.mean, dtype=np.float32) / std_arr).astype(np.float32)
+
+    @property
+    def input_shape(self):
+        """(H, W, 3) shape of a resized uint8 image"""
+        return (self.size[1], self.size[0], 3)
+
+    def to_dict(self):
+        return {
+            "size": list(self.size),
+            "resample": self.resample,
+            "scale": self.scale,
+            "mean": list(self.mean),
+            "std": list(self.std),
+            "channel_order": self.channel_order,
+            "layout": self.layout,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def save(self, model_dir_or_path):
+        """Write the spec as JSON; a directory gets SPEC_FILENAME inside it"""
+        path = model_dir_or_path
+        if os.path.isdir(path):
+            path = os.path.join(path, SPEC_FILENAME)
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
+
+    def resize(self, image):
+        """
+        Resize a PIL image to the model size and return it as a uint8 (H, W, 3)
+        array in the spec's channel order. This is what clients may send.
+        """
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        if image.size != self.size:
+            image = image.resize(self.size, RESAMPLE_FILTERS[self.resample], reducing_gap=3.0)
+        array = np.asarray(image, dtype=np.uint8)
+        if self.channel_order == "BGR":
+            array = array[..., ::-1]
+        return array
+
+    def normalize_batch(self, batch):
+        """
+        Normalize a uint8 (N, H, W, 3) batch already at model size into the
+        float32 tensor the model consumes
+        """
+        batch = np.asarray(batch)
+        if batch.shape[1:] != self.input_shape:
+            raise ValueError(f"Expected batch of shape (N, {self.input_shape}), got {batch.shape}")
+        out = batch.astype(np.float32)
+        out *= self._mul
+        out += self._add
+        if self.layout == "NCHW":
+            out = np.ascontiguousarray(out.transpose(0, 3, 1, 2))
+        return out
+
+    def apply(self, image):
+        """Preprocess one PIL image into a (1, ...) float32 batch"""
+        return self.normalize_batch(self.resize(image)[np.newaxis])
+
+    def apply_batch(self, images):
+        """Preprocess a list of PIL images into one float32 batch"""
+        return self.normalize_batch(np.stack([self.resize(image) for image in images]))
+
+    def encode_tensor(self, image):
+        """
+        Client side: resize an image and pack it for a request payload.
+        The server can then skip decoding and resizing entirely.
+        """
+        array = np.ascontiguousarray(self.resize(image))
+        return {
+            "tensor": base64.b64encode(array.tobytes()).decode("utf-8"),
+            "shape": list(array.shape),
+            "dtype": "uint8",
+        }
+
+    def decode_tensor(self, payload):
+        """
+        Server side: unpack a payload from encode_tensor into a uint8 (1, H, W, 3) batch
+        """
+        shape = tuple(payload.get("shape", ()))
+        if shape != self.input_shape or payload.get("dtype", "uint8") != "uint8":
+            raise ValueError(f"Preprocessed tensor must be uint8 with shape {list(self.input_shape)}")
+        array = np.frombuffer(base64.b64decode(payload["tensor"]), dtype=np.uint8)
+        if array.size != np.prod(shape):
+            raise ValueError("Preprocessed tensor size does not match its shape")
+        return array.reshape((1,) + shape)
+
+
+# Specs for the models this app talks to; also written next to their artifacts
+CIFAR10_CLASSIFIER_SPEC = PreprocessingSpec(size=(224, 224), resample="bilinear", scale=1.0 / 255.0)
+CAR_CLASSIFIER_SPEC = PreprocessingSpec(
+    size=(224, 224), resample="bilinear", scale=1.0 / 255.0,
+    mean=(0.485, 0.456, 0.406), std=(0.229, 0.224, 0.225), layout="NCHW"
+)
+
+
+@lru_cache(maxsize=None)
+def _load_spec_file(path, mtime):
+    with open(path) as f:
+        return PreprocessingSpec.from_dict(json.load(f))
+
+
+def open_image(image_bytes, target_size, max_pixels=None):
+    """
+    Open an upload as an RGB PIL image without decoding more pixels than the
+    model needs. The header is checked against `max_pixels` first, and JPEGs
+    are decoded at the smallest 1/2, 1/4 or 1/8 scale that still covers
+    target_size.
+    """
+    img = Image.open(io.BytesIO(image_bytes))
+    w, h = img.size
+    if max_pixels and w * h > max_pixels:
+        raise ValueError(f"Image too large: {w}x{h} exceeds the {max_pixels} pixel limit")
+    img.draft("RGB", target_size)
+    return img.convert("RGB")
+
+
+def load_spec(model_dir, default=None):
+    """
+    Load the preprocessing spec stored next to a model artifact, falling back
+    to `default` when none was saved. Parsed specs are cached per file version.
+    """
+    path = os.path.join(model_dir, SPEC_FILENAME) if model_dir else None
+    if path and os.path.exists(path):
+        return _load_spec_file(path, os.path.getmtime(path))
+    if default is None:
+        raise FileNotFoundError(f"No {SPEC_FILENAME} found in {model_dir}")
+    return default
+
 
 def preprocess_image(image, target_size=(32, 32)):
     """
@@ -41,16 +225,14 @@ def normalize_image(image_array, mean=None, std=None):
     return normalized
 
 
-def prepare_for_classification(image, model_type='default'):
+def prepare_for_classification(image, model_type='default', spec=None):
     """
-    Prepare image for classification model
-    (*** Updated target_size to 32x32 ***)
+    Prepare image for classification model using the model's preprocessing spec
+    (defaults to the CIFAR-10 MobileNetV2 spec, 224x224 in [0, 1])
     """
-
-    processed = preprocess_image(image, target_size=(32, 32))
-    processed = np.expand_dims(processed, axis=0)
-
-    return processed
+    if spec is None:
+        spec = CAR_CLASSIFIER_SPEC if model_type == 'car' else CIFAR10_CLASSIFIER_SPEC
+    return spec.apply(image)
 
 
 def prepare_for_detection(image, model_type='default'):
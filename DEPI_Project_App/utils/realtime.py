@@ -0,0 +1,406 @@
+"""
+Realtime video pipeline utilities for DEPI system
+
+Capture, inference and rendering run as separate stages connected by small
+drop-oldest queues, so a slow inference step never makes the camera buffer
+back up: the capture thread keeps only the newest frame, the inference
+worker always processes the freshest frame available, and the renderer
+(the Streamlit script thread) shows the newest result.
+
+VideoSource wraps the webcam, local video files and RTSP/HTTP streams. Live
+sources keep the drop-oldest behaviour; file sources use blocking queues so
+every (sampled) frame of a recording is processed.
+
+Sources chosen in the UI are checked first: files must be videos inside
+MEDIA_DIR (DEPI_MEDIA_DIR) and stream URLs must use an RTSP/HTTP scheme and a
+host listed in DEPI_STREAM_HOSTS, so web users can't make the server read
+arbitrary files or connect to arbitrary hosts through OpenCV/FFmpeg.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+
+import cv2
+import numpy as np
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MEDIA_DIR = os.getenv("DEPI_MEDIA_DIR", os.path.join(APP_DIR, "media"))
+# Comma-separated hosts stream URLs may point at; no streams are allowed when empty
+STREAM_HOSTS = frozenset(h.strip().lower() for h in os.getenv("DEPI_STREAM_HOSTS", "").split(",") if h.strip())
+STREAM_SCHEMES = ("rtsp", "rtsps", "http", "https")
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".webm", ".m4v")
+
+
+def list_media_files(media_dir=MEDIA_DIR):
+    """Video files under media_dir, as sorted paths relative to it"""
+    files = []
+    for root, _, names in os.walk(media_dir):
+        for name in names:
+            if name.lower().endswith(VIDEO_EXTENSIONS):
+                files.append(os.path.relpath(os.path.join(root, name), media_dir))
+    return sorted(files)
+
+
+def resolve_media_file(name, media_dir=MEDIA_DIR):
+    """
+    Absolute path of video file `name` inside media_dir. Raises ValueError
+    for anything else (other directories, symlinks out of it, non-videos).
+    """
+    root = os.path.realpath(media_dir)
+    path = os.path.realpath(os.path.join(root, name))
+    if os.path.commonpath([root, path]) != root or not os.path.isfile(path):
+        raise ValueError(f"{name} is not a file in the media directory")
+    if not path.lower().endswith(VIDEO_EXTENSIONS):
+        raise ValueError(f"{name} is not a supported video file")
+    return path
+
+
+def validate_stream_url(url, allowed_hosts=STREAM_HOSTS):
+    """Return `url` if it is an RTSP/HTTP(S) URL on an allowed host, else raise ValueError"""
+    try:
+        parts = urlsplit(url.strip())
+        host = (parts.hostname or "").lower()
+    except ValueError:
+        raise ValueError("Invalid stream URL")
+    if parts.scheme.lower() not in STREAM_SCHEMES:
+        raise ValueError(f"Stream URLs must use one of: {', '.join(STREAM_SCHEMES)}")
+    if host not in allowed_hosts:
+        raise ValueError(f"Streams from {host or 'this host'} are not allowed (see DEPI_STREAM_HOSTS)")
+    return url.strip()
+
+
+class LatestQueue:
+    """
+    Bounded queue that drops the oldest item instead of blocking when full.
+    With maxsize=1 it always holds only the latest item. With
+    drop_oldest=False, put() waits for space instead (used for recordings,
+    where every frame must be processed).
+    """
+
+    def __init__(self, maxsize=1, drop_oldest=True):
+        self._items = deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self.drop_oldest = drop_oldest
+        self.dropped = 0
+
+    def put(self, item, timeout=None):
+        """Queue an item. Returns False if a blocking put timed out."""
+        with self._cond:
+            if len(self._items) == self._items.maxlen:
+                if not self.drop_oldest:
+                    if not self._cond.wait_for(lambda: len(self._items) < self._items.maxlen, timeout):
+                        return False
+                else:
+                    self.dropped += 1
+            self._items.append(item)
+            self._cond.notify_all()
+            return True
+
+    def get(self, timeout=None):
+        """Oldest queued item, or None if nothing arrives within `timeout`"""
+        with self._cond:
+            if not self._items:
+                self._cond.wait(timeout)
+            if not self._items:
+                return None
+            item = self._items.popleft()
+            self._cond.notify_all()
+            return item
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+
+class StageStats:
+    """Rolling throughput (FPS) and latency of one pipeline stage"""
+
+    def __init__(self, window=30):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency):
+        with self._lock:
+            self._samples.append((time.perf_counter(), latency))
+
+    def snapshot(self):
+        with self._lock:
+            samples = list(self._samples)
+        if not samples:
+            return {"fps": 0.0, "latency_ms": 0.0}
+        span = samples[-1][0] - samples[0][0]
+        fps = (len(samples) - 1) / span if span > 0 else 0.0
+        latency_ms = 1000.0 * sum(latency for _, latency in samples) / len(samples)
+        return {"fps": fps, "latency_ms": latency_ms}
+
+
+class AdaptiveDetectionInterval:
+    """
+    Decides which frames run the detector when boxes are tracked in between.
+
+    With a detector taking t seconds and a source delivering f frames/s, a
+    cycle of N frames (one detection, N - 1 tracked frames) takes about
+    t + (N - 1) / f seconds. N is the smallest interval that keeps the output
+    at `target_fps`, clamped to [1, max_interval], and is re-estimated from
+    the measured detector time and source rate as they change.
+    """
+
+    def __init__(self, target_fps=25.0, max_interval=15):
+        self.target_fps = target_fps
+        self.max_interval = max_interval
+        self.interval = 1
+        self._frames_since_detection = None
+        self._detect_time = None
+
+    def should_detect(self):
+        if self._frames_since_detection is None or self._frames_since_detection + 1 >= self.interval:
+            self._frames_since_detection = 0
+            return True
+        self._frames_since_detection += 1
+        return False
+
+    def record_detection(self, seconds, source_fps):
+        # Smooth the detector time so one slow frame doesn't swing the interval
+        self._detect_time = seconds if self._detect_time is None else 0.8 * self._detect_time + 0.2 * seconds
+        if source_fps <= 0:
+            return
+        frame_time = 1.0 / source_fps
+        if self.target_fps >= source_fps:
+            # Can't output faster than the source; track every frame between detections
+            needed = self.max_interval
+        else:
+            needed = self.target_fps * (self._detect_time - frame_time) / (1.0 - self.target_fps * frame_time)
+        self.interval = int(min(max(np.ceil(needed), 1), self.max_interval))
+
+
+class VideoSource:
+    """
+    A frame source for the realtime pipeline: a camera index, a local video
+    file, or an RTSP/HTTP stream URL.
+
+    Decoding uses FFmpeg with whatever hardware acceleration OpenCV finds
+    (falling back to software). `sample_fps` optionally limits how many
+    frames per second of video are passed on: for files that is video time
+    (skipped frames are grabbed but not converted), for live sources wall
+    time. Frames wider than `max_width` are scaled down keeping their aspect
+    ratio; cameras are asked for `frame_size` directly. Files can start at
+    `start_position` seconds.
+    """
+
+    def __init__(self, uri, sample_fps=None, frame_size=(640, 480), max_width=640, reconnect_attempts=3,
+                 start_position=0.0):
+        self.uri = uri
+        self.start_position = start_position
+        self.sample_fps = sample_fps or None
+        self.frame_size = frame_size
+        self.max_width = max_width
+        self.reconnect_attempts = reconnect_attempts
+
+        if isinstance(uri, int) or str(uri).isdigit():
+            self.kind = "camera"
+        elif "://" in str(uri):
+            self.kind = "stream"
+        else:
+            self.kind = "file"
+
+    @property
+    def is_live(self):
+        return self.kind != "file"
+
+    def open(self):
+        if self.kind == "camera":
+            cap = cv2.VideoCapture(int(self.uri))
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.frame_size[0])
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.frame_size[1])
+            # Ask the driver not to queue frames; the capture thread keeps the latest one anyway
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            return cap
+
+        params = []
+        if hasattr(cv2, "CAP_PROP_HW_ACCELERATION"):
+            params = [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+        cap = cv2.VideoCapture(str(self.uri), cv2.CAP_FFMPEG, params)
+        if not cap.isOpened() and params:
+            cap = cv2.VideoCapture(str(self.uri), cv2.CAP_FFMPEG)
+        if self.kind == "stream":
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        elif self.start_position:
+            cap.set(cv2.CAP_PROP_POS_MSEC, self.start_position * 1000.0)
+        return cap
+
+    def prepare(self, frame):
+        """Resize a decoded frame to the size the models and the UI work at"""
+        h, w = frame.shape[:2]
+        if self.kind == "camera":
+            if (w, h) != tuple(self.frame_size):
+                frame = cv2.resize(frame, self.frame_size)
+        elif self.max_width and w > self.max_width:
+            frame = cv2.resize(frame, (self.max_width, round(h * self.max_width / w)), interpolation=cv2.INTER_AREA)
+        return frame
+
+
+class FramePacket:
+    """A captured frame and the timing information the later stages need"""
+
+    def __init__(self, frame_id, frame, captured_at, position=None):
+        self.frame_id = frame_id
+        self.frame = frame
+        self.captured_at = captured_at
+        # Seconds into the video for file sources
+        self.position = position
+        self.result = None
+
+
+class RealtimePipeline:
+    """
+    Capture thread -> inference worker -> renderer.
+
+    `source` is a VideoSource and `process_fn(frame)` runs on the worker
+    thread (model calls only; it must not touch Streamlit). The renderer
+    calls get_result() and then rendered(packet) once the frame is on screen,
+    so the KPI panel can show per-stage FPS/latency plus end-to-end latency.
+
+    Live sources drop stale frames; file sources apply backpressure instead,
+    and the pipeline finishes once the last frame has been rendered.
+    """
+
+    def __init__(self, source, process_fn, result_queue_size=2):
+        self.source = source
+        self.process_fn = process_fn
+
+        drop_oldest = source.is_live
+        self.frames = LatestQueue(maxsize=1 if drop_oldest else 4, drop_oldest=drop_oldest)
+        self.results = LatestQueue(maxsize=result_queue_size, drop_oldest=drop_oldest)
+        self.stats = {name: StageStats() for name in ("capture", "inference", "render")}
+        self.end_to_end = StageStats()
+
+        self._stop = threading.Event()
+        self._source_done = threading.Event()
+        self._inference_done = threading.Event()
+        self._threads = []
+        self.capture = None
+        self.error = None
+        self.duration = None
+
+    def start(self):
+        """Open the source and start the background stages. Returns False if the source is unavailable."""
+        self.capture = self.source.open()
+        if self.capture is None or not self.capture.isOpened():
+            return False
+        if not self.source.is_live:
+            fps = self.capture.get(cv2.CAP_PROP_FPS) or 0
+            frames = self.capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0
+            self.duration = frames / fps if fps > 0 and frames > 0 else None
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name="rt-capture", daemon=True),
+            threading.Thread(target=self._inference_loop, name="rt-inference", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=2.0)
+        self._threads = []
+        if self.capture is not None:
+            self.capture.release()
+            self.capture = None
+
+    @property
+    def running(self):
+        if self._stop.is_set():
+            return False
+        # A recording is finished once everything decoded has been rendered
+        return not (self._inference_done.is_set() and len(self.results) == 0)
+
+    def _read(self):
+        ret, frame = self.capture.read()
+        attempts = 0
+        while not ret and self.source.kind == "stream" and attempts < self.source.reconnect_attempts:
+            # Network streams drop; reopen before giving up
+            attempts += 1
+            self.capture.release()
+            time.sleep(1.0)
+            self.capture = self.source.open()
+            ret, frame = self.capture.read() if self.capture.isOpened() else (False, None)
+        return ret, frame
+
+    def _skip_file_frames(self):
+        """Grab (without converting) the frames between file samples"""
+        fps = self.capture.get(cv2.CAP_PROP_FPS) or 0
+        step = round(fps / self.source.sample_fps) if fps > 0 else 1
+        for _ in range(step - 1):
+            if not self.capture.grab():
+                return False
+        return True
+
+    def _capture_loop(self):
+        frame_id = 0
+        last_sample = None
+        sample_interval = 1.0 / self.source.sample_fps if self.source.sample_fps else 0.0
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            if frame_id and sample_interval and not self.source.is_live and not self._skip_file_frames():
+                break
+            ret, frame = self._read()
+            if not ret:
+                # Camera unplugged, stream lost or end of file
+                break
+            if sample_interval and self.source.is_live:
+                if last_sample is not None and start - last_sample < sample_interval:
+                    continue
+                last_sample = start
+
+            position = None
+            if not self.source.is_live:
+                position = self.capture.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+            frame = self.source.prepare(frame)
+            self.stats["capture"].record(time.perf_counter() - start)
+            packet = FramePacket(frame_id, frame, time.perf_counter(), position)
+            while not self.frames.put(packet, timeout=0.1):
+                if self._stop.is_set():
+                    return
+            frame_id += 1
+        self._source_done.set()
+
+    def _inference_loop(self):
+        while not self._stop.is_set():
+            packet = self.frames.get(timeout=0.1)
+            if packet is None:
+                if self._source_done.is_set() and len(self.frames) == 0:
+                    break
+                continue
+            start = time.perf_counter()
+            try:
+                packet.result = self.process_fn(packet.frame)
+            except Exception as e:
+                self.error = e
+                self._stop.set()
+                break
+            self.stats["inference"].record(time.perf_counter() - start)
+            while not self.results.put(packet, timeout=0.1):
+                if self._stop.is_set():
+                    return
+        self._inference_done.set()
+
+    def get_result(self, timeout=0.5):
+        """Next processed FramePacket, or None if nothing is ready"""
+        return self.results.get(timeout)
+
+    def rendered(self, packet, render_started):
+        now = time.perf_counter()
+        self.stats["render"].record(now - render_started)
+        self.end_to_end.record(now - packet.captured_at)
+
+    def snapshot(self):
+        """Per-stage {"fps", "latency_ms"}, end-to-end latency and dropped frame counts"""
+        stats = {name: stage.snapshot() for name, stage in self.stats.items()}
+        stats["end_to_end_ms"] = self.end_to_end.snapshot()["latency_ms"]
+        stats["dropped_frames"] = self.frames.dropped
+        stats["dropped_results"] = self.results.dropped
+        return stats
@@ -0,0 +1,271 @@
+"""
+Box tracking utilities for DEPI system
+
+A SORT-style tracker: each object is a constant-velocity Kalman filter over
+its box, and detections are associated with tracks by IoU. Between detector
+runs the filters are only predicted, which moves boxes along with the
+objects at a fraction of the cost of running the model.
+
+Tracks keep a stable id for as long as the object is followed, and TrackLog
+turns them into one log row per object instead of one row per box per frame.
+"""
+
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# One tracker output: int xyxy box, class label, last confidence, stable id, detector matches so far
+TrackedBox = namedtuple("TrackedBox", ["box", "label", "confidence", "track_id", "hits"])
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """Pairwise IoU of (N, 4) and (M, 4) xyxy boxes, as an (N, M) array"""
+    boxes_a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    if not len(boxes_a) or not len(boxes_b):
+        return np.zeros((len(boxes_a), len(boxes_b)), dtype=np.float32)
+
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return inter / np.maximum(union, 1e-6)
+
+
+def match_by_iou(iou, threshold):
+    """
+    Greedy one-to-one matching on an IoU matrix, highest IoU first.
+    Returns (matches [(row, col)], unmatched rows, unmatched cols).
+    """
+    matches = []
+    if iou.size:
+        rows, cols = np.unravel_index(np.argsort(-iou, axis=None), iou.shape)
+        used_rows, used_cols = set(), set()
+        for row, col in zip(rows, cols):
+            if iou[row, col] < threshold:
+                break
+            if row in used_rows or col in used_cols:
+                continue
+            matches.append((row, col))
+            used_rows.add(row)
+            used_cols.add(col)
+    matched_rows = {row for row, _ in matches}
+    matched_cols = {col for _, col in matches}
+    unmatched_rows = [row for row in range(iou.shape[0]) if row not in matched_rows]
+    unmatched_cols = [col for col in range(iou.shape[1]) if col not in matched_cols]
+    return matches, unmatched_rows, unmatched_cols
+
+
+def _box_to_z(box):
+    x1, y1, x2, y2 = box
+    w, h = max(x2 - x1, 1.0), max(y2 - y1, 1.0)
+    return np.array([x1 + w / 2.0, y1 + h / 2.0, w * h, w / h], dtype=np.float64)
+
+
+def _x_to_box(x):
+    area, ratio = max(x[2], 1.0), max(x[3], 1e-3)
+    w = np.sqrt(area * ratio)
+    h = area / w
+    return np.array([x[0] - w / 2.0, x[1] - h / 2.0, x[0] + w / 2.0, x[1] + h / 2.0])
+
+
+class KalmanBoxTrack:
+    """
+    One tracked box. State is [cx, cy, area, aspect, vx, vy, v_area] with a
+    constant-velocity model (the SORT formulation).
+    """
+
+    # Shared model matrices
+    F = np.eye(7)
+    F[0, 4] = F[1, 5] = F[2, 6] = 1.0
+    H = np.eye(4, 7)
+    R = np.diag([1.0, 1.0, 10.0, 10.0])
+    Q = np.diag([1.0, 1.0, 1.0, 1.0, 0.01, 0.01, 0.0001])
+
+    def __init__(self, track_id, box, label, confidence):
+        self.track_id = track_id
+        self.label = label
+        self.confidence = confidence
+        self.x = np.zeros(7)
+        self.x[:4] = _box_to_z(box)
+        self.P = np.diag([10.0, 10.0, 10.0, 10.0, 1000.0, 1000.0, 1000.0])
+        self.hits = 1
+        self.misses = 0
+
+    def predict(self):
+        if self.x[2] + self.x[6] <= 0:
+            self.x[6] = 0.0
+        self.x = self.F @ self.x
+        self.P = self.F @ self.P @ self.F.T + self.Q
+        return self.box
+
+    def update(self, box, confidence):
+        y = _box_to_z(box) - self.H @ self.x
+        S = self.H @ self.P @ self.H.T + self.R
+        K = self.P @ self.H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ y
+        self.P = (np.eye(7) - K @ self.H) @ self.P
+        self.confidence = confidence
+        self.hits += 1
+        self.misses = 0
+
+    @property
+    def box(self):
+        return _x_to_box(self.x)
+
+
+class BoxTracker:
+    """
+    Keeps Kalman tracks for detections of one or more classes.
+
+    Call predict() once per frame and update(detections) on frames where the
+    detector ran. Detections only match tracks of the same class. A track is
+    dropped after `max_misses` detector runs without a match.
+
+    Association is ByteTrack-style: confident detections are matched first
+    and may start new tracks; low-confidence detections (`low_detections`)
+    are then matched only against the tracks still unmatched, which keeps
+    ids alive through partial occlusion without creating spurious tracks.
+
+    New tracks are numbered from `start_id`, so a resumed job can continue
+    the ids of the run it picks up from (see next_id).
+    """
+
+    def __init__(self, iou_threshold=0.3, max_misses=2, start_id=1):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.tracks = []
+        self._next_id = start_id
+
+    @property
+    def next_id(self):
+        return self._next_id
+
+    def predict(self):
+        for track in self.tracks:
+            track.predict()
+
+    def _associate(self, tracks, detections):
+        """Match `tracks` with same-class `detections`; updates the matched tracks"""
+        iou = iou_matrix([track.box for track in tracks], [box for box, _, _ in detections])
+        if iou.size:
+            same_class = np.array([[track.label == label for _, label, _ in detections] for track in tracks])
+            iou = np.where(same_class, iou, 0.0)
+
+        matches, unmatched_tracks, unmatched_dets = match_by_iou(iou, self.iou_threshold)
+        for t, d in matches:
+            box, _, confidence = detections[d]
+            tracks[t].update(box, confidence)
+        return [tracks[t] for t, _ in matches], [tracks[t] for t in unmatched_tracks], unmatched_dets
+
+    def update(self, detections, low_detections=()):
+        """
+        detections / low_detections: [(box xyxy, label, confidence)].
+        Returns the tracks that were matched or created.
+        """
+        updated, remaining, unmatched_dets = self._associate(self.tracks, detections)
+        if low_detections and remaining:
+            recovered, remaining, _ = self._associate(remaining, low_detections)
+            updated += recovered
+        for track in remaining:
+            track.misses += 1
+        for d in unmatched_dets:
+            box, label, confidence = detections[d]
+            track = KalmanBoxTrack(self._next_id, box, label, confidence)
+            self._next_id += 1
+            self.tracks.append(track)
+            updated.append(track)
+
+        self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+        return updated
+
+    def outputs(self, frame_shape=None):
+        """
+        TrackedBox for every track seen at the last detector run, with boxes
+        clipped to the frame
+        """
+        results = []
+        for track in self.tracks:
+            if track.misses:
+                continue
+            box = track.box
+            if frame_shape is not None:
+                h, w = frame_shape[:2]
+                box = np.clip(box, 0, [w, h, w, h])
+            results.append(TrackedBox(box.astype(int), track.label, track.confidence, track.track_id, track.hits))
+        return results
+
+
+# Origin of footage_time(): record times then read as HH:MM:SS into the video
+FOOTAGE_START = datetime(2000, 1, 1)
+
+
+def footage_time(position_sec):
+    """
+    TrackLog timestamp of a frame `position_sec` seconds into a video file,
+    so first/last seen and dwell time follow the footage rather than how fast
+    it was processed
+    """
+    return FOOTAGE_START + timedelta(seconds=position_sec)
+
+
+class TrackLog:
+    """
+    Session log with one row per tracked object: first/last seen, dwell time,
+    max confidence and the number of frames it was shown in. Tracks with
+    fewer than `min_hits` detector matches are not logged, so one-frame false
+    positives don't count as objects. Times are wall-clock unless observe()
+    is given a timestamp, e.g. footage_time() for a video file.
+    """
+
+    def __init__(self, min_hits=2):
+        self.min_hits = min_hits
+        self._rows = {}
+
+    def observe(self, tracked_boxes, timestamp=None):
+        timestamp = timestamp or datetime.now()
+        for tracked in tracked_boxes:
+            if tracked.hits < self.min_hits:
+                continue
+            row = self._rows.get(tracked.track_id)
+            if row is None:
+                self._rows[tracked.track_id] = {
+                    "Track ID": tracked.track_id, "Class": tracked.label,
+                    "First Seen": timestamp, "Last Seen": timestamp,
+                    "Max Confidence": tracked.confidence, "Frames": 1
+                }
+            else:
+                row["Last Seen"] = timestamp
+                row["Max Confidence"] = max(row["Max Confidence"], tracked.confidence)
+                row["Frames"] += 1
+
+    def __len__(self):
+        return len(self._rows)
+
+    def records(self):
+        """Rows in first-seen order, with times formatted and dwell time in seconds"""
+        return [
+            {
+                "Track ID": row["Track ID"],
+                "Class": row["Class"],
+                "First Seen": row["First Seen"].strftime("%H:%M:%S"),
+                "Last Seen": row["Last Seen"].strftime("%H:%M:%S"),
+                "Dwell (s)": round((row["Last Seen"] - row["First Seen"]).total_seconds(), 1),
+                "Max Confidence": row["Max Confidence"],
+                "Frames": row["Frames"]
+            }
+            for row in self._rows.values()
+        ]
+
+    def unique_counts(self):
+        """Number of distinct tracked objects per class"""
+        counts = {}
+        for row in self._rows.values():
+            counts[row["Class"]] = counts.get(row["Class"], 0) + 1
+        return counts
@@ -1,18 +1,24 @@
 import torch
 import torch.nn as nn
-import torchvision.transforms as transforms
 from torchvision.models import efficientnet_b0, resnet50
 import numpy as np
-from PIL import Image
 import matplotlib.pyplot as plt
 import os
 from typing import Dict
 import warnings
-import io
 import base64
 import json
+import sys
 warnings.filterwarnings('ignore')
 
+# Preprocessing spec library (DEPI_Project_App/utils/preprocessing.py). A
+# deployed folder ships a copy made by ../package_preprocessing.py; in the
+# repo the original is imported.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+sys.path.append(os.path.join(SCRIPT_DIR, "..", "..", "DEPI_Project_App", "utils"))
+from preprocessing import CAR_CLASSIFIER_SPEC, load_spec, open_image
+
 import torch.serialization
 try:
     from numpy.core.multiarray import scalar
@@ -67,10 +73,13 @@ class MultiTaskCarClassifier(nn.Module):
             'year': self.year_head(features)
         }
 
+# Uploads above this many pixels are rejected before any pixel data is decoded.
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", 40_000_000))
+
 label_mappings = {}
 label_names={}
 def init():
-    global model, label_mappings,label_names
+    global model, label_mappings,label_names, spec
     
     model_dir = os.getenv("AZUREML_MODEL_DIR")
     supported_ext = ['.pt', '.pth']
@@ -95,6 +104,8 @@ def init():
     if model_path is None:
         raise RuntimeError("No model file found in AZUREML_MODEL_DIR.")
     
+    # The spec registered with the model sits next to it
+    spec = load_spec(os.path.dirname(model_path), default=CAR_CLASSIFIER_SPEC)
     print(f"Loading model from: {model_path}")
     
     checkpoint = torch.load(model_path, map_location=torch.device('cpu'), weights_only=False)
@@ -122,32 +133,28 @@ def init():
     print(f"  - Years: {arch_info['num_years']} classes")
     print(f"  - Backbone: {arch_info['backbone']}")
 
-def preprocess_image(image_bytes, target_size=(224, 224)):
-    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-    
-    transform = transforms.Compose([
-        transforms.Resize(target_size),
-        transforms.ToTensor(),
-        transforms.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225])
-    ])
-    
-    img_tensor = transform(img).unsqueeze(0)
-    return img_tensor
+def preprocess_image(image_bytes):
+    img = open_image(image_bytes, spec.size, MAX_IMAGE_PIXELS)
+    return torch.from_numpy(spec.apply(img))
 
 def run(raw_data):
     try:
         # Parse input
         data = json.loads(raw_data) if isinstance(raw_data, (str, bytes, bytearray)) else raw_data
         
-        image_base64 = data.get("image") or data.get("image_base64")
-        if not image_base64:
-            return {"error": "Missing 'image' or 'image_base64' key in request JSON."}
-        try:
-            image_bytes = base64.b64decode(image_base64, validate=True)
-        except Exception:
-            return {"error": "Invalid base64 image payload."}
-        
-        img_tensor = preprocess_image(image_bytes)
+        if data.get("tensor"):
+            # Already resized on the client with the same spec
+            img_tensor = torch.from_numpy(spec.normalize_batch(spec.decode_tensor(data)))
+        else:
+            image_base64 = data.get("image") or data.get("image_base64")
+            if not image_base64:
+                return {"error": "Missing 'image' or 'image_base64' key in request JSON."}
+            try:
+                image_bytes = base64.b64decode(image_base64, validate=True)
+            except Exception:
+                return {"error": "Invalid base64 image payload."}
+
+            img_tensor = preprocess_image(image_bytes)
 
         with torch.no_grad():
             outputs = model(img_tensor)
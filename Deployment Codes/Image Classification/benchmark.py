@@ -0,0 +1,66 @@
+"""
+Compare Keras model.predict against the compiled serving function used by main.run()
+
+Usage:
+    python benchmark.py --model cifar10_model_final_mlflow.keras --iterations 200
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+import keras
+
+from main import build_serving_fn
+from preprocessing import CIFAR10_CLASSIFIER_SPEC, load_spec
+
+
+def time_calls(fn, batch, iterations, warmup=5):
+    for _ in range(warmup):
+        fn(batch)
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn(batch)
+        timings.append(time.perf_counter() - start)
+    return np.array(timings) * 1000.0
+
+
+def summarize(name, timings_ms, batch_size):
+    p50 = np.percentile(timings_ms, 50)
+    p95 = np.percentile(timings_ms, 95)
+    throughput = batch_size / (timings_ms.mean() / 1000.0)
+    print(f"{name:<24} p50 {p50:8.2f} ms | p95 {p95:8.2f} ms | {throughput:8.1f} img/s")
+    return p50
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark predict() vs compiled serving")
+    parser.add_argument("--model", required=True, help="Path to the .keras/.h5 model")
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    args = parser.parse_args()
+
+    # The spec registered with the model sits next to it, as in main.init()
+    input_shape = load_spec(os.path.dirname(args.model), default=CIFAR10_CLASSIFIER_SPEC).input_shape
+    model = keras.models.load_model(args.model)
+    serve = build_serving_fn(model, input_shape)
+    serve_xla = build_serving_fn(model, input_shape, jit_compile=True)
+
+    for batch_size in args.batch_sizes:
+        batch = np.random.rand(batch_size, *input_shape).astype(np.float32)
+        tensor = tf.convert_to_tensor(batch)
+        print(f"\nBatch size {batch_size}")
+
+        base = summarize(
+            "model.predict", time_calls(lambda x: model.predict(x, verbose=0), batch, args.iterations), batch_size
+        )
+        compiled = summarize("tf.function", time_calls(serve, tensor, args.iterations), batch_size)
+        xla = summarize("tf.function + XLA", time_calls(serve_xla, tensor, args.iterations), batch_size)
+
+        print(f"Speedup vs predict: {base / compiled:.2f}x (tf.function), {base / xla:.2f}x (XLA)")
+
+
+if __name__ == "__main__":
+    main()
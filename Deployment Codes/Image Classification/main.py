@@ -2,57 +2,185 @@ import json
 import numpy as np
 import os
 import tensorflow as tf
-from PIL import Image
-import io
 import base64
+import sys
+import threading
 import keras
-def init():
-    global model    
-    model_dir = os.getenv("AZUREML_MODEL_DIR")
-    files = os.listdir(model_dir)
 
-    supported_ext = [".keras", ".h5", ".pb"]
+# Preprocessing spec library (DEPI_Project_App/utils/preprocessing.py). A
+# deployed folder ships a copy made by ../package_preprocessing.py; in the
+# repo the original is imported.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, SCRIPT_DIR)
+sys.path.append(os.path.join(SCRIPT_DIR, "..", "..", "DEPI_Project_App", "utils"))
+from preprocessing import CIFAR10_CLASSIFIER_SPEC, load_spec, open_image
 
-    model_path = None
+# Uploads above this many pixels are rejected before any pixel data is decoded.
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", 40_000_000))
+# Compile the serving function with XLA (set USE_XLA=1 to enable).
+USE_XLA = os.getenv("USE_XLA", "0") == "1"
+# Threads used by the TFLite interpreter when a .tflite model is deployed.
+TFLITE_NUM_THREADS = int(os.getenv("TFLITE_NUM_THREADS", os.cpu_count() or 1))
 
-    for f in files:
-        if any(f.endswith(ext) for ext in supported_ext):
-            model_path = os.path.join(model_dir, f)
-            break
-        
-    model=keras.models.load_model(model_path)
+# Serve the latest version from a local model registry directory instead of
+# AZUREML_MODEL_DIR (see MLflow [Baseline-Control]/local_registry.py).
+LOCAL_MODEL_REGISTRY = os.getenv("LOCAL_MODEL_REGISTRY")
+LOCAL_MODEL_NAME = os.getenv("LOCAL_MODEL_NAME", "image-classification-model")
+
+def build_serving_fn(model, input_shape, jit_compile=False):
+    """
+    Wrap the model in a tf.function with a fixed (None, *input_shape) input
+    signature so a request runs a single traced graph instead of Keras's
+    predict loop. `input_shape` is the spec's (H, W, 3).
+    """
+    @tf.function(
+        input_signature=[tf.TensorSpec(shape=[None, *input_shape], dtype=tf.float32)],
+        jit_compile=jit_compile,
+    )
+    def serve(images):
+        return model(images, training=False)
+
+    return serve
+
+class TFLiteClassifier:
+    """
+    Scoring wrapper around a (full-integer) TFLite model. Quantizes float
+    inputs and dequantizes outputs using the interpreter's own parameters.
+    """
+    def __init__(self, model_path, num_threads=TFLITE_NUM_THREADS):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            Interpreter = tf.lite.Interpreter
+
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()[0]
+        self.output_details = self.interpreter.get_output_details()[0]
+        self.batch_size = int(self.input_details["shape"][0])
+        # The interpreter holds per-invocation state, so calls are serialized.
+        self.lock = threading.Lock()
+
+    def _quantize(self, img_array):
+        dtype = self.input_details["dtype"]
+        if dtype == np.float32:
+            return img_array.astype(np.float32)
+        scale, zero_point = self.input_details["quantization"]
+        info = np.iinfo(dtype)
+        quantized = np.round(img_array / scale + zero_point)
+        return np.clip(quantized, info.min, info.max).astype(dtype)
+
+    def _dequantize(self, output):
+        scale, zero_point = self.output_details["quantization"]
+        if scale == 0:
+            return output.astype(np.float32)
+        return (output.astype(np.float32) - zero_point) * scale
+
+    def __call__(self, img_array):
+        with self.lock:
+            if img_array.shape[0] != self.batch_size:
+                self.interpreter.resize_tensor_input(self.input_details["index"], img_array.shape)
+                self.interpreter.allocate_tensors()
+                self.batch_size = img_array.shape[0]
+            self.interpreter.set_tensor(self.input_details["index"], self._quantize(img_array))
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self.output_details["index"])
+        return self._dequantize(output)
+
+def get_model_dir():
+    """
+    AZUREML_MODEL_DIR, or the latest LOCAL_MODEL_NAME version in LOCAL_MODEL_REGISTRY
+    """
+    if LOCAL_MODEL_REGISTRY:
+        sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "MLflow [Baseline-Control]"))
+        from registry_manifest import resolve_model_dir
+        return resolve_model_dir(LOCAL_MODEL_REGISTRY, LOCAL_MODEL_NAME)
+    return os.getenv("AZUREML_MODEL_DIR")
+
+def find_model_file(model_dir, supported_ext):
+    """
+    First file with one of `supported_ext` in model_dir or its subdirectories
+    (a model registered as a folder is deployed inside that folder), or None
+    """
+    for root, _, files in sorted(os.walk(model_dir)):
+        for f in sorted(files):
+            if any(f.endswith(ext) for ext in supported_ext):
+                return os.path.join(root, f)
+    return None
+
+def init():
+    global model, serve_fn, tflite_model, spec
+    model_dir = get_model_dir()
+
+    # A deployed .tflite model takes precedence over the Keras model
+    tflite_model = None
+    tflite_path = find_model_file(model_dir, [".tflite"])
+    model_path = tflite_path or find_model_file(model_dir, [".keras", ".h5", ".pb"])
     if model_path is None:
         raise RuntimeError("No model file found in AZUREML_MODEL_DIR.")
+
+    # The spec registered with the model sits next to it
+    spec = load_spec(os.path.dirname(model_path), default=CIFAR10_CLASSIFIER_SPEC)
+    print(f"Preprocessing spec: {spec.to_dict()}")
+
+    if tflite_path:
+        print(f"Loading TFLite model from: {tflite_path} ({TFLITE_NUM_THREADS} threads)")
+        tflite_model = TFLiteClassifier(tflite_path)
+        return
+
     print(f"Loading model from: {model_path}")
+    model=keras.models.load_model(model_path)
 
+    serve_fn = build_serving_fn(model, spec.input_shape, jit_compile=USE_XLA)
+    # Trace (and XLA-compile) once here rather than on the first request.
+    serve_fn(tf.zeros((1, *spec.input_shape), dtype=tf.float32))
+    print(f"Serving function ready (XLA: {USE_XLA})")
 
+def preprocess_image(image_bytes):
+    img = open_image(image_bytes, spec.size, MAX_IMAGE_PIXELS)
+    return spec.apply(img)
 
-def preprocess_image(image_bytes, target_size=(224, 224)):
-    img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-    img = img.resize(target_size)
-    img_array = keras.preprocessing.image.img_to_array(img)
-    img_array = np.expand_dims(img_array, axis=0)
-    img_array = img_array / 255.0
-    return img_array
+def predict_batch(img_array):
+    """
+    Run the TFLite interpreter or compiled serving function on a
+    (N, *spec.input_shape) float32 batch
+    """
+    if tflite_model is not None:
+        preds = tflite_model(img_array)
+    else:
+        preds = serve_fn(tf.convert_to_tensor(img_array, dtype=tf.float32)).numpy()
+    return [
+        {
+            "predicted_class": int(np.argmax(p)),
+            "confidence": float(np.max(p))
+        }
+        for p in preds
+    ]
 
 def run(raw_data):
     try:
         data = json.loads(raw_data)
+
+        # Clients may send a uint8 tensor already resized with the same spec
+        if data.get("tensor"):
+            return predict_batch(spec.normalize_batch(spec.decode_tensor(data)))[0]
+
+        # Batched requests send a list under "images"
+        images_base64 = data.get("images")
+        if images_base64:
+            img_array = spec.apply_batch(
+                [open_image(base64.b64decode(b64), spec.size, MAX_IMAGE_PIXELS) for b64 in images_base64]
+            )
+            return {"predictions": predict_batch(img_array)}
+
         image_base64 = data.get("image")
         if not image_base64:
-            return json.dumps({"error": "Missing 'image' key in request JSON."})
+            return {"error": "Missing 'image' key in request JSON."}
 
         image_bytes = base64.b64decode(image_base64)
         img_array = preprocess_image(image_bytes)
 
-        preds = model.predict(img_array)
-        predicted_class = int(np.argmax(preds, axis=1)[0])
-        confidence = float(np.max(preds))
-
-        return{
-            "predicted_class": predicted_class,
-            "confidence": confidence
-        }
+        return predict_batch(img_array)[0]
 
     except Exception as e:
-        return json.dumps({"error": str(e)})
+        return {"error": str(e)}
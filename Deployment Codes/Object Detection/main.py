@@ -1,14 +1,42 @@
 import ultralytics
 import os
-from PIL import Image
+import sys
+from PIL import ExifTags, Image
 import io
 import json
 import base64
 import cv2
 import numpy as np
+
+# Uploads above this many pixels are rejected before any pixel data is decoded.
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", 40_000_000))
+# YOLO letterboxes to this size, so anything larger is decoded at reduced resolution.
+MODEL_INPUT_SIZE = int(os.getenv("MODEL_INPUT_SIZE", 640))
+
+# Serve the latest version from a local model registry directory instead of
+# AZUREML_MODEL_DIR (see MLflow [Baseline-Control]/local_registry.py).
+LOCAL_MODEL_REGISTRY = os.getenv("LOCAL_MODEL_REGISTRY")
+LOCAL_MODEL_NAME = os.getenv("LOCAL_MODEL_NAME", "object-detection-model")
+
+REDUCED_DECODE_FLAGS = [
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+]
+
+def get_model_dir():
+    """
+    AZUREML_MODEL_DIR, or the latest LOCAL_MODEL_NAME version in LOCAL_MODEL_REGISTRY
+    """
+    if LOCAL_MODEL_REGISTRY:
+        sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "MLflow [Baseline-Control]"))
+        from registry_manifest import resolve_model_dir
+        return resolve_model_dir(LOCAL_MODEL_REGISTRY, LOCAL_MODEL_NAME)
+    return os.getenv("AZUREML_MODEL_DIR")
+
 def init():
     global model    
-    model_dir = os.getenv("AZUREML_MODEL_DIR")
+    model_dir = get_model_dir()
     files = os.listdir(model_dir)
 
     supported_ext = [".pt"]
@@ -30,6 +58,73 @@ def preprocess_image(image_bytes):
     img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
     return img
 
+# EXIF orientations that rotate the image by 90 degrees (width and height swap)
+TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+def read_image_size(image_bytes):
+    """
+    Read the displayed (width, height) from the image header without decoding
+    the pixels. cv2.imdecode applies the EXIF orientation, so a rotated phone
+    photo is reported with width and height swapped, as it will be decoded.
+    """
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        w, h = img.size
+        if img.getexif().get(ExifTags.Base.Orientation) in TRANSPOSED_ORIENTATIONS:
+            w, h = h, w
+        return w, h
+
+def decode_image(image_bytes, target_size=MODEL_INPUT_SIZE):
+    """
+    Decode an upload as BGR, using reduced-resolution decoding when the image is
+    larger than the model needs. Raises ValueError for undecodable or oversized
+    uploads. Returns (image, original (w, h), (scale_x, scale_y)) where the
+    scales map coordinates on the decoded image back to the original.
+    """
+    try:
+        w, h = read_image_size(image_bytes)
+    except Exception:
+        raise ValueError("Failed to decode image")
+
+    if w * h > MAX_IMAGE_PIXELS:
+        raise ValueError(
+            f"Image too large: {w}x{h} exceeds the {MAX_IMAGE_PIXELS} pixel limit"
+        )
+
+    flag = cv2.IMREAD_COLOR
+    for factor, reduced_flag in REDUCED_DECODE_FLAGS:
+        if max(w, h) // factor >= target_size:
+            flag = reduced_flag
+            break
+
+    nparr = np.frombuffer(image_bytes, np.uint8)
+    img = cv2.imdecode(nparr, flag)
+    if img is None:
+        raise ValueError("Failed to decode image")
+
+    # Scales come from the decoded (orientation-corrected) shape
+    dh, dw = img.shape[:2]
+    return img, (w, h), (w / dw, h / dh)
+
+def scale_predictions(preds, scale_x, scale_y):
+    """
+    Map boxes, segments and keypoints from decoded-image to original-image coordinates
+    """
+    if scale_x == 1 and scale_y == 1:
+        return preds
+    for pred in preds:
+        box = pred.get("box")
+        if box:
+            for key in ("x1", "x2"):
+                box[key] = box[key] * scale_x
+            for key in ("y1", "y2"):
+                box[key] = box[key] * scale_y
+        for key in ("segments", "keypoints"):
+            points = pred.get(key)
+            if points:
+                points["x"] = [x * scale_x for x in points.get("x", [])]
+                points["y"] = [y * scale_y for y in points.get("y", [])]
+    return preds
+
 def run(raw_data):
     try:
         data = json.loads(raw_data) if isinstance(raw_data, (str, bytes, bytearray)) else raw_data
@@ -49,12 +144,7 @@ def run(raw_data):
         if not img_bytes:
             return {"error": "Empty image payload"}
 
-        nparr = np.frombuffer(img_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        if img is None:
-            return {"error": "Failed to decode image"}
-
-        h, w = img.shape[:2]
+        img, (w, h), (scale_x, scale_y) = decode_image(img_bytes)
 
         results = model(img, conf=conf, iou=iou)
         result = results[0]
@@ -63,12 +153,13 @@ def run(raw_data):
         if not ok:
             return {"error": "Failed to encode annotated image"}
         out_b64 = base64.b64encode(buf).decode("utf-8")
-        preds_json = json.loads(result.to_json())
+        preds_json = scale_predictions(json.loads(result.to_json()), scale_x, scale_y)
 
         return {
             "image_base64": out_b64,
             "image_format": "png",
             "image_shape": {"width": int(w), "height": int(h)},
+            "annotated_shape": {"width": int(annotated.shape[1]), "height": int(annotated.shape[0])},
             "predictions": preds_json,
             "classes": result.names
         }
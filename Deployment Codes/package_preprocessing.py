@@ -0,0 +1,50 @@
+"""
+Copy the preprocessing spec library into the scoring script folders
+
+Scoring scripts are deployed one folder at a time, but the spec library has
+a single source, DEPI_Project_App/utils/preprocessing.py. Run this before
+deploying a classifier so its folder ships preprocessing.py next to main.py.
+In the repo the scripts import the original directly, and the copies are
+git-ignored.
+
+Usage:
+    python package_preprocessing.py            # copy into every folder
+    python package_preprocessing.py --check    # exit 1 if a copy is missing or stale
+"""
+import argparse
+import filecmp
+import os
+import shutil
+import sys
+
+DEPLOYMENT_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE = os.path.join(DEPLOYMENT_DIR, "..", "DEPI_Project_App", "utils", "preprocessing.py")
+# Scoring script folders that import preprocessing
+TARGETS = ("Car Classifier", "Image Classification")
+
+
+def stale_copies():
+    """Paths of copies that are missing or differ from the source"""
+    paths = [os.path.join(DEPLOYMENT_DIR, folder, "preprocessing.py") for folder in TARGETS]
+    return [path for path in paths if not os.path.exists(path) or not filecmp.cmp(SOURCE, path, shallow=False)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy utils/preprocessing.py into the scoring script folders")
+    parser.add_argument("--check", action="store_true", help="Only report missing or stale copies")
+    args = parser.parse_args()
+
+    stale = stale_copies()
+    if args.check:
+        for path in stale:
+            print(f"Missing or out of date: {path}")
+        return 1 if stale else 0
+
+    for path in stale:
+        shutil.copyfile(SOURCE, path)
+        print(f"Copied {os.path.normpath(SOURCE)} -> {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
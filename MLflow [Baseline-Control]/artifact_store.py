@@ -0,0 +1,120 @@
+# MLflow/artifact_store.py
+import hashlib
+import os
+import shutil
+import tempfile
+
+CHUNK_SIZE = 8 * 1024 * 1024
+BLOB_MODE = 0o444
+
+
+def hash_file(path, chunk_size=CHUNK_SIZE):
+    """SHA-256 of a file, read in fixed-size chunks so large models never sit in memory"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_tree(path):
+    """
+    Digest of a model file, or of a model directory (relative paths and file
+    digests, so the same content hashes the same wherever it lives)
+    """
+    if os.path.isfile(path):
+        return hash_file(path)
+    return digest_entries(tree_entries(path))
+
+
+def digest_entries(entries):
+    """Single digest for a list of tree_entries()"""
+    digest = hashlib.sha256()
+    for entry in entries:
+        digest.update(f"{entry['path']}\0{entry['digest']}\n".encode())
+    return digest.hexdigest()
+
+
+def tree_entries(path):
+    """[{path, digest, size}] for a file or every file under a directory"""
+    if os.path.isfile(path):
+        return [{"path": os.path.basename(path), "digest": hash_file(path), "size": os.path.getsize(path)}]
+    entries = []
+    for root, _, files in os.walk(path):
+        for name in sorted(files):
+            full_path = os.path.join(root, name)
+            entries.append({
+                "path": os.path.relpath(full_path, path),
+                "digest": hash_file(full_path),
+                "size": os.path.getsize(full_path)
+            })
+    return sorted(entries, key=lambda entry: entry["path"])
+
+
+class ContentStore:
+    """
+    Content-addressed blob store: every distinct file is kept once under
+    blobs/<first two hex chars>/<sha256>, however many model versions use it.
+    Versions reference files by digest and are checked out as hard links, so
+    a retrain with unchanged weights costs no extra space.
+
+    A checked-out file shares its blob's inode, so blobs are made read-only:
+    writing to a checkout must not silently change every version using it.
+    Copy a checked-out file before modifying it.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.blob_dir = os.path.join(root, "blobs")
+        os.makedirs(self.blob_dir, exist_ok=True)
+
+    def blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest[:2], digest)
+
+    def has(self, digest):
+        return os.path.exists(self.blob_path(digest))
+
+    def put_file(self, path, digest=None):
+        """Store a file unless its content is already present. Returns (digest, stored_new)."""
+        digest = digest or hash_file(path)
+        target = self.blob_path(digest)
+        if os.path.exists(target):
+            return digest, False
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target))
+        os.close(fd)
+        shutil.copyfile(path, tmp_path)
+        os.chmod(tmp_path, BLOB_MODE)
+        os.replace(tmp_path, target)
+        return digest, True
+
+    def put_tree(self, path):
+        """
+        Store a model file or directory. Returns (entries, bytes_stored) where
+        entries are tree_entries() and bytes_stored counts only new blobs.
+        """
+        entries = tree_entries(path)
+        base = path if os.path.isdir(path) else os.path.dirname(path)
+        bytes_stored = 0
+        for entry in entries:
+            _, stored_new = self.put_file(os.path.join(base, entry["path"]), entry["digest"])
+            if stored_new:
+                bytes_stored += entry["size"]
+        return entries, bytes_stored
+
+    def checkout(self, entries, target_dir):
+        """Recreate the files of `entries` under target_dir as hard links to the blobs"""
+        for entry in entries:
+            target = os.path.join(target_dir, entry["path"])
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            if os.path.exists(target):
+                continue
+            blob = self.blob_path(entry["digest"])
+            # Blobs stored before they were made read-only
+            os.chmod(blob, BLOB_MODE)
+            try:
+                os.link(blob, target)
+            except OSError:
+                # Different filesystem, or links not supported
+                shutil.copyfile(blob, target)
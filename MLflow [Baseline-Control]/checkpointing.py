@@ -0,0 +1,154 @@
+# MLflow/checkpointing.py
+import json
+import os
+import time
+
+import tensorflow as tf
+from tensorflow import keras
+
+
+class TrainingCheckpointer:
+    """
+    Phase-aware checkpoints for the two-phase (frozen, then fine-tune) training.
+
+    Each phase keeps its own tf.train.CheckpointManager holding model weights
+    and optimizer state after every epoch, plus a "final" weights checkpoint
+    once the phase completes. training_state.json records the completed epochs
+    per phase and the MLflow parent/phase run ids, so a resumed process can
+    continue the same runs from the last completed epoch.
+
+    Every fresh training run writes into its own run-<timestamp> subdirectory
+    of `base_dir` and points LATEST_FILE at it; only resume=True reopens the
+    directory LATEST_FILE names. A new run therefore never picks up weights,
+    optimizer state or epochs from an earlier one.
+    """
+    STATE_FILE = "training_state.json"
+    LATEST_FILE = "latest_run.txt"
+
+    def __init__(self, checkpoint_dir="checkpoints", resume=False, max_to_keep=2):
+        self.base_dir = checkpoint_dir
+        self.max_to_keep = max_to_keep
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+        self.state = {"run_ids": {}, "completed_epochs": {}, "completed_phases": []}
+        self.resumed = False
+        run_dir = self._latest_run_dir() if resume else None
+        if run_dir is not None:
+            state_path = os.path.join(run_dir, self.STATE_FILE)
+            with open(state_path) as f:
+                self.state = json.load(f)
+            self.resumed = True
+            print(f"♻️ Resuming from {state_path}: {self.state['completed_epochs']}")
+        else:
+            if resume:
+                print(f"No checkpoints to resume in {checkpoint_dir}, starting a new run")
+            run_dir = self._new_run_dir()
+        self.checkpoint_dir = run_dir
+
+    def _latest_run_dir(self):
+        """Directory of the run to resume, or None"""
+        latest_path = os.path.join(self.base_dir, self.LATEST_FILE)
+        if os.path.exists(latest_path):
+            with open(latest_path) as f:
+                run_dir = os.path.join(self.base_dir, f.read().strip())
+        else:
+            # Checkpoints written before runs had their own directory
+            run_dir = self.base_dir
+        return run_dir if os.path.exists(os.path.join(run_dir, self.STATE_FILE)) else None
+
+    def _new_run_dir(self):
+        name = time.strftime("run-%Y%m%d-%H%M%S")
+        suffix = 1
+        while os.path.exists(os.path.join(self.base_dir, name + (f"-{suffix}" if suffix > 1 else ""))):
+            suffix += 1
+        name += f"-{suffix}" if suffix > 1 else ""
+        os.makedirs(os.path.join(self.base_dir, name))
+
+        latest_path = os.path.join(self.base_dir, self.LATEST_FILE)
+        tmp_path = latest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(name)
+        os.replace(tmp_path, latest_path)
+        return os.path.join(self.base_dir, name)
+
+    def _save_state(self):
+        path = os.path.join(self.checkpoint_dir, self.STATE_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def run_id(self, key):
+        """MLflow run id recorded for `key` ("parent", "phase1", ...), or None"""
+        return self.state["run_ids"].get(key)
+
+    def set_run_id(self, key, run_id):
+        self.state["run_ids"][key] = run_id
+        self._save_state()
+
+    def completed_epochs(self, phase):
+        return self.state["completed_epochs"].get(phase, 0)
+
+    def is_phase_done(self, phase):
+        return phase in self.state["completed_phases"]
+
+    def _manager(self, model, phase):
+        checkpoint = tf.train.Checkpoint(model=model, optimizer=model.optimizer)
+        return tf.train.CheckpointManager(
+            checkpoint, os.path.join(self.checkpoint_dir, phase), max_to_keep=self.max_to_keep
+        )
+
+    def restore(self, model, phase, previous_phase=None):
+        """
+        Restore the latest epoch checkpoint of `phase` into a compiled model and
+        return the epoch to continue from. Without one (or when not resuming),
+        load the final weights of `previous_phase` (if any) and return 0.
+        """
+        manager = self._manager(model, phase)
+        if self.resumed and manager.latest_checkpoint:
+            # Create optimizer slots up front so their saved values restore immediately
+            model.optimizer.build(model.trainable_variables)
+            manager.checkpoint.restore(manager.latest_checkpoint).expect_partial()
+            initial_epoch = self.completed_epochs(phase)
+            print(f"♻️ Restored {phase} from {manager.latest_checkpoint} (epoch {initial_epoch})")
+            return initial_epoch
+
+        if previous_phase:
+            self.restore_final(model, previous_phase)
+        return 0
+
+    def restore_final(self, model, phase):
+        """Load the weights saved when `phase` completed; returns False if there are none"""
+        final_path = tf.train.latest_checkpoint(os.path.join(self.checkpoint_dir, phase, "final"))
+        if not final_path:
+            return False
+        tf.train.Checkpoint(model=model).restore(final_path).expect_partial()
+        print(f"♻️ Loaded final {phase} weights from {final_path}")
+        return True
+
+    def mark_phase_done(self, model, phase):
+        """Save the phase's final weights and record it as completed"""
+        tf.train.Checkpoint(model=model).save(os.path.join(self.checkpoint_dir, phase, "final", "ckpt"))
+        if phase not in self.state["completed_phases"]:
+            self.state["completed_phases"].append(phase)
+        self._save_state()
+
+    def callback(self, phase):
+        """Keras callback that checkpoints `phase` at the end of every epoch"""
+        return _EpochCheckpoint(self, phase)
+
+
+class _EpochCheckpoint(keras.callbacks.Callback):
+    def __init__(self, checkpointer, phase):
+        super().__init__()
+        self.checkpointer = checkpointer
+        self.phase = phase
+        self.manager = None
+
+    def on_train_begin(self, logs=None):
+        self.manager = self.checkpointer._manager(self.model, self.phase)
+
+    def on_epoch_end(self, epoch, logs=None):
+        self.manager.save(checkpoint_number=epoch + 1)
+        self.checkpointer.state["completed_epochs"][self.phase] = epoch + 1
+        self.checkpointer._save_state()
@@ -0,0 +1,104 @@
+# MLflow/data_pipeline.py
+import time
+
+import tensorflow as tf
+from tensorflow import keras
+from tensorflow.keras import layers
+
+IMAGE_SIZE = (224, 224)
+
+
+def build_augmentation():
+    """
+    Augmentation layers applied to whole batches (already resized and rescaled)
+    """
+    return keras.Sequential([
+        layers.RandomFlip("horizontal_and_vertical"),
+        layers.RandomBrightness(0.1, value_range=(0.0, 1.0)),
+        layers.RandomContrast(0.1),
+        layers.RandomRotation(0.1),
+        layers.RandomZoom(0.1),
+    ])
+
+
+def resize_batch(images, labels, image_size=IMAGE_SIZE):
+    """
+    Resize a uint8 batch to the model size and rescale to [0, 1]
+    """
+    images = tf.image.resize(images, image_size)
+    return tf.cast(images, tf.float32) / 255.0, labels
+
+
+def _cache(dataset, cache, name):
+    """
+    cache=None disables caching, "memory" caches in RAM, any other value is
+    used as a directory for tf.data file caches
+    """
+    if cache is None:
+        return dataset
+    if cache == "memory":
+        return dataset.cache()
+    tf.io.gfile.makedirs(cache)
+    return dataset.cache(f"{cache.rstrip('/')}/{name}")
+
+
+def build_datasets(train_data, val_data, test_data, batch_size=32, image_size=IMAGE_SIZE,
+                   cache="memory", shuffle_buffer=1000):
+    """
+    Build train/val/test pipelines from the raw uint8 CIFAR-10 splits.
+
+    The decoded 32x32 images are cached once, so later epochs skip tfds
+    decoding. Resizing to the model size and augmentation run on whole batches
+    after .batch(), which vectorizes them instead of calling them per example.
+    """
+    augmentation = build_augmentation()
+
+    def preprocess_batch(images, labels):
+        return resize_batch(images, labels, image_size)
+
+    def augment_batch(images, labels):
+        images, labels = resize_batch(images, labels, image_size)
+        return augmentation(images, training=True), labels
+
+    train = (
+        _cache(train_data, cache, "train")
+        .shuffle(shuffle_buffer)
+        .batch(batch_size)
+        .map(augment_batch, num_parallel_calls=tf.data.AUTOTUNE)
+        .prefetch(tf.data.AUTOTUNE)
+    )
+    val = (
+        _cache(val_data, cache, "val")
+        .batch(batch_size)
+        .map(preprocess_batch, num_parallel_calls=tf.data.AUTOTUNE)
+        .prefetch(tf.data.AUTOTUNE)
+    )
+    test = (
+        _cache(test_data, cache, "test")
+        .batch(batch_size)
+        .map(preprocess_batch, num_parallel_calls=tf.data.AUTOTUNE)
+        .prefetch(tf.data.AUTOTUNE)
+    )
+    return train, val, test
+
+
+def measure_input_throughput(dataset, steps=50, warmup_steps=5):
+    """
+    Iterate a pipeline without a model attached and return images/second,
+    excluding warm-up steps (autotuning, shuffle buffer).
+
+    Pass an uncached pipeline (build_datasets(..., cache=None)), not the one
+    training will use: stopping partway through a .cache() discards the
+    partial in-memory cache, and can leave a partial or locked file cache
+    behind for the first real epoch.
+    """
+    images_seen = 0
+    start = None
+    for step, (images, _) in enumerate(dataset.take(steps + warmup_steps)):
+        if step == warmup_steps:
+            start = time.perf_counter()
+        elif step > warmup_steps:
+            images_seen += int(images.shape[0])
+    if start is None or images_seen == 0:
+        return 0.0
+    return images_seen / (time.perf_counter() - start)
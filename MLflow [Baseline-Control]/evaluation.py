@@ -0,0 +1,114 @@
+# MLflow/evaluation.py
+import matplotlib.pyplot as plt
+import numpy as np
+import seaborn as sns
+import tensorflow as tf
+
+
+def evaluate_classifier(model, dataset, num_classes, num_samples=8):
+    """
+    Evaluate a softmax classifier with a single forward pass over `dataset`.
+
+    Probabilities and labels are written into preallocated arrays (sized from
+    the dataset cardinality, grown if it is unknown). Loss, accuracy,
+    precision/recall/F1, the confusion matrix and the sample grid are all
+    derived from those arrays, so nothing is run through the model twice.
+    """
+    forward = tf.function(lambda images: model(images, training=False))
+
+    n_batches = int(dataset.cardinality())
+    capacity = None
+    probs = labels = None
+    filled = 0
+    sample_images = sample_labels = None
+
+    for images, batch_labels in dataset:
+        batch_probs = forward(images).numpy()
+        batch_labels = batch_labels.numpy()
+        batch_size = batch_probs.shape[0]
+
+        if probs is None:
+            capacity = n_batches * batch_size if n_batches > 0 else 1024
+            probs = np.empty((capacity, num_classes), dtype=np.float32)
+            labels = np.empty((capacity,), dtype=np.int64)
+            sample_images = images[:num_samples].numpy()
+            sample_labels = batch_labels[:num_samples]
+        elif filled + batch_size > capacity:
+            capacity = max(capacity * 2, filled + batch_size)
+            probs = np.resize(probs, (capacity, num_classes))
+            labels = np.resize(labels, (capacity,))
+
+        probs[filled:filled + batch_size] = batch_probs
+        labels[filled:filled + batch_size] = batch_labels
+        filled += batch_size
+
+    probs = probs[:filled]
+    y_true = labels[:filled]
+    y_pred = np.argmax(probs, axis=1)
+
+    true_probs = np.clip(probs[np.arange(filled), y_true], 1e-7, 1.0)
+    cm = np.bincount(y_true * num_classes + y_pred, minlength=num_classes * num_classes)
+    cm = cm.reshape(num_classes, num_classes)
+
+    tp = np.diag(cm).astype(np.float64)
+    predicted = cm.sum(axis=0)
+    actual = cm.sum(axis=1)
+    precision = np.divide(tp, predicted, out=np.zeros_like(tp), where=predicted > 0)
+    recall = np.divide(tp, actual, out=np.zeros_like(tp), where=actual > 0)
+    f1 = np.divide(2 * precision * recall, precision + recall,
+                   out=np.zeros_like(tp), where=(precision + recall) > 0)
+
+    return {
+        "loss": float(-np.log(true_probs).mean()),
+        "accuracy": float((y_true == y_pred).mean()),
+        "precision_macro": float(precision.mean()),
+        "recall_macro": float(recall.mean()),
+        "f1_score_macro": float(f1.mean()),
+        "confusion_matrix": cm,
+        "y_true": y_true,
+        "y_pred": y_pred,
+        "probabilities": probs,
+        "sample_images": sample_images,
+        "sample_labels": sample_labels,
+        "sample_preds": y_pred[:len(sample_labels)],
+    }
+
+
+def plot_confusion_matrix(cm, classes, title='Confusion Matrix', save_path=None):
+    """
+    Plot a confusion matrix; saves to `save_path` if given, otherwise shows it
+    """
+    plt.figure(figsize=(8, 6))
+    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', xticklabels=classes, yticklabels=classes)
+    plt.xlabel('Predicted')
+    plt.ylabel('True')
+    plt.title(title)
+    plt.tight_layout()
+    _finish_plot(save_path)
+
+
+def plot_sample_predictions(results, classes, save_path=None):
+    """
+    Plot the sample grid captured during evaluate_classifier
+    """
+    images = results["sample_images"]
+    plt.figure(figsize=(12, 6))
+    for i in range(len(images)):
+        plt.subplot(2, 4, i + 1)
+        img = np.clip(images[i] * 255.0, 0, 255).astype("uint8")
+        plt.imshow(img)
+        true_cls = classes[results["sample_labels"][i]]
+        pred_cls = classes[results["sample_preds"][i]]
+        color = 'green' if true_cls == pred_cls else 'red'
+        plt.title(f"True: {true_cls}\nPred: {pred_cls}", color=color, fontsize=8)
+        plt.axis("off")
+    plt.tight_layout()
+    _finish_plot(save_path)
+
+
+def _finish_plot(save_path):
+    if save_path:
+        plt.savefig(save_path)
+        plt.close()
+    else:
+        plt.show()
@@ -0,0 +1,365 @@
+# MLflow/experiment_logging.py
+import atexit
+import json
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+
+import matplotlib.pyplot as plt
+import mlflow
+from mlflow.entities import Metric, Param, RunTag
+from mlflow.exceptions import MlflowException
+from mlflow.tracking import MlflowClient
+from tensorflow import keras
+
+from artifact_store import hash_file
+
+# MLflow's per-request limits for log_batch
+MAX_METRICS_PER_BATCH = 1000
+MAX_PARAMS_PER_BATCH = 100
+MAX_TAGS_PER_BATCH = 100
+
+
+def is_retryable(error):
+    """
+    True for failures worth retrying on a later flush: connection errors and
+    server-side failures (5xx, rate limiting). False when the tracking server
+    rejected the request itself (e.g. a conflicting param or a deleted run),
+    which fails the same way every time.
+    """
+    if isinstance(error, MlflowException):
+        status = error.get_http_status_code()
+        return status >= 500 or status == 429
+    return True
+
+
+class AsyncMlflowLogger:
+    """
+    Queue MLflow params, metrics, tags and artifacts and send them from a
+    background thread with log_batch, so training never waits on the tracking
+    server.
+
+    Calls capture the active run id when they are made, so nested runs work
+    exactly like direct mlflow.* calls. If a flush fails (e.g. the Azure
+    tracking server hiccups), what wasn't sent yet is appended to a local
+    spool and retried on later flushes: batches go out in log_batch-sized
+    chunks and every chunk the server accepted is dropped first, so a retry
+    doesn't log the same metric values again. Batches the server rejects
+    outright (see is_retryable) are reported and dropped instead of being
+    retried forever. close() (registered with atexit) drains the queue and
+    the spool. Works with any tracking URI, including sqlite:///mlflow.db.
+
+    Artifacts are hashed before upload. Content this process already uploaded
+    is not sent again: the same file at the same path of a run is skipped,
+    and in another run it is replaced by a small <name>.ref.json pointing at
+    the run and path that hold it. Within one run every path gets the real
+    file, so a model directory logged there (e.g. for the registry) is
+    always complete.
+    """
+
+    def __init__(self, flush_interval=5.0, max_queue_items=1000, spool_dir="mlflow_spool"):
+        self.flush_interval = flush_interval
+        self.max_queue_items = max_queue_items
+        self.spool_dir = spool_dir
+        self.spool_path = os.path.join(spool_dir, "pending.jsonl")
+        self.artifact_dir = os.path.join(spool_dir, "artifacts")
+        os.makedirs(self.artifact_dir, exist_ok=True)
+
+        self._queue = queue.Queue()
+        self._flush_requested = threading.Event()
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        # sha256 -> (run_id, artifact path) of every artifact uploaded so far
+        self._uploaded = {}
+        self._thread = threading.Thread(target=self._worker, name="mlflow-logger", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # Public API (mirrors mlflow.*)
+
+    def log_param(self, key, value):
+        self.log_params({key: value})
+
+    def log_params(self, params):
+        self._put("params", [(k, str(v)) for k, v in params.items()])
+
+    def log_metric(self, key, value, step=None):
+        self.log_metrics({key: value}, step=step)
+
+    def log_metrics(self, metrics, step=None):
+        timestamp = int(time.time() * 1000)
+        self._put("metrics", [(k, float(v), timestamp, step or 0) for k, v in metrics.items()])
+
+    def set_tag(self, key, value):
+        self._put("tags", [(key, str(value))])
+
+    def log_artifact(self, local_path, artifact_path=None):
+        """
+        Snapshot the file now (it may be overwritten before the upload runs)
+        and upload it in the background
+        """
+        snapshot_dir = tempfile.mkdtemp(dir=self.artifact_dir)
+        snapshot = os.path.join(snapshot_dir, os.path.basename(local_path))
+        shutil.copy2(local_path, snapshot)
+        self._put("artifacts", [(snapshot, artifact_path)])
+
+    def log_artifacts(self, local_dir, artifact_path=None):
+        for name in sorted(os.listdir(local_dir)):
+            path = os.path.join(local_dir, name)
+            if os.path.isfile(path):
+                self.log_artifact(path, artifact_path)
+
+    def flush(self):
+        """
+        Block until everything queued so far has been sent (or spooled). Once
+        closed there is no worker, so this sends from the calling thread.
+        """
+        if self._stopped.is_set():
+            self._drain()
+            return
+        self._flush_requested.set()
+        self._queue.join()
+
+    def close(self):
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._flush_requested.set()
+        self._thread.join()
+        # Anything enqueued concurrently with shutdown, then the spool
+        self._drain()
+        self._replay_spool()
+
+    # Internals
+
+    def _put(self, kind, items):
+        run = mlflow.active_run()
+        if run is None:
+            raise RuntimeError("No active MLflow run to log to")
+        self._queue.put((run.info.run_id, kind, items))
+        if self._queue.qsize() >= self.max_queue_items:
+            self._flush_requested.set()
+
+    def _worker(self):
+        while not self._stopped.is_set():
+            self._flush_requested.wait(self.flush_interval)
+            self._flush_requested.clear()
+            self._drain()
+            self._replay_spool()
+
+    def _drain(self):
+        entries = []
+        while True:
+            try:
+                entries.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if not entries:
+            return
+
+        batches = {}
+        for run_id, kind, items in entries:
+            batch = batches.setdefault(run_id, {"metrics": [], "params": [], "tags": [], "artifacts": []})
+            batch[kind].extend(items)
+
+        for run_id, batch in batches.items():
+            try:
+                self._send(run_id, batch)
+            except Exception as e:
+                self._failed(run_id, batch, e)
+
+        for _ in entries:
+            self._queue.task_done()
+
+    def _send(self, run_id, batch):
+        """
+        Send a batch, removing what was sent from it as it goes. If this
+        raises, `batch` holds only the items still to be sent.
+        """
+        client = MlflowClient()
+        chunking = (
+            ("metrics", MAX_METRICS_PER_BATCH, Metric),
+            ("params", MAX_PARAMS_PER_BATCH, Param),
+            ("tags", MAX_TAGS_PER_BATCH, RunTag),
+        )
+        for kind, max_items, entity in chunking:
+            while batch[kind]:
+                chunk = batch[kind][:max_items]
+                client.log_batch(run_id, **{kind: [entity(*item) for item in chunk]})
+                batch[kind] = batch[kind][max_items:]
+
+        while batch["artifacts"]:
+            local_path, artifact_path = batch["artifacts"][0]
+            self._upload_artifact(client, run_id, local_path, artifact_path)
+            batch["artifacts"] = batch["artifacts"][1:]
+            shutil.rmtree(os.path.dirname(local_path), ignore_errors=True)
+
+    def _upload_artifact(self, client, run_id, local_path, artifact_path):
+        digest = hash_file(local_path)
+        name = os.path.basename(local_path)
+        key = f"{artifact_path}/{name}" if artifact_path else name
+        previous = self._uploaded.get(digest)
+
+        if previous == (run_id, key):
+            return
+        if previous is not None and previous[0] != run_id:
+            ref_path = os.path.join(os.path.dirname(local_path), f"{name}.ref.json")
+            with open(ref_path, "w") as f:
+                json.dump({"sha256": digest, "run_id": previous[0], "artifact_path": previous[1]}, f, indent=2)
+            client.log_artifact(run_id, ref_path, artifact_path)
+            return
+
+        client.log_artifact(run_id, local_path, artifact_path)
+        if previous is None:
+            self._uploaded[digest] = (run_id, key)
+
+    def _failed(self, run_id, batch, error):
+        """Spool what's left of a batch whose send failed, or drop it if retrying can't help"""
+        if is_retryable(error):
+            print(f"⚠️ MLflow logging failed, spooling locally: {error}")
+            self._spool(run_id, batch)
+            return
+        print(f"⚠️ MLflow rejected logging for run {run_id}, dropping "
+              f"{len(batch['metrics'])} metrics, {len(batch['params'])} params, {len(batch['tags'])} tags "
+              f"and {len(batch['artifacts'])} artifacts: {error}")
+        for local_path, _ in batch["artifacts"]:
+            shutil.rmtree(os.path.dirname(local_path), ignore_errors=True)
+
+    def _spool(self, run_id, batch):
+        with self._lock:
+            with open(self.spool_path, "a") as f:
+                f.write(json.dumps({"run_id": run_id, **batch}) + "\n")
+
+    def _replay_spool(self):
+        with self._lock:
+            if not os.path.exists(self.spool_path):
+                return
+            with open(self.spool_path) as f:
+                pending = [json.loads(line) for line in f if line.strip()]
+            os.remove(self.spool_path)
+
+        for record in pending:
+            run_id = record.pop("run_id")
+            try:
+                self._send(run_id, record)
+            except Exception as e:
+                self._failed(run_id, record, e)
+
+
+_default_logger = None
+
+
+def get_async_logger():
+    """Process-wide AsyncMlflowLogger, created on first use"""
+    global _default_logger
+    if _default_logger is None:
+        _default_logger = AsyncMlflowLogger()
+    return _default_logger
+
+
+def log_training_metrics(metrics, step=None):
+    """
+    Log a dict of metrics to the active run through the async logger
+    """
+    get_async_logger().log_metrics(metrics, step=step)
+
+
+class MlflowMetricsCallback(keras.callbacks.Callback):
+    """
+    Stream training metrics to MLflow while model.fit runs.
+
+    Every `log_every_n_steps` batches it logs the running loss/metrics, the
+    average step time and samples/sec over that window (measured on wall
+    time, so input-pipeline stalls show up as dips), keyed by the global step.
+    At the end of every epoch it logs the epoch metrics (including val_* and
+    the learning rate) keyed by the epoch. Everything goes through the async
+    logger, so logging never blocks a training step.
+    """
+
+    def __init__(self, log_every_n_steps=50, batch_size=None, prefix=""):
+        super().__init__()
+        self.log_every_n_steps = log_every_n_steps
+        self.batch_size = batch_size
+        self.prefix = prefix
+        self.tracker = get_async_logger()
+        self._global_step = 0
+
+    def _name(self, key):
+        return f"{self.prefix}{key}"
+
+    def on_epoch_begin(self, epoch, logs=None):
+        steps_per_epoch = self.params.get("steps")
+        if steps_per_epoch:
+            # Keeps step numbers consistent when fit resumes at initial_epoch
+            self._global_step = epoch * steps_per_epoch
+        self._epoch_start = self._window_start = time.perf_counter()
+        self._epoch_steps = self._window_steps = 0
+
+    def on_train_batch_end(self, batch, logs=None):
+        self._global_step += 1
+        self._epoch_steps += 1
+        self._window_steps += 1
+        if not self.log_every_n_steps or self._window_steps < self.log_every_n_steps:
+            return
+
+        now = time.perf_counter()
+        elapsed = now - self._window_start
+        metrics = {self._name(f"step_{k}"): v for k, v in (logs or {}).items()}
+        metrics[self._name("step_time_ms")] = 1000.0 * elapsed / self._window_steps
+        if self.batch_size:
+            metrics[self._name("samples_per_sec")] = self._window_steps * self.batch_size / elapsed
+        self.tracker.log_metrics(metrics, step=self._global_step)
+        self._window_start, self._window_steps = now, 0
+
+    def on_epoch_end(self, epoch, logs=None):
+        elapsed = time.perf_counter() - self._epoch_start
+        metrics = {self._name(f"epoch_{k}"): v for k, v in (logs or {}).items()}
+        metrics[self._name("epoch_time_sec")] = elapsed
+        if self.batch_size and self._epoch_steps:
+            metrics[self._name("epoch_samples_per_sec")] = self._epoch_steps * self.batch_size / elapsed
+        self.tracker.log_metrics(metrics, step=epoch)
+
+
+def log_classification_artifacts(history, classes, artifact_dir):
+    """
+    Save the training-history plot and class names under `artifact_dir` and
+    log them to the active run through the async logger
+    """
+    os.makedirs(artifact_dir, exist_ok=True)
+
+    fig, axes = plt.subplots(1, 3, figsize=(15, 5))
+    axes[0].plot(history.history.get('accuracy', []), label='Training Accuracy')
+    axes[0].plot(history.history.get('val_accuracy', []), label='Validation Accuracy')
+    axes[0].set_title('Model Accuracy')
+    axes[0].set_xlabel('Epoch')
+    axes[0].set_ylabel('Accuracy')
+    axes[0].legend()
+
+    axes[1].plot(history.history.get('loss', []), label='Training Loss')
+    axes[1].plot(history.history.get('val_loss', []), label='Validation Loss')
+    axes[1].set_title('Model Loss')
+    axes[1].set_xlabel('Epoch')
+    axes[1].set_ylabel('Loss')
+    axes[1].legend()
+
+    lr = history.history.get('learning_rate') or history.history.get('lr')
+    if lr:
+        axes[2].plot(lr, label='Learning Rate')
+        axes[2].set_title('Learning Rate')
+        axes[2].set_xlabel('Epoch')
+        axes[2].set_yscale('log')
+        axes[2].legend()
+
+    plt.tight_layout()
+    plt.savefig(os.path.join(artifact_dir, 'training_history.png'))
+    plt.close(fig)
+
+    with open(os.path.join(artifact_dir, 'class_names.txt'), 'w') as f:
+        f.write("CIFAR-10 Class Names:\n")
+        for i, name in enumerate(classes):
+            f.write(f"{i}: {name}\n")
+
+    get_async_logger().log_artifacts(artifact_dir, artifact_dir)
@@ -0,0 +1,58 @@
+# MLflow/export_tflite.py
+import argparse
+import os
+
+import tensorflow as tf
+import tensorflow_datasets as tfds
+from tensorflow import keras
+
+
+def representative_dataset(num_samples=500, image_size=224):
+    """
+    Calibration generator for full-integer quantization, drawn from the
+    CIFAR-10 training split with the same resize/rescale used in training
+    """
+    calibration_data = tfds.load("cifar10", split="train[10000:]", as_supervised=True, shuffle_files=True)
+    calibration_data = calibration_data.shuffle(5000).take(num_samples)
+
+    def generator():
+        for image, _ in calibration_data:
+            image = tf.image.resize(image, [image_size, image_size])
+            image = tf.cast(image, tf.float32) / 255.0
+            yield [tf.expand_dims(image, 0)]
+
+    return generator
+
+
+def export_tflite_int8(model, output_path, num_calibration_samples=500):
+    """
+    Convert a Keras model (or path to one) into a full-integer TFLite model.
+    Inputs are uint8 and outputs uint8; scoring code reads the quantization
+    parameters from the interpreter.
+    """
+    if isinstance(model, (str, os.PathLike)):
+        model = keras.models.load_model(model)
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = representative_dataset(num_calibration_samples)
+    converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    converter.inference_input_type = tf.uint8
+    converter.inference_output_type = tf.uint8
+
+    tflite_model = converter.convert()
+    with open(output_path, "wb") as f:
+        f.write(tflite_model)
+
+    print(f"📦 Exported int8 TFLite model to {output_path} ({len(tflite_model) / 1024 / 1024:.2f} MB)")
+    return output_path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a Keras classifier to int8 TFLite")
+    parser.add_argument("model_path", help="Path to the .keras/.h5 model")
+    parser.add_argument("--output", default="cifar10_model_int8.tflite")
+    parser.add_argument("--calibration-samples", type=int, default=500)
+    args = parser.parse_args()
+
+    export_tflite_int8(args.model_path, args.output, args.calibration_samples)
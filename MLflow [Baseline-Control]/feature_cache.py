@@ -0,0 +1,120 @@
+# MLflow/feature_cache.py
+import json
+import os
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+from tensorflow.keras import layers
+
+from data_pipeline import IMAGE_SIZE, build_augmentation, resize_batch
+
+
+def extract_features(base_model, raw_data, cache_path, batch_size=32, views=1,
+                     image_size=IMAGE_SIZE, augment=False):
+    """
+    Run a frozen backbone once over `raw_data` (uint8 images, int labels) and
+    store the globally pooled features in a memory-mapped float32 array.
+
+    With augment=True each of the `views` passes uses a fresh random
+    augmentation; otherwise a single plain pass is made. Returns
+    (features, labels) as read-only memmaps. An existing cache written with
+    the same settings is reused without touching the backbone.
+    """
+    if not augment:
+        views = 1
+    meta_path = f"{cache_path}.json"
+    settings = {"backbone": base_model.name, "views": views, "augment": augment,
+                "image_size": list(image_size)}
+
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta["settings"] == settings:
+            print(f"📂 Reusing cached features from {cache_path}.npy")
+            return _open(cache_path, meta)
+
+    extractor = keras.Sequential([base_model, layers.GlobalAveragePooling2D()])
+    forward = tf.function(lambda images: tf.cast(extractor(images, training=False), tf.float32))
+    feature_dim = int(extractor.output_shape[-1])
+    augmentation = build_augmentation() if augment else None
+
+    def prepare(images, labels):
+        images, labels = resize_batch(images, labels, image_size)
+        if augmentation is not None:
+            images = augmentation(images, training=True)
+        return images, labels
+
+    batches = raw_data.batch(batch_size).map(prepare, num_parallel_calls=tf.data.AUTOTUNE).prefetch(tf.data.AUTOTUNE)
+    n_batches = int(batches.cardinality())
+    if n_batches < 0:
+        raise ValueError("Feature extraction needs a dataset with known cardinality")
+    capacity = n_batches * batch_size * views
+
+    os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+    features = np.lib.format.open_memmap(f"{cache_path}.npy", mode="w+", dtype=np.float32,
+                                         shape=(capacity, feature_dim))
+    labels = np.lib.format.open_memmap(f"{cache_path}.labels.npy", mode="w+", dtype=np.int64,
+                                       shape=(capacity,))
+
+    count = 0
+    for view in range(views):
+        print(f"🧠 Extracting backbone features ({cache_path}, view {view + 1}/{views})...")
+        for images, batch_labels in batches:
+            batch_features = forward(images).numpy()
+            n = batch_features.shape[0]
+            features[count:count + n] = batch_features
+            labels[count:count + n] = batch_labels.numpy()
+            count += n
+    features.flush()
+    labels.flush()
+    del features, labels
+
+    meta = {"settings": settings, "count": count, "feature_dim": feature_dim}
+    with open(meta_path, "w") as f:
+        json.dump(meta, f, indent=2)
+    return _open(cache_path, meta)
+
+
+def _open(cache_path, meta):
+    count = meta["count"]
+    features = np.load(f"{cache_path}.npy", mmap_mode="r")[:count]
+    labels = np.load(f"{cache_path}.labels.npy", mmap_mode="r")[:count]
+    return features, labels
+
+
+def feature_dataset(features, labels, batch_size=32, shuffle=False):
+    """
+    Stream batches from memory-mapped features. Shuffled epochs draw a new
+    permutation and sort each batch's indices so reads stay page-local.
+    """
+    n = len(labels)
+    feature_dim = features.shape[1]
+
+    def generator():
+        order = np.random.permutation(n) if shuffle else np.arange(n)
+        for start in range(0, n, batch_size):
+            idx = np.sort(order[start:start + batch_size])
+            yield features[idx], labels[idx]
+
+    dataset = tf.data.Dataset.from_generator(
+        generator,
+        output_signature=(
+            tf.TensorSpec(shape=(None, feature_dim), dtype=tf.float32),
+            tf.TensorSpec(shape=(None,), dtype=tf.int64),
+        ),
+    )
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+
+def build_head_model(model, feature_dim):
+    """
+    A model over pooled features that reuses the classifier's own head layers
+    (everything after GlobalAveragePooling2D), so training it updates `model`.
+    """
+    head_layers = model.layers[2:]
+    inputs = keras.Input(shape=(feature_dim,))
+    x = inputs
+    for layer in head_layers:
+        x = layer(x)
+    return keras.Model(inputs, x, name="feature_head")
@@ -0,0 +1,99 @@
+# MLflow/local_registry.py
+import os
+
+from artifact_store import ContentStore, digest_entries
+from model_registry import ModelRegistry
+from registry_manifest import RegistryManifest
+
+DEFAULT_REGISTRY_DIR = os.getenv("LOCAL_MODEL_REGISTRY", "model_registry")
+
+
+class RegisteredModel:
+    """
+    A locally registered model version, with the attributes the registry code
+    uses from azureml.core.Model (id, name, version, tags)
+    """
+
+    def __init__(self, record, root):
+        self.name = record["name"]
+        self.version = record["version"]
+        self.id = f"{self.name}:{self.version}"
+        self.tags = record["tags"]
+        self.metrics = record["metrics"]
+        self.description = record["description"]
+        self.created = record["created"]
+        self.path = os.path.join(root, record["path"])
+        self.files = record.get("files", [])
+
+    def __repr__(self):
+        return f"RegisteredModel({self.id})"
+
+
+class LocalModelRegistry(ModelRegistry):
+    """
+    ModelRegistry backed by a local directory instead of Azure ML, for offline
+    promotion tests and the local scoring servers.
+
+    File contents are stored once in a content-addressed blob store
+    (<root>/blobs, see artifact_store.py); each version lists its files by
+    digest and is checked out under <root>/<model name>/<version>/ as hard
+    links. Versions are indexed by manifest.json (see registry_manifest.py).
+    register_classification_model, register_detection_model (including the
+    latency gate) and list_model_versions work as with the Azure ML backend.
+    """
+
+    def __init__(self, root=DEFAULT_REGISTRY_DIR, max_latency_regression=0.10):
+        super().__init__(workspace=None, max_latency_regression=max_latency_regression)
+        self.root = root
+        self.manifest = RegistryManifest(root)
+        self.store = ContentStore(root)
+
+    def _register_version(self, model_path, model_name, tags, metrics, description):
+        # Held until the version is recorded, so concurrent registrations
+        # (other processes included) get distinct version numbers
+        with self.manifest.locked():
+            return self._register_locked(model_path, model_name, tags, metrics, description)
+
+    def _register_locked(self, model_path, model_name, tags, metrics, description):
+        version = self.manifest.next_version(model_name)
+        version_dir = os.path.join(model_name, str(version))
+
+        # Only blobs not already in the store are written
+        entries, bytes_stored = self.store.put_tree(model_path)
+        if os.path.isdir(model_path):
+            # Keep the directory name, as a copy of the directory would
+            prefix = os.path.basename(os.path.normpath(model_path))
+            entries = [{**entry, "path": os.path.join(prefix, entry["path"])} for entry in entries]
+        self.store.checkout(entries, os.path.join(self.root, version_dir))
+
+        total_bytes = sum(entry["size"] for entry in entries)
+        print(f"Stored {bytes_stored / 1024 / 1024:.1f} MB of {total_bytes / 1024 / 1024:.1f} MB "
+              f"for {model_name} v{version} (the rest was already in the registry)")
+
+        tags = {**tags, "artifact_sha256": digest_entries(entries)}
+        record = self.manifest.add_version(model_name, version, version_dir, tags, metrics, description,
+                                           files=entries)
+        return RegisteredModel(record, self.root)
+
+    def _previous_version_tags(self, model_name):
+        record = self.manifest.get_version(model_name, "latest")
+        return record["tags"] if record else {}
+
+    def get_model(self, model_name, version="latest"):
+        """RegisteredModel for a version number or "latest", or None"""
+        record = self.manifest.get_version(model_name, version)
+        return RegisteredModel(record, self.root) if record else None
+
+    def find_models(self, model_name, key, value):
+        """Versions of `model_name` tagged key=value"""
+        return [RegisteredModel(record, self.root) for record in self.manifest.find_by_tag(model_name, key, value)]
+
+    def list_model_versions(self, model_name):
+        """
+        List all versions of a registered model
+        """
+        models = [RegisteredModel(record, self.root) for record in self.manifest.list_versions(model_name)]
+        print(f"Versions of {model_name}:")
+        for model in models:
+            print(f"  - Version {model.version}: {model.id}")
+        return models
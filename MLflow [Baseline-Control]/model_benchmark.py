@@ -0,0 +1,135 @@
+# MLflow/model_benchmark.py
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+BATCH_SIZES = (1, 8)
+TASK_INPUT_SHAPES = {
+    "classification": (224, 224, 3),
+    "detection": (640, 640, 3),
+}
+# Latency keys compared against the previous registered version
+REGRESSION_KEYS = tuple(f"benchmark_p50_ms_b{bs}" for bs in BATCH_SIZES)
+
+
+def artifact_size_mb(path):
+    """Size of a model file, or of every file under a model directory"""
+    if os.path.isfile(path):
+        return os.path.getsize(path) / 1024 / 1024
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total / 1024 / 1024
+
+
+def _load_predict_fn(model_path, task):
+    """
+    Load the model and return predict(batch) for the given task
+    """
+    if task == "detection":
+        from ultralytics import YOLO
+        model = YOLO(model_path)
+        return lambda batch: model.predict(list(batch), verbose=False, device="cpu")
+
+    if model_path.endswith(".tflite"):
+        import tensorflow as tf
+        interpreter = tf.lite.Interpreter(model_path=model_path)
+        input_details = interpreter.get_input_details()[0]
+        output_index = interpreter.get_output_details()[0]["index"]
+
+        def predict(batch):
+            batch = batch.astype(input_details["dtype"])
+            interpreter.resize_tensor_input(input_details["index"], batch.shape)
+            interpreter.allocate_tensors()
+            interpreter.set_tensor(input_details["index"], batch)
+            interpreter.invoke()
+            return interpreter.get_tensor(output_index)
+        return predict
+
+    from tensorflow import keras
+    model = keras.models.load_model(model_path)
+    return lambda batch: model(batch.astype(np.float32) / 255.0, training=False)
+
+
+def run_benchmark(model_path, task="classification", batch_sizes=BATCH_SIZES, iterations=50, warmup=5):
+    """
+    Benchmark a model in the current process: cold load time, p50/p95 latency
+    per batch size, peak RSS and artifact size. Use benchmark_model() to get
+    a clean measurement in a fresh process.
+    """
+    start = time.perf_counter()
+    predict = _load_predict_fn(model_path, task)
+    results = {"benchmark_cold_load_sec": time.perf_counter() - start}
+
+    rng = np.random.default_rng(0)
+    for batch_size in batch_sizes:
+        batch = rng.integers(0, 256, size=(batch_size, *TASK_INPUT_SHAPES[task]), dtype=np.uint8)
+        for _ in range(warmup):
+            predict(batch)
+
+        latencies = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            predict(batch)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        results[f"benchmark_p50_ms_b{batch_size}"] = float(np.percentile(latencies, 50))
+        results[f"benchmark_p95_ms_b{batch_size}"] = float(np.percentile(latencies, 95))
+
+    # ru_maxrss is in KB on Linux
+    results["benchmark_peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    results["benchmark_artifact_size_mb"] = artifact_size_mb(model_path)
+    return results
+
+
+def benchmark_model(model_path, task="classification", iterations=50, timeout=1800):
+    """
+    Run the standard CPU benchmark in a fresh subprocess so load time and peak
+    RSS are not skewed by whatever the calling process already has loaded.
+    """
+    env = dict(os.environ, CUDA_VISIBLE_DEVICES="")
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), model_path,
+         "--task", task, "--iterations", str(iterations), "--json"],
+        capture_output=True, text=True, env=env, timeout=timeout, check=True
+    ).stdout
+    # The JSON result is the last line; frameworks may print above it
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def latency_regressions(results, previous_tags, max_regression=0.10):
+    """
+    Compare benchmark latencies with the tags of the previous model version.
+    Returns {key: (previous, current)} for every latency that got more than
+    `max_regression` slower.
+    """
+    regressions = {}
+    for key in REGRESSION_KEYS:
+        if key not in results or key not in (previous_tags or {}):
+            continue
+        previous = float(previous_tags[key])
+        if results[key] > previous * (1 + max_regression):
+            regressions[key] = (previous, results[key])
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CPU inference benchmark for a registered model")
+    parser.add_argument("model_path")
+    parser.add_argument("--task", choices=list(TASK_INPUT_SHAPES), default="classification")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--json", action="store_true", help="Print the results as a single JSON line")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.model_path, args.task, iterations=args.iterations)
+    if args.json:
+        print(json.dumps(results))
+    else:
+        for key, value in results.items():
+            print(f"{key}: {value:.2f}")
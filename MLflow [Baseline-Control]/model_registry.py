@@ -1,36 +1,167 @@
 # MLflow/model_registry.py
 import mlflow
-from azureml.core import Model, Workspace
+try:
+    from azureml.core import Model, Workspace
+except ImportError:
+    # Only LocalModelRegistry (local_registry.py) works without the Azure ML SDK
+    Model = Workspace = None
+import contextlib
 import os
 import json
+import shutil
+import tempfile
+
+import numpy as np
+from mlflow.models import ModelSignature
+from mlflow.types import Schema, TensorSpec
+
+from model_benchmark import benchmark_model, latency_regressions
+
+def _run_context(run_id):
+    """
+    Log to `run_id`, reusing it when it is already the active run (the training
+    script registers from inside its parent run)
+    """
+    active = mlflow.active_run()
+    if active is not None and active.info.run_id == run_id:
+        return contextlib.nullcontext(active)
+    return mlflow.start_run(run_id=run_id)
+
+def classification_signature(input_shape=(224, 224, 3), num_classes=10):
+    """
+    MLflow signature of the classifier, built from the known shapes instead of
+    running the model
+    """
+    return ModelSignature(
+        inputs=Schema([TensorSpec(np.dtype(np.float32), (-1, *input_shape), "images")]),
+        outputs=Schema([TensorSpec(np.dtype(np.float32), (-1, num_classes), "probabilities")])
+    )
+
+def stage_model_dir(model_path, extra_files, parent_dir):
+    """
+    Folder under parent_dir holding the model file and `extra_files` side by
+    side (e.g. preprocessing.json), so they are registered as one version
+    """
+    stage_dir = os.path.join(parent_dir, os.path.splitext(os.path.basename(model_path))[0])
+    os.makedirs(stage_dir)
+    for path in [model_path, *extra_files]:
+        shutil.copy2(path, stage_dir)
+    return stage_dir
 
 class ModelRegistry:
-    def __init__(self, workspace):
+    def __init__(self, workspace, max_latency_regression=0.10):
         self.ws = workspace
         self.registered_models = {}
+        # Refuse a new version whose p50 latency is this much worse than the previous one
+        self.max_latency_regression = max_latency_regression
+    
+    def _previous_version_tags(self, model_name):
+        try:
+            models = Model.list(self.ws, name=model_name, latest=True)
+            return models[0].tags if models else {}
+        except Exception as e:
+            print(f"Could not read previous version of {model_name}: {e}")
+            return {}
+    
+    def _register_version(self, model_path, model_name, tags, metrics, description):
+        """
+        Store `model_path` as a new version of `model_name`. Returns an object
+        with .id, .version and .tags (an Azure ML Model here).
+        """
+        return Model.register(
+            workspace=self.ws,
+            model_path=model_path,
+            model_name=model_name,
+            tags=tags,
+            description=description,
+            model_framework=Model.Framework.KERAS if tags.get("framework") == "keras" else None
+        )
     
-    def register_classification_model(self, model_path, run_id, metrics, description=""):
+    def benchmark_for_registration(self, model_path, model_name, task, run_id, allow_latency_regression=False):
         """
-        Register a new classification model version
+        Run the standard CPU benchmark (cold load, p50/p95 at batch 1 and 8,
+        peak RSS, artifact size), log it to the MLflow run and compare it with
+        the previous registered version. Returns (benchmark tags, approved).
+        A model whose benchmark fails is refused like a latency regression:
+        it may not load at all, and it would leave later versions without a
+        baseline. allow_latency_regression registers it anyway.
         """
         try:
-            # Register with Azure ML
-            model = Model.register(
-                workspace=self.ws,
-                model_path=model_path,
-                model_name="image-classification-model",
-                tags={
-                    "accuracy": f"{metrics.get('accuracy', 0):.4f}",
-                    "framework": "keras",
-                    "task": "classification"
-                },
-                description=description,
-                model_framework=Model.Framework.KERAS
+            results = benchmark_model(model_path, task=task)
+        except Exception as e:
+            with _run_context(run_id):
+                mlflow.set_tag("registration_status",
+                               "approved_without_benchmark" if allow_latency_regression else "rejected_benchmark_failed")
+            if allow_latency_regression:
+                print(f"⚠️ Benchmark failed, registering without latency data as requested: {e}")
+                return {"benchmark": "failed"}, True
+            print(f"Refusing to register {model_name}: benchmark failed: {e}")
+            return {"benchmark": "failed"}, False
+        
+        regressions = latency_regressions(results, self._previous_version_tags(model_name),
+                                          self.max_latency_regression)
+        approved = not regressions or allow_latency_regression
+        
+        with _run_context(run_id):
+            mlflow.log_metrics(results)
+            if regressions:
+                mlflow.set_tag("latency_regression", json.dumps(regressions))
+            mlflow.set_tag("registration_status", "approved" if approved else "rejected_latency_regression")
+        
+        for key, (previous, current) in regressions.items():
+            print(f"⚠️ {key}: {previous:.2f} ms -> {current:.2f} ms")
+        if not approved:
+            print(f"Refusing to register {model_name}: latency regressed more than "
+                  f"{self.max_latency_regression:.0%} versus the previous version")
+        
+        return {key: f"{value:.2f}" for key, value in results.items()}, approved
+    
+    def register_classification_model(self, model_path, run_id, metrics, description="",
+                                       allow_latency_regression=False, keras_model=None,
+                                       input_shape=(224, 224, 3), num_classes=10, extra_files=()):
+        """
+        Register a new classification model version.
+
+        The model is logged to the run as an MLflow Keras model under
+        classification_model/, with a signature built from the known shapes,
+        and the registered version records its URI in the "mlflow_model_uri"
+        tag. Pass the in-memory `keras_model` to skip reloading `model_path`
+        for that. `extra_files` (e.g. the preprocessing.json the scoring
+        script reads) are registered in one folder with the model file.
+        """
+        try:
+            benchmark_tags, approved = self.benchmark_for_registration(
+                model_path, "image-classification-model", "classification", run_id, allow_latency_regression
             )
+            if not approved:
+                return None
+            
+            # Log the MLflow model first so the registered version can point at it
+            if keras_model is None:
+                from tensorflow import keras
+                keras_model = keras.models.load_model(model_path)
+            signature = classification_signature(input_shape, num_classes)
+            with _run_context(run_id):
+                mlflow.keras.log_model(keras_model, "classification_model", signature=signature)
+            
+            # Register with Azure ML (or the local registry)
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                registered_path = stage_model_dir(model_path, extra_files, tmp_dir) if extra_files else model_path
+                model = self._register_version(
+                    registered_path,
+                    "image-classification-model",
+                    tags={
+                        "accuracy": f"{metrics.get('accuracy', 0):.4f}",
+                        "framework": "keras",
+                        "task": "classification",
+                        "mlflow_model_uri": f"runs:/{run_id}/classification_model",
+                        **benchmark_tags
+                    },
+                    metrics=metrics,
+                    description=description
+                )
             
-            # Also log with MLflow
-            with mlflow.start_run(run_id=run_id):
-                mlflow.keras.log_model(mlflow.keras.load_model(model_path), "classification_model")
+            with _run_context(run_id):
                 mlflow.set_tag("registered_model_id", model.id)
             
             self.registered_models["classification"] = model
@@ -41,26 +172,34 @@ class ModelRegistry:
             print(f"Failed to register classification model: {e}")
             return None
     
-    def register_detection_model(self, model_path, run_id, metrics, description=""):
+    def register_detection_model(self, model_path, run_id, metrics, description="",
+                                 allow_latency_regression=False):
         """
         Register a new object detection model version using custom MLflow logging
         """
         try:
-            # Register with Azure ML
-            model = Model.register(
-                workspace=self.ws,
-                model_path=model_path,
-                model_name="object-detection-model", 
+            benchmark_tags, approved = self.benchmark_for_registration(
+                model_path, "object-detection-model", "detection", run_id, allow_latency_regression
+            )
+            if not approved:
+                return None
+            
+            # Register with Azure ML (or the local registry)
+            model = self._register_version(
+                model_path,
+                "object-detection-model",
                 tags={
                     "mAP50": f"{metrics.get('mAP50', 0):.4f}",
                     "framework": "ultralytics",
-                    "task": "object_detection"
+                    "task": "object_detection",
+                    **benchmark_tags
                 },
+                metrics=metrics,
                 description=description
             )
             
             # Log to MLflow as a generic model with custom metadata
-            with mlflow.start_run(run_id=run_id):
+            with _run_context(run_id):
                 # Log the model file as an artifact
                 mlflow.log_artifact(model_path, "model")
                 
@@ -0,0 +1,173 @@
+# MLflow/registry_manifest.py
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = "manifest.lock"
+LOCK_TIMEOUT_SEC = 60.0
+
+
+class RegistryManifest:
+    """
+    Index of a local model registry directory.
+
+    manifest.json keeps, per model name, the latest version number, every
+    version's record (path, tags, metrics, description) and a "key=value" tag
+    index, so latest/by-version/by-tag lookups are dict lookups instead of a
+    directory scan. Writes go to a temp file and are swapped in atomically.
+    It only needs the standard library so scoring scripts can use it too.
+
+    Updates are read-modify-write, so they run under locked(), which also
+    excludes other processes registering into the same directory: an flock
+    on manifest.lock, or creating that file with O_EXCL where fcntl is
+    unavailable.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.path = os.path.join(root, MANIFEST_FILE)
+        self.lock_path = os.path.join(root, LOCK_FILE)
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self._mtime = None
+        self._data = {"models": {}}
+
+    def _acquire_file_lock(self):
+        os.makedirs(self.root, exist_ok=True)
+        if fcntl is not None:
+            fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            return fd
+        deadline = time.monotonic() + LOCK_TIMEOUT_SEC
+        while True:
+            try:
+                return os.open(self.lock_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+            except FileExistsError:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"Timed out waiting for {self.lock_path} "
+                                       f"(delete it if no registration is running)")
+                time.sleep(0.05)
+
+    def _release_file_lock(self, fd):
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+        else:
+            os.close(fd)
+            os.remove(self.lock_path)
+
+    @contextmanager
+    def locked(self):
+        """
+        Hold the manifest lock (re-entrant within one RegistryManifest), e.g.
+        around next_version() and add_version() so concurrent registrations
+        don't pick the same version
+        """
+        with self._lock:
+            fd = self._acquire_file_lock() if self._lock_depth == 0 else None
+            self._lock_depth += 1
+            try:
+                # Another process may have written within the mtime resolution
+                self._mtime = None
+                yield self
+            finally:
+                self._lock_depth -= 1
+                if fd is not None:
+                    self._release_file_lock(fd)
+
+    def _load(self):
+        """Re-read manifest.json only when it changed on disk"""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return self._data
+        if mtime != self._mtime:
+            with open(self.path) as f:
+                self._data = json.load(f)
+            self._mtime = mtime
+        return self._data
+
+    def _save(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._data, f, indent=2)
+        os.replace(tmp_path, self.path)
+        self._mtime = os.path.getmtime(self.path)
+
+    def _model(self, model_name):
+        return self._load()["models"].get(model_name)
+
+    def next_version(self, model_name):
+        model = self._model(model_name)
+        return (model["latest"] if model else 0) + 1
+
+    def add_version(self, model_name, version, path, tags=None, metrics=None, description="", files=None):
+        """
+        Record a version and make it the latest. `files` lists the version's
+        files by content digest (see artifact_store.ContentStore).
+        """
+        with self.locked():
+            models = self._load()["models"]
+            model = models.setdefault(model_name, {"latest": 0, "versions": {}, "tag_index": {}})
+            record = {
+                "name": model_name,
+                "version": version,
+                "path": path,
+                "tags": {k: str(v) for k, v in (tags or {}).items()},
+                "metrics": metrics or {},
+                "description": description,
+                "files": files or [],
+                "created": datetime.now().isoformat()
+            }
+            if str(version) in model["versions"]:
+                raise ValueError(f"{model_name} v{version} is already registered")
+            model["versions"][str(version)] = record
+            model["latest"] = max(model["latest"], version)
+            for key, value in record["tags"].items():
+                model["tag_index"].setdefault(f"{key}={value}", []).append(version)
+            self._save()
+            return record
+
+    def get_version(self, model_name, version="latest"):
+        """Version record, or None. `version` is a number or "latest"."""
+        model = self._model(model_name)
+        if model is None:
+            return None
+        if version == "latest":
+            version = model["latest"]
+        return model["versions"].get(str(version))
+
+    def find_by_tag(self, model_name, key, value):
+        """Version records tagged key=value, oldest first"""
+        model = self._model(model_name)
+        if model is None:
+            return []
+        versions = model["tag_index"].get(f"{key}={value}", [])
+        return [model["versions"][str(v)] for v in versions]
+
+    def list_versions(self, model_name):
+        model = self._model(model_name)
+        if model is None:
+            return []
+        return sorted(model["versions"].values(), key=lambda record: record["version"])
+
+
+def resolve_model_dir(root, model_name, version="latest"):
+    """
+    Directory holding the files of a locally registered model version
+    (what AZUREML_MODEL_DIR points to for an Azure deployment)
+    """
+    record = RegistryManifest(root).get_version(model_name, version)
+    if record is None:
+        raise RuntimeError(f"No version {version} of {model_name} in local registry {root}")
+    return os.path.join(root, record["path"])
@@ -5,6 +5,8 @@ from azureml.core import Workspace
 import os
 from datetime import datetime
 
+from experiment_logging import get_async_logger
+
 def setup_mlflow_tracking():
     """
     Set up MLflow tracking with Azure ML workspace
@@ -22,14 +24,19 @@ def setup_mlflow_tracking():
         print("Fallback to local MLflow tracking")
         return None
 
-def start_experiment_run(experiment_name, run_name=None):
+def start_experiment_run(experiment_name, run_name=None, run_id=None):
     """
-    Start a new MLflow experiment run
+    Start a new MLflow experiment run, or reopen an existing one when run_id is given
     """
+    mlflow.set_experiment(experiment_name)
+    if run_id is not None:
+        run = mlflow.start_run(run_id=run_id)
+        print(f"Resumed MLflow run: {run_id} in experiment: {experiment_name}")
+        return run
+
     if run_name is None:
         run_name = f"run_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
     
-    mlflow.set_experiment(experiment_name)
     run = mlflow.start_run(run_name=run_name)
     print(f"Started MLflow run: {run_name} in experiment: {experiment_name}")
     return run
@@ -38,7 +45,7 @@ def log_classification_training_params(model_params, training_params):
     """
     Log parameters for classification model training
     """
-    mlflow.log_params({
+    get_async_logger().log_params({
         **model_params,
         **training_params,
         "model_type": "classification",
@@ -49,7 +56,7 @@ def log_detection_training_params(model_params, training_params):
     """
     Log parameters for object detection model training
     """
-    mlflow.log_params({
+    get_async_logger().log_params({
         **model_params,
         **training_params, 
         "model_type": "object_detection",
@@ -3,31 +3,106 @@ import tensorflow as tf
 import tensorflow_datasets as tfds
 from tensorflow import keras
 from tensorflow.keras import layers
-import matplotlib.pyplot as plt
-import seaborn as sns
-import numpy as np
 import os
 import sys
 
 # Add the MLflow directory to the path so we can import our modules
 sys.path.append('../MLflow')
+# Shared preprocessing spec library used by the app and the scoring scripts
+sys.path.append('../DEPI_Project_App')
 
 import mlflow
 from tracking_setup import setup_mlflow_tracking, start_experiment_run
-from experiment_logging import log_training_metrics, log_classification_artifacts
+from experiment_logging import log_training_metrics, log_classification_artifacts, get_async_logger, MlflowMetricsCallback
 from model_registry import ModelRegistry
+from local_registry import LocalModelRegistry
+from export_tflite import export_tflite_int8
+from utils.preprocessing import CIFAR10_CLASSIFIER_SPEC, SPEC_FILENAME
+from data_pipeline import build_datasets, measure_input_throughput
+from evaluation import evaluate_classifier, plot_confusion_matrix, plot_sample_predictions
+from training_profile import apply_training_profile, log_training_profile
+from checkpointing import TrainingCheckpointer
+from feature_cache import extract_features, feature_dataset, build_head_model
 
-def train_classification_with_mlflow():
+FINE_TUNE_LAYERS = 50
+
+def unfreeze_top_layers(base_model, fine_tune=FINE_TUNE_LAYERS):
+    """
+    Make the last `fine_tune` layers of the base trainable (phase 2) and keep
+    the rest frozen
+    """
+    base_model.trainable = True
+    # Freeze all the layers before the `fine_tune` layer
+    for layer in base_model.layers[:-fine_tune]:
+        layer.trainable = False
+
+def build_classifier(weights='imagenet', fine_tune=0):
+    """
+    MobileNetV2 base with a 10-class softmax head. Returns (model, base_model).
+    The base is frozen, or has its last `fine_tune` layers trainable.
+    The output layer stays float32 so it is numerically safe under mixed precision.
+    """
+    base_model = keras.applications.MobileNetV2(
+        input_shape=(224, 224, 3),
+        include_top=False,
+        weights=weights
+    )
+    if fine_tune:
+        unfreeze_top_layers(base_model, fine_tune)
+    else:
+        base_model.trainable = False
+    
+    model = keras.Sequential([
+        base_model,
+        layers.GlobalAveragePooling2D(),
+        layers.Dropout(0.2),
+        layers.Dense(10, activation='softmax', dtype='float32')
+    ])
+    return model, base_model
+
+def train_classification_with_mlflow(pipeline_mode="cached", cache="memory", profile="default",
+                                     checkpoint_dir="checkpoints", resume=False,
+                                     phase1_mode="end_to_end", feature_views=1, feature_cache_dir="feature_cache",
+                                     log_every_n_steps=50):
     """
     Enhanced training script for classification with MLflow tracking using nested runs
+
+    pipeline_mode: "cached" caches decoded images and resizes/augments per batch
+                   (see data_pipeline.py); "legacy" maps per example every epoch.
+    cache: "memory", a directory for tf.data file caches, or None
+    profile: "default" or "cpu" (thread pools, bfloat16, probed batch size;
+             see training_profile.py)
+    checkpoint_dir: where per-epoch, phase-aware checkpoints are written (one
+                    subdirectory per run; see checkpointing.py)
+    resume: continue from the last completed epoch in checkpoint_dir, reusing
+            the same MLflow parent and phase runs
+    phase1_mode: "end_to_end" trains phase 1 on images; "cached_features" runs
+                 the frozen backbone once (feature_views augmented passes when
+                 > 1) and trains the head on memory-mapped pooled features
+    log_every_n_steps: how often step loss, step time and samples/sec are
+                       streamed to MLflow during fit (0 = epoch metrics only)
     """
     print("🚀 Starting Classification Training with MLflow (Nested Runs)...")
     
-    # Setup MLflow
+    # Thread pools must be configured before TensorFlow runs any op. Both
+    # phases share the batch size, so probe the fine-tuning (phase 2) model:
+    # its gradients and activations for the unfrozen layers need the most memory.
+    profile_settings = apply_training_profile(
+        profile, model_fn=lambda: build_classifier(weights=None, fine_tune=FINE_TUNE_LAYERS)[0]
+    )
+    batch_size = profile_settings["batch_size"]
+    
+    # Setup MLflow; params/metrics/artifacts go through the background logger
     ws = setup_mlflow_tracking()
+    tracker = get_async_logger()
+    checkpointer = TrainingCheckpointer(checkpoint_dir, resume=resume)
     
-    # Start main parent run
-    with start_experiment_run("cifar10-classification", "mobileNetV2_complete"):
+    # Start main parent run (reopened when resuming)
+    with start_experiment_run("cifar10-classification", "mobileNetV2_complete",
+                              run_id=checkpointer.run_id("parent")) as parent_run:
+        checkpointer.set_run_id("parent", parent_run.info.run_id)
+        if not checkpointer.resumed:
+            log_training_profile(profile_settings)
         
         # Load and prepare data
         print("📥 Loading CIFAR-10 dataset...")
@@ -36,163 +111,216 @@ def train_classification_with_mlflow():
                                             as_supervised=True, with_info=True, shuffle_files=True)
         
         classes = ["airplane","automobile","bird","cat","deer","dog","frog","horse","ship","truck"]
+        raw_train_data, raw_val_data, raw_test_data = train_data, val_data, test_data
         
-        # Data augmentation and preprocessing
-        data_augmentation = keras.Sequential([
-            layers.Resizing(224, 224),
-            layers.RandomFlip("horizontal_and_vertical"),
-            layers.RandomBrightness(0.1),
-            layers.RandomContrast(0.1),
-            layers.RandomRotation(0.1),
-            layers.RandomZoom(0.1),
-            layers.Rescaling(1.0 / 255.0) 
-        ])
-        
-        def augment(image, label):
-            return data_augmentation(image), label
-        
-        def preprocess(image, label):
-            image = tf.image.resize(image, [224, 224])
-            image = tf.cast(image, tf.float32) / 255.0
-            return image, label
-        
-        train_data = train_data.map(augment, num_parallel_calls=tf.data.AUTOTUNE).shuffle(1000).batch(32).prefetch(tf.data.AUTOTUNE)
-        val_data = val_data.map(preprocess, num_parallel_calls=tf.data.AUTOTUNE).batch(32).prefetch(tf.data.AUTOTUNE)
-        test_data = test_data.map(preprocess, num_parallel_calls=tf.data.AUTOTUNE).batch(32).prefetch(tf.data.AUTOTUNE)
+        if pipeline_mode == "cached":
+            train_data, val_data, test_data = build_datasets(
+                train_data, val_data, test_data, batch_size=batch_size, cache=cache
+            )
+        else:
+            # Data augmentation and preprocessing
+            data_augmentation = keras.Sequential([
+                layers.Resizing(224, 224),
+                layers.RandomFlip("horizontal_and_vertical"),
+                layers.RandomBrightness(0.1),
+                layers.RandomContrast(0.1),
+                layers.RandomRotation(0.1),
+                layers.RandomZoom(0.1),
+                layers.Rescaling(1.0 / 255.0) 
+            ])
+            
+            def augment(image, label):
+                return data_augmentation(image), label
+            
+            def preprocess(image, label):
+                image = tf.image.resize(image, [224, 224])
+                image = tf.cast(image, tf.float32) / 255.0
+                return image, label
+            
+            train_data = train_data.map(augment, num_parallel_calls=tf.data.AUTOTUNE).shuffle(1000).batch(batch_size).prefetch(tf.data.AUTOTUNE)
+            val_data = val_data.map(preprocess, num_parallel_calls=tf.data.AUTOTUNE).batch(batch_size).prefetch(tf.data.AUTOTUNE)
+            test_data = test_data.map(preprocess, num_parallel_calls=tf.data.AUTOTUNE).batch(batch_size).prefetch(tf.data.AUTOTUNE)
 
         # Log global training parameters in parent run
         training_params = {
-            "batch_size": 32,
+            "batch_size": batch_size,
             "base_model": "MobileNetV2",
             "dataset": "CIFAR-10",
-            "fine_tune_layers": 50,
-            "early_stopping_patience": 3
+            "fine_tune_layers": FINE_TUNE_LAYERS,
+            "early_stopping_patience": 3,
+            "pipeline_mode": pipeline_mode,
+            "pipeline_cache": str(cache),
+            "phase1_mode": phase1_mode,
+            "feature_views": feature_views,
+            "log_every_n_steps": log_every_n_steps
         }
-        mlflow.log_params(training_params)
+        if not checkpointer.resumed:
+            tracker.log_params(training_params)
+
+        # Input pipeline throughput without the model, to spot input-bound runs.
+        # Measured on an uncached copy so the cache training fills is left untouched.
+        throughput_data = train_data
+        if pipeline_mode == "cached":
+            throughput_data = build_datasets(raw_train_data, raw_val_data, raw_test_data,
+                                             batch_size=batch_size, cache=None)[0]
+        input_throughput = measure_input_throughput(throughput_data)
+        tracker.log_metric("input_pipeline_images_per_sec", input_throughput)
+        print(f"📈 Input pipeline throughput: {input_throughput:.1f} images/sec")
         
+        # Use a pretrained base model with a custom classifier on top
+        model, base_model = build_classifier(weights='imagenet')
+
+        # Callbacks
+        callbacks = [
+            keras.callbacks.EarlyStopping(monitor='val_loss', patience=3, restore_best_weights=True),
+            keras.callbacks.ReduceLROnPlateau(monitor='val_loss', factor=0.2, patience=2, min_lr=1e-6),
+            keras.callbacks.ModelCheckpoint('best_model_phase1.h5', monitor='val_loss', save_best_only=True)
+        ]
+
         # PHASE 1: Transfer Learning with Frozen Base Model (Nested Run)
-        print("Phase 1: Transfer Learning (Frozen Base)")
-        with mlflow.start_run(run_name="phase1_transfer_learning", nested=True):
-            
-            # Log Phase 1 specific parameters
-            phase1_params = {
-                "phase": "transfer_learning",
-                "learning_rate": 0.001,
-                "trainable_layers": 0,
-                "epochs": 5,
-                "optimizer": "adam"
-            }
-            mlflow.log_params(phase1_params)
-            
-            # Use a pretrained base model
-            base_model = keras.applications.MobileNetV2(
-                input_shape=(224, 224, 3),
-                include_top=False,
-                weights='imagenet'
-            )
-            base_model.trainable = False
-            
-            # Add custom classifier on top
-            model = keras.Sequential([
-                base_model,
-                layers.GlobalAveragePooling2D(),
-                layers.Dropout(0.2),
-                layers.Dense(10, activation='softmax')
-            ])
+        if checkpointer.is_phase_done("phase1"):
+            print("Phase 1 already completed, skipping")
+        else:
+            print("Phase 1: Transfer Learning (Frozen Base)")
+            phase1_run_id = checkpointer.run_id("phase1")
+            with mlflow.start_run(run_name="phase1_transfer_learning", nested=True,
+                                  run_id=phase1_run_id) as phase1_run:
+                checkpointer.set_run_id("phase1", phase1_run.info.run_id)
+                
+                # Log Phase 1 specific parameters
+                phase1_params = {
+                    "phase": "transfer_learning",
+                    "learning_rate": 0.001,
+                    "trainable_layers": 0,
+                    "epochs": 5,
+                    "optimizer": "adam"
+                }
+                if phase1_run_id is None:
+                    tracker.log_params(phase1_params)
 
-            # Compile the model
-            model.compile(
-                optimizer='adam',
-                loss='sparse_categorical_crossentropy',
-                metrics=['accuracy']
-            )
+                if phase1_mode == "cached_features":
+                    # The base is frozen, so its pooled features are computed once and reused every epoch
+                    train_features, train_labels = extract_features(
+                        base_model, raw_train_data, os.path.join(feature_cache_dir, "train"),
+                        batch_size=batch_size, views=feature_views, augment=feature_views > 1
+                    )
+                    val_features, val_labels = extract_features(
+                        base_model, raw_val_data, os.path.join(feature_cache_dir, "val"), batch_size=batch_size
+                    )
+                    phase1_model = build_head_model(model, train_features.shape[1])
+                    phase1_train = feature_dataset(train_features, train_labels, batch_size, shuffle=True)
+                    phase1_val = feature_dataset(val_features, val_labels, batch_size)
+                    # best_model_phase1.h5 would only hold the head here, so skip ModelCheckpoint
+                    phase1_callbacks = [cb for cb in callbacks if not isinstance(cb, keras.callbacks.ModelCheckpoint)]
+                else:
+                    phase1_model = model
+                    phase1_train, phase1_val = train_data, val_data
+                    phase1_callbacks = callbacks
 
-            # Callbacks
-            callbacks = [
-                keras.callbacks.EarlyStopping(monitor='val_loss', patience=3, restore_best_weights=True),
-                keras.callbacks.ReduceLROnPlateau(monitor='val_loss', factor=0.2, patience=2, min_lr=1e-6),
-                keras.callbacks.ModelCheckpoint('best_model_phase1.h5', monitor='val_loss', save_best_only=True)
-            ]
+                # Compile the model
+                phase1_model.compile(
+                    optimizer='adam',
+                    loss='sparse_categorical_crossentropy',
+                    metrics=['accuracy']
+                )
+                initial_epoch = checkpointer.restore(phase1_model, "phase1")
 
-            # Train Phase 1
-            history_phase1 = model.fit(
-                train_data,
-                epochs=phase1_params["epochs"],
-                validation_data=val_data,
-                callbacks=callbacks,
-                verbose=1
-            )
+                # Train Phase 1
+                history_phase1 = phase1_model.fit(
+                    phase1_train,
+                    epochs=phase1_params["epochs"],
+                    initial_epoch=initial_epoch,
+                    validation_data=phase1_val,
+                    callbacks=phase1_callbacks + [
+                        checkpointer.callback("phase1"),
+                        MlflowMetricsCallback(log_every_n_steps, batch_size=batch_size)
+                    ],
+                    verbose=1
+                )
 
-            # Log Phase 1 metrics
-            final_metrics_phase1 = {
-                "train_accuracy": history_phase1.history['accuracy'][-1],
-                "val_accuracy": history_phase1.history['val_accuracy'][-1],
-                "train_loss": history_phase1.history['loss'][-1],
-                "val_loss": history_phase1.history['val_loss'][-1]
-            }
-            log_training_metrics(final_metrics_phase1)
-            
-            # Log training history for Phase 1
-            log_classification_artifacts(history_phase1, classes, "phase1_artifacts")
-            
-            # Save Phase 1 model
-            phase1_model_path = 'cifar10_model_phase1.keras'
-            model.save(phase1_model_path)
-            mlflow.log_artifact(phase1_model_path)
-            
-            print("Phase 1 (Transfer Learning) completed!")
+                # Log Phase 1 metrics (nothing new if all epochs finished before a restart)
+                if history_phase1.history:
+                    final_metrics_phase1 = {
+                        "train_accuracy": history_phase1.history['accuracy'][-1],
+                        "val_accuracy": history_phase1.history['val_accuracy'][-1],
+                        "train_loss": history_phase1.history['loss'][-1],
+                        "val_loss": history_phase1.history['val_loss'][-1]
+                    }
+                    log_training_metrics(final_metrics_phase1)
+                    
+                    # Log training history for Phase 1
+                    log_classification_artifacts(history_phase1, classes, "phase1_artifacts")
+                
+                # Save Phase 1 model
+                phase1_model_path = 'cifar10_model_phase1.keras'
+                model.save(phase1_model_path)
+                tracker.log_artifact(phase1_model_path)
+                checkpointer.mark_phase_done(model, "phase1")
+                
+                print("Phase 1 (Transfer Learning) completed!")
 
         # PHASE 2: Fine-tuning (Nested Run)
-        print("Phase 2: Fine-tuning (Unfrozen Layers)")
-        with mlflow.start_run(run_name="phase2_fine_tuning", nested=True):
-            
-            # Log Phase 2 specific parameters
-            phase2_params = {
-                "phase": "fine_tuning",
-                "learning_rate": 0.01,
-                "trainable_layers": 50,
-                "epochs": 5,
-                "optimizer": "adam"
-            }
-            mlflow.log_params(phase2_params)
-            
-            # Unfreezing the last 50 layers of the model
-            base_model.trainable = True
-            fine_tune = 50
-            
-            # Freeze all the layers before the `fine_tune` layer
-            for layer in base_model.layers[:-fine_tune]:
-                layer.trainable = False
+        if checkpointer.is_phase_done("phase2"):
+            print("Phase 2 already completed, loading its final weights")
+            checkpointer.restore_final(model, "phase2")
+        else:
+            print("Phase 2: Fine-tuning (Unfrozen Layers)")
+            phase2_run_id = checkpointer.run_id("phase2")
+            with mlflow.start_run(run_name="phase2_fine_tuning", nested=True,
+                                  run_id=phase2_run_id) as phase2_run:
+                checkpointer.set_run_id("phase2", phase2_run.info.run_id)
+                
+                # Log Phase 2 specific parameters
+                phase2_params = {
+                    "phase": "fine_tuning",
+                    "learning_rate": 0.01,
+                    "trainable_layers": FINE_TUNE_LAYERS,
+                    "epochs": 5,
+                    "optimizer": "adam"
+                }
+                if phase2_run_id is None:
+                    tracker.log_params(phase2_params)
+                
+                # Unfreezing the last 50 layers of the model
+                unfreeze_top_layers(base_model)
 
-            # Recompile with lower learning rate for fine-tuning
-            model.compile(
-                optimizer=keras.optimizers.Adam(learning_rate=0.01),
-                loss=keras.losses.SparseCategoricalCrossentropy(from_logits=False),
-                metrics=["accuracy"]
-            )
-            
-            # Train Phase 2
-            history_phase2 = model.fit(
-                train_data,
-                epochs=phase2_params["epochs"],
-                validation_data=val_data,
-                callbacks=callbacks,
-                verbose=1
-            )
+                # Recompile with lower learning rate for fine-tuning
+                model.compile(
+                    optimizer=keras.optimizers.Adam(learning_rate=0.01),
+                    loss=keras.losses.SparseCategoricalCrossentropy(from_logits=False),
+                    metrics=["accuracy"]
+                )
+                # Continue phase 2, or start it from the final phase 1 weights
+                initial_epoch = checkpointer.restore(model, "phase2", previous_phase="phase1")
+                
+                # Train Phase 2
+                history_phase2 = model.fit(
+                    train_data,
+                    epochs=phase2_params["epochs"],
+                    initial_epoch=initial_epoch,
+                    validation_data=val_data,
+                    callbacks=callbacks + [
+                        checkpointer.callback("phase2"),
+                        MlflowMetricsCallback(log_every_n_steps, batch_size=batch_size)
+                    ],
+                    verbose=1
+                )
 
-            # Log Phase 2 metrics
-            final_metrics_phase2 = {
-                "train_accuracy": history_phase2.history['accuracy'][-1],
-                "val_accuracy": history_phase2.history['val_accuracy'][-1],
-                "train_loss": history_phase2.history['loss'][-1],
-                "val_loss": history_phase2.history['val_loss'][-1]
-            }
-            log_training_metrics(final_metrics_phase2)
-            
-            # Log training history for Phase 2
-            log_classification_artifacts(history_phase2, classes, "phase2_artifacts")
-            
-            print("Phase 2 (Fine-tuning) completed!")
+                # Log Phase 2 metrics
+                if history_phase2.history:
+                    final_metrics_phase2 = {
+                        "train_accuracy": history_phase2.history['accuracy'][-1],
+                        "val_accuracy": history_phase2.history['val_accuracy'][-1],
+                        "train_loss": history_phase2.history['loss'][-1],
+                        "val_loss": history_phase2.history['val_loss'][-1]
+                    }
+                    log_training_metrics(final_metrics_phase2)
+                    
+                    # Log training history for Phase 2
+                    log_classification_artifacts(history_phase2, classes, "phase2_artifacts")
+                checkpointer.mark_phase_done(model, "phase2")
+                
+                print("Phase 2 (Fine-tuning) completed!")
 
         # FINAL EVALUATION (Back in parent run)
         print("Evaluating final model...")
@@ -200,74 +328,55 @@ def train_classification_with_mlflow():
         # Save the final model
         final_model_path = 'cifar10_model_final_mlflow.keras'
         model.save(final_model_path)
-        mlflow.log_artifact(final_model_path)
+        tracker.log_artifact(final_model_path)
 
-        # Evaluate the model
-        test_loss, test_acc = model.evaluate(test_data)
-        
-        # Get comprehensive metrics
-        y_true = []
-        y_pred = []
-        for images, labels in test_data:
-            preds = model.predict(images, verbose=0)
-            y_true.extend(labels.numpy())
-            y_pred.extend(np.argmax(preds, axis=1))
-        
-        from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, confusion_matrix
+        # Store the preprocessing spec alongside the model so serving and clients match training
+        spec_path = CIFAR10_CLASSIFIER_SPEC.save(SPEC_FILENAME)
+        tracker.log_artifact(spec_path)
+
+        # Export the int8 TFLite model used for CPU serving
+        tflite_model_path = 'cifar10_model_int8.tflite'
+        export_tflite_int8(model, tflite_model_path)
+        tracker.log_artifact(tflite_model_path)
+
+        # Evaluate the model in a single pass over the test set
+        results = evaluate_classifier(model, test_data, num_classes=len(classes))
+        test_loss, test_acc = results["loss"], results["accuracy"]
         
         final_metrics = {
             "test_accuracy": test_acc,
             "test_loss": test_loss,
-            "precision_macro": precision_score(y_true, y_pred, average='macro'),
-            "recall_macro": recall_score(y_true, y_pred, average='macro'),
-            "f1_score_macro": f1_score(y_true, y_pred, average='macro')
+            "precision_macro": results["precision_macro"],
+            "recall_macro": results["recall_macro"],
+            "f1_score_macro": results["f1_score_macro"]
         }
         
         # Log final metrics in parent run
         log_training_metrics(final_metrics)
         
         # Create and log confusion matrix
-        cm = confusion_matrix(y_true, y_pred)
-        plt.figure(figsize=(8, 6))
-        sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', xticklabels=classes, yticklabels=classes)
-        plt.xlabel('Predicted')
-        plt.ylabel('True')
-        plt.title('Confusion Matrix - Final Model')
-        plt.tight_layout()
-        plt.savefig('confusion_matrix_final.png')
-        mlflow.log_artifact('confusion_matrix_final.png')
-        plt.close()
+        plot_confusion_matrix(results["confusion_matrix"], classes,
+                              title='Confusion Matrix - Final Model', save_path='confusion_matrix_final.png')
+        tracker.log_artifact('confusion_matrix_final.png')
         
         # Log sample predictions
-        sample_images, sample_labels = next(iter(test_data))
-        sample_preds = model.predict(sample_images, verbose=0)
-        sample_pred_labels = np.argmax(sample_preds, axis=1)
-        
-        plt.figure(figsize=(12, 6))
-        for i in range(8):
-            plt.subplot(2, 4, i + 1)
-            img = sample_images[i].numpy() * 255.0
-            img = np.clip(img, 0, 255).astype("uint8")
-            plt.imshow(img)
-            true_cls = classes[sample_labels[i]]
-            pred_cls = classes[sample_pred_labels[i]]
-            color = 'green' if true_cls == pred_cls else 'red'
-            plt.title(f"True: {true_cls}\nPred: {pred_cls}", color=color, fontsize=8)
-            plt.axis("off")
-        plt.tight_layout()
-        plt.savefig('sample_predictions_final.png')
-        mlflow.log_artifact('sample_predictions_final.png')
-        plt.close()
+        plot_sample_predictions(results, classes, save_path='sample_predictions_final.png')
+        tracker.log_artifact('sample_predictions_final.png')
 
-        # Register the final model
-        if ws:
-            registry = ModelRegistry(ws)
-            registry.register_classification_model(
-                final_model_path,
-                mlflow.active_run().info.run_id,
-                final_metrics,
-                "CIFAR-10 Classification Model - MobileNetV2 with Fine-tuning (Nested Runs)"
-            )
+        # Registration talks to MLflow directly, so send everything queued first
+        tracker.flush()
+
+        # Register the final model (in a local registry directory when Azure ML is unavailable)
+        registry = ModelRegistry(ws) if ws else LocalModelRegistry()
+        registry.register_classification_model(
+            final_model_path,
+            mlflow.active_run().info.run_id,
+            final_metrics,
+            "CIFAR-10 Classification Model - MobileNetV2 with Fine-tuning (Nested Runs)",
+            keras_model=model,
+            num_classes=len(classes),
+            extra_files=[spec_path]
+        )
         
         print("Classification training completed with MLflow tracking!")
         print(f"Final Test Accuracy: {test_acc:.4f}")
@@ -275,4 +384,27 @@ def train_classification_with_mlflow():
         return model, final_metrics
 
 if __name__ == "__main__":
-    model, metrics = train_classification_with_mlflow()
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Train the CIFAR-10 MobileNetV2 classifier with MLflow tracking")
+    parser.add_argument("--pipeline", choices=["cached", "legacy"], default="cached")
+    parser.add_argument("--cache", default="memory", help='"memory", "none" or a cache directory')
+    parser.add_argument("--profile", choices=["default", "cpu"], default="default")
+    parser.add_argument("--checkpoint-dir", default="checkpoints")
+    parser.add_argument("--resume", action="store_true", help="Continue from the last completed epoch")
+    parser.add_argument("--phase1-mode", choices=["end_to_end", "cached_features"], default="end_to_end")
+    parser.add_argument("--feature-views", type=int, default=1,
+                        help="Augmented views per image when caching features (1 = no augmentation)")
+    parser.add_argument("--log-every-n-steps", type=int, default=50,
+                        help="Stream step metrics to MLflow every N batches (0 = epoch metrics only)")
+    args = parser.parse_args()
+
+    model, metrics = train_classification_with_mlflow(
+        pipeline_mode=args.pipeline,
+        cache=None if args.cache == "none" else args.cache,
+        profile=args.profile,
+        checkpoint_dir=args.checkpoint_dir,
+        resume=args.resume,
+        phase1_mode=args.phase1_mode,
+        feature_views=args.feature_views,
+        log_every_n_steps=args.log_every_n_steps
+    )
\ No newline at end of file
@@ -0,0 +1,136 @@
+# MLflow/training_profile.py
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+
+PROFILES = ("default", "cpu")
+
+
+def available_cpus():
+    """
+    CPUs this process may run on (respects container/affinity limits)
+    """
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def cpu_supports_bfloat16():
+    """
+    True when the CPU has native bfloat16 instructions (AVX512-BF16 or AMX).
+    On other CPUs mixed_bfloat16 is emulated and slower than float32.
+    """
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+
+def configure_threads(intra_op_threads=None, inter_op_threads=None):
+    """
+    Size TensorFlow's thread pools. Must run before TensorFlow executes any op.
+    """
+    intra_op_threads = intra_op_threads or available_cpus()
+    inter_op_threads = inter_op_threads or 2
+    tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+    return intra_op_threads, inter_op_threads
+
+
+def probe_batch_size(model_fn, candidates=(32, 64, 128, 256), image_size=(224, 224),
+                     num_classes=10, steps=3, min_gain=0.05):
+    """
+    Train a few steps on random data at each candidate batch size and return
+    (best_batch_size, {batch_size: samples_per_sec}). Stops once a larger batch
+    improves throughput by less than `min_gain`, or when a batch size runs out
+    of memory.
+
+    model_fn should build the model in its most memory-hungry training
+    configuration (e.g. with the fine-tuning layers unfrozen): the chosen batch
+    size is used for every phase, and a frozen base needs far less memory.
+    """
+    throughput = {}
+    best_batch_size, best_sps = candidates[0], 0.0
+
+    for batch_size in candidates:
+        keras.backend.clear_session()
+        model = model_fn()
+        model.compile(optimizer='adam', loss='sparse_categorical_crossentropy')
+
+        x = np.random.rand(batch_size, *image_size, 3).astype(np.float32)
+        y = np.random.randint(0, num_classes, size=(batch_size,))
+        try:
+            model.train_on_batch(x, y)  # warm-up / tracing
+
+            start = time.perf_counter()
+            for _ in range(steps):
+                model.train_on_batch(x, y)
+        except tf.errors.ResourceExhaustedError:
+            print(f"🔎 Batch size {batch_size}: out of memory")
+            break
+        sps = batch_size * steps / (time.perf_counter() - start)
+        throughput[batch_size] = sps
+        print(f"🔎 Batch size {batch_size}: {sps:.1f} samples/sec")
+
+        if sps < best_sps * (1.0 + min_gain):
+            break
+        best_batch_size, best_sps = batch_size, sps
+
+    keras.backend.clear_session()
+    return best_batch_size, throughput
+
+
+def apply_training_profile(profile="default", model_fn=None, default_batch_size=32):
+    """
+    Apply a training profile and return the chosen settings.
+
+    "default" keeps TensorFlow's defaults (float32, default thread pools,
+    batch size 32). "cpu" sizes the thread pools to the available cores,
+    enables mixed_bfloat16 when the CPU supports it natively and picks the
+    batch size with probe_batch_size (when model_fn is given; it should build
+    the model as configured for its heaviest training phase).
+    Call this before any other TensorFlow work.
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown training profile: {profile}")
+
+    settings = {
+        "profile": profile,
+        "precision_policy": "float32",
+        "intra_op_threads": 0,
+        "inter_op_threads": 0,
+        "batch_size": default_batch_size,
+    }
+    if profile == "default":
+        return settings
+
+    intra, inter = configure_threads()
+    settings["intra_op_threads"] = intra
+    settings["inter_op_threads"] = inter
+
+    if cpu_supports_bfloat16():
+        keras.mixed_precision.set_global_policy("mixed_bfloat16")
+        settings["precision_policy"] = "mixed_bfloat16"
+
+    if model_fn is not None:
+        batch_size, throughput = probe_batch_size(model_fn)
+        settings["batch_size"] = batch_size
+        # Even the smallest candidate may have run out of memory
+        settings["probe_samples_per_sec"] = round(throughput.get(batch_size, 0.0), 1)
+
+    print(f"⚙️ Training profile: {settings}")
+    return settings
+
+
+def log_training_profile(settings):
+    """
+    Log the chosen profile settings to the active MLflow run
+    """
+    from experiment_logging import get_async_logger
+    get_async_logger().log_params({f"profile_{k}": v for k, v in settings.items()})